@@ -0,0 +1,83 @@
+# batch_env.py
+"""
+stable_baselines3 VecEnv over a BatchSimulation: `num_envs` intersections
+stepped by one vectorized call instead of one TrafficSignalEnv per process.
+
+Observations, actions and rewards are the ones of traffic_env.TrafficSignalEnv,
+stacked per env. All envs share one clock, so they reach the episode limit on
+the same step and are reset together (the final observation is kept in
+info["terminal_observation"], as SB3 expects).
+"""
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+
+from batch_simulation import BatchSimulation
+from simulation import DIRECTIONS, FPS
+from traffic_env import DECISION_TICKS, observation_space
+
+
+class TrafficSignalVecEnv(VecEnv):
+    def __init__(self, num_envs, decision_ticks=DECISION_TICKS, episode_seconds=3600.0, seed=None, **sim_kwargs):
+        self.decision_ticks = decision_ticks
+        self.episode_ticks = int(episode_seconds * FPS)
+        self.render_mode = None
+        self.sim = BatchSimulation(num_envs, seed=seed, **sim_kwargs)
+        self.episode_start_tick = 0
+        self.actions = None
+        n = len(DIRECTIONS)
+        super().__init__(num_envs, observation_space(decision_ticks, episode_seconds), spaces.Discrete(n))
+
+    def _observations(self):
+        sim = self.sim
+        n = len(DIRECTIONS)
+        obs = np.zeros((self.num_envs, 3 * n), dtype=np.float32)
+        obs[:, :n] = sim.get_queue_counts()
+        obs[:, n:2 * n] = sim.get_current_waits()
+        obs[sim.groups, 2 * n + sim.light_index] = 1.0
+        return obs
+
+    def reset(self):
+        seed = self._seeds[0]
+        if seed is not None:
+            self.sim.reseed(seed)
+        self._reset_seeds()
+        self.sim.reset_groups(self.sim.groups)
+        self.episode_start_tick = self.sim.clock.ticks
+        return self._observations()
+
+    def step_async(self, actions):
+        self.actions = actions
+
+    def step_wait(self):
+        sim = self.sim
+        sim.requested_direction[:] = self.actions
+        sim.run(self.decision_ticks)
+        obs = self._observations()
+        rewards = -sim.get_queued_counts().sum(axis=1).astype(np.float32)
+        done = sim.clock.ticks - self.episode_start_tick >= self.episode_ticks
+        dones = np.full(self.num_envs, done)
+        infos = [{} for _ in range(self.num_envs)]
+        if done:
+            for i, info in enumerate(infos):
+                info["terminal_observation"] = obs[i]
+                info["TimeLimit.truncated"] = True
+            obs = self.reset()
+        return obs, rewards, dones, infos
+
+    def close(self):
+        pass
+
+    # attributes and methods live on the shared wrapper/batch, so every env reports the same value
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        result = getattr(self.sim, method_name)(*method_args, **method_kwargs)
+        return [result] * len(self._get_indices(indices))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
@@ -0,0 +1,272 @@
+# batch_simulation.py
+"""
+N independent copies of the simulation.py intersection stepped together.
+
+All vehicles of all intersections share one VehicleStore (lane = group * 4 +
+direction), so a single vectorized `advance` moves every vehicle, and the
+light state machine, choose_next_direction and the metrics are evaluated as
+arrays over the groups. Every group follows the same rules as Simulation;
+arrivals and vehicle types come from two NumPy generators derived from the
+batch seed, so a batch is reproducible from its seed but does not replay the
+random streams of a single Simulation. Given `group_seeds` instead, group k
+draws its arrivals from the RandomStreams of Simulation(seed=group_seeds[k]),
+one group at a time, and replays that run exactly (for checking the batch
+against Simulation; it gives up the vectorized arrivals).
+
+There is no siren input here, so the emergency override is left out, and
+the controller ranks by vehicles present only (Simulation's default
+demand_weight of 0).
+"""
+import numpy as np
+
+from rng_streams import RandomStreams
+from sim_clock import SimClock
+from simulation import (WIDTH, HEIGHT, FPS, DIRECTIONS, MIN_GREEN, MAX_GREEN, STARVE_TIME,
+                        SAFE_DISTANCE, SPAWN_CHANCE, CLEAR_DELAY)
+from vehicles import VehicleStore, LaneCounts, Geometry, advance, in_bounds, box_occupied, travel_coordinate
+
+# light states, in the order the state machine walks through them
+GREEN, START_SWITCH, WAIT_CLEAR, DELAY = range(4)
+LIGHT_STATES = ["GREEN", "START_SWITCH", "WAIT_CLEAR", "DELAY"]
+
+
+class BatchSimulation:
+    def __init__(self, num_groups, min_green=MIN_GREEN, max_green=MAX_GREEN, starve_time=STARVE_TIME,
+                 safe_distance=SAFE_DISTANCE, spawn_chance=SPAWN_CHANCE, clock=None, seed=None, group_seeds=None):
+        self.num_groups = num_groups
+        self.min_green = min_green
+        self.max_green = max_green
+        self.starve_time = starve_time
+        self.safe_distance = safe_distance
+        self.spawn_chance = spawn_chance
+        self.clock = clock if clock is not None else SimClock(1.0 / FPS)
+        self.reseed(seed)
+        self.group_streams = None if group_seeds is None else [RandomStreams(s) for s in group_seeds]
+        if self.group_streams is not None and len(self.group_streams) != num_groups:
+            raise ValueError(f"{len(self.group_streams)} group seeds for {num_groups} groups")
+
+        self.geometry = Geometry(WIDTH, HEIGHT)
+        self.vehicles = VehicleStore()
+        # vehicles present / queued / committed per lane, kept up to date instead of recounted
+        self.lane_counts = LaneCounts(num_groups * 4)
+        self.spawn_threshold = self.geometry.spawn_threshold(safe_distance)
+
+        n = num_groups
+        self.groups = np.arange(n)
+        self.light_index = np.zeros(n, dtype=np.int64)
+        self.light_state = np.full(n, GREEN)
+        self.green_start_time = np.zeros(n)
+        self.clear_start_time = np.zeros(n)
+        self.delay_start_time = np.zeros(n)
+        self.last_served = np.zeros((n, len(DIRECTIONS)))
+        # direction index chosen by an external controller per group; -1 = adaptive
+        self.requested_direction = np.full(n, -1)
+        # lanes that receive arrivals from outside; network.py turns off the ones fed by a neighbour
+        self.entry_lanes = np.ones(n * 4, dtype=bool)
+
+        self.sim_start_time = np.zeros(n)
+        self.total_wait_time = np.zeros(n)
+        self.total_served_waits = np.zeros(n, dtype=np.int64)
+        self.throughput_count = np.zeros(n, dtype=np.int64)
+        self.reset_groups(self.groups)
+
+    @property
+    def now(self):
+        return self.clock.now()
+
+    def reset_groups(self, groups):
+        """Remove the vehicles of `groups` and restart their lights and metrics at the current time."""
+        now = self.now
+        store = self.vehicles
+        store.compact(~np.isin(store.lane >> 2, groups))
+        self.lane_counts.clear((np.asarray(groups)[:, None] * 4 + np.arange(len(DIRECTIONS))).ravel())
+        self.light_index[groups] = 0
+        self.light_state[groups] = GREEN
+        self.green_start_time[groups] = now
+        self.last_served[groups] = now
+        self.requested_direction[groups] = -1
+        self.sim_start_time[groups] = now
+        self.total_wait_time[groups] = 0.0
+        self.total_served_waits[groups] = 0
+        self.throughput_count[groups] = 0
+
+    def reseed(self, seed):
+        arrivals, vehicle_type = np.random.SeedSequence(seed).spawn(2)
+        self.arrivals = np.random.default_rng(arrivals)
+        self.vehicle_type = np.random.default_rng(vehicle_type)
+
+    # ----- Vehicles -----
+    def spawn_cars(self):
+        if self.group_streams is not None:
+            self.spawn_from_group_streams()
+            return
+        n = self.num_groups
+        # same odds per group as Simulation.spawn_car
+        spawning = np.flatnonzero(self.arrivals.integers(0, self.spawn_chance + 1, n) == 0)
+        if spawning.size == 0:
+            return
+        d = self.arrivals.integers(0, len(DIRECTIONS), spawning.size)
+        is_bus = self.vehicle_type.random(spawning.size) >= 0.7
+        lane = spawning * 4 + d
+
+        free = self.lane_is_free(lane)
+        self.add_vehicles(lane[free], is_bus[free])
+
+    def spawn_from_group_streams(self):
+        # the draws of Simulation.spawn_car / spawn_arrival, group by group
+        arrivals = [(g, streams) for g, streams in enumerate(self.group_streams)
+                    if streams.arrivals.randint(0, self.spawn_chance) == 0]
+        if not arrivals:
+            return
+        lanes = np.array([g * 4 + DIRECTIONS.index(streams.arrivals.choice(DIRECTIONS)) for g, streams in arrivals])
+        free = self.lane_is_free(lanes)
+        # a vehicle type is only drawn for a vehicle that fits
+        is_bus = np.array([streams.vehicle_type.random() >= 0.7
+                           for (g, streams), fits in zip(arrivals, free.tolist()) if fits], dtype=bool)
+        self.add_vehicles(lanes[free], is_bus)
+
+    def lane_is_free(self, lane):
+        """Where a vehicle can spawn on `lane`: an outside entry with its spawn point clear."""
+        store = self.vehicles
+        lowest = np.full(self.num_groups * 4, np.inf)
+        np.minimum.at(lowest, store.lane, travel_coordinate(store))
+        return (lowest[lane] >= self.spawn_threshold[lane & 3]) & self.entry_lanes[lane]
+
+    def add_vehicles(self, lane, is_bus):
+        d = lane & 3
+        length = np.where(is_bus, 60, 40)
+        x, y = self.geometry.spawn_positions(d, length)
+        self.vehicles.extend(x, y, lane, length, is_bus.astype(np.int8), self.now)
+        self.lane_counts.enter(lane)
+
+    # ----- Controller -----
+    def green_lanes(self):
+        green = np.zeros((self.num_groups, len(DIRECTIONS)), dtype=bool)
+        green[self.groups, self.light_index] = self.light_state == GREEN
+        return green.ravel()
+
+    def get_queue_counts(self):
+        """Vehicles per group and direction, shape (num_groups, 4)."""
+        return self.lane_counts.present.reshape(self.num_groups, len(DIRECTIONS)).copy()
+
+    def get_queued_counts(self):
+        return self.lane_counts.queued.reshape(self.num_groups, len(DIRECTIONS)).copy()
+
+    def get_current_waits(self):
+        return self.lane_counts.average_waits(self.now).reshape(self.num_groups, len(DIRECTIONS))
+
+    def choose_next_direction(self, counts, exclude=None):
+        """
+        Simulation.choose_next_direction for every group at once. `exclude`
+        is an optional direction index per group.
+        """
+        n = self.num_groups
+        groups = self.groups
+        excluded = np.zeros((n, len(DIRECTIONS)), dtype=bool)
+        if exclude is not None:
+            excluded[groups, exclude] = True
+
+        starving = (self.now - self.last_served >= self.starve_time) & ~excluded
+        best_starving = np.argmax(np.where(starving, counts, -1), axis=1)
+
+        max_count = counts.max(axis=1)
+        best = (counts == max_count[:, None]) & ~excluded
+        current = self.light_index
+        choice = np.where(best[groups, current], current, np.argmax(best, axis=1))
+        choice = np.where(best.any(axis=1), choice, np.argmax(~excluded, axis=1))
+        # no queues; rotate to next to avoid permanent same dir
+        choice = np.where(max_count == 0, (current + 1) % 4, choice)
+        return np.where(starving.any(axis=1), best_starving, choice)
+
+    def next_direction(self, counts, exclude=None):
+        choice = self.choose_next_direction(counts, exclude)
+        requested = self.requested_direction
+        use_request = requested >= 0
+        if exclude is not None:
+            use_request &= requested != exclude
+        return np.where(use_request, requested, choice)
+
+    def intersection_clear(self):
+        """Virtual IoT sensor per group: True where no vehicle is inside the central box."""
+        store = self.vehicles
+        occupied = np.bincount(store.lane[box_occupied(store, self.geometry)] >> 2,
+                               minlength=self.num_groups)
+        return occupied == 0
+
+    # ----- Metrics -----
+    def get_average_wait(self):
+        return np.divide(self.total_wait_time, self.total_served_waits,
+                         out=np.zeros(self.num_groups), where=self.total_served_waits > 0)
+
+    def get_throughput_per_minute(self):
+        elapsed_minutes = (self.now - self.sim_start_time) / 60.0
+        return np.divide(self.throughput_count, elapsed_minutes,
+                         out=np.zeros(self.num_groups), where=elapsed_minutes > 0)
+
+    def record_waits(self, waits, lanes):
+        groups = lanes >> 2
+        self.total_wait_time += np.bincount(groups, weights=waits, minlength=self.num_groups)
+        self.total_served_waits += np.bincount(groups, minlength=self.num_groups)
+
+    def depart(self, leaving):
+        """Called with the rows that leave the screen this tick, before they are removed."""
+
+    # ----- Tick -----
+    def step(self):
+        now = self.now
+        n = self.num_groups
+
+        self.spawn_cars()
+        store = self.vehicles
+        waits, served = advance(store, self.green_lanes(), now, self.safe_distance, self.geometry,
+                                self.lane_counts)
+        self.record_waits(waits, store.lane[served])
+
+        keep = in_bounds(store, self.geometry)
+        if not keep.all():
+            leaving = ~keep
+            groups = store.lane[leaving] >> 2
+            self.throughput_count += np.bincount(groups[store.crossed[leaving]], minlength=n)
+            queued = store.queued_time[leaving]
+            waiting = ~np.isnan(queued)
+            self.record_waits(now - queued[waiting], store.lane[leaving][waiting])
+            self.depart(leaving)
+            self.lane_counts.leave(store, leaving)
+            store.compact(keep)
+
+        # ----- State Machine, every group moves at most one state per tick -----
+        state = self.light_state
+        counts = self.get_queue_counts()
+
+        green = state == GREEN
+        elapsed_green = now - self.green_start_time
+        suggested = self.next_direction(counts)
+        need_switch = green & ((elapsed_green >= self.max_green)
+                               | ((elapsed_green >= self.min_green) & (suggested != self.light_index)))
+
+        wait_clear = state == WAIT_CLEAR
+        if wait_clear.any():
+            cleared = wait_clear & self.intersection_clear()
+        else:
+            cleared = wait_clear
+        switching = (state == DELAY) & (now - self.delay_start_time >= CLEAR_DELAY)
+        starting = state == START_SWITCH
+
+        state[need_switch] = START_SWITCH
+        state[starting] = WAIT_CLEAR
+        self.clear_start_time[starting] = now
+        state[cleared] = DELAY
+        self.delay_start_time[cleared] = now
+        if switching.any():
+            chosen = self.next_direction(counts, exclude=self.light_index)
+            self.light_index[switching] = chosen[switching]
+            state[switching] = GREEN
+            self.green_start_time[switching] = now
+            self.last_served[switching, self.light_index[switching]] = now
+
+        self.clock.advance()
+
+    def run(self, ticks):
+        for _ in range(ticks):
+            self.step()
+        return self
@@ -0,0 +1,134 @@
+# event_simulation.py
+"""
+Discrete-event mode of the simulation.py intersection.
+
+The vehicles and the controller follow exactly the rules of Simulation
+(stop lines, SAFE_DISTANCE, MIN_GREEN / MAX_GREEN / STARVE_TIME, the
+WAIT_CLEAR and DELAY phases), and time still moves on the same tick
+lattice. But between two significant events nothing discrete changes: the
+same vehicles keep rolling at SPEED and every light timer is just counting.
+EventSimulation computes how many ticks that lasts and jumps over them in
+one go. The significant events are:
+
+- an arrival
+- a vehicle reaching its stop line, committing, starting to queue or leaving
+- a gap opening or closing past SAFE_DISTANCE, e.g. a queue discharging
+- a light timer or starvation deadline expiring
+- with a demand_weight, a bin of the recent-demand window rolling over
+- the intersection box clearing, since WAIT_CLEAR is stepped tick by tick
+
+At each event one ordinary Simulation.step() runs.
+
+Arrivals keep the per-tick odds of Simulation.spawn_car, but the gap to the
+next arrival is drawn directly from the geometric distribution. The traffic
+is therefore statistically the same, but not the same random draws as a
+tick-stepped run with the same seed.
+
+Emergency vehicles are stepped tick by tick as well, because the
+prioritized one changes as they move.
+
+    python simulation.py --minutes 480 --spawn-chance 600 --events
+"""
+import math
+
+from simulation import Simulation, DIRECTIONS, CLEAR_DELAY
+from vehicles import steady_ticks, coast
+
+
+class EventSimulation(Simulation):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # same odds per tick as Simulation.spawn_car's randint(0, spawn_chance) == 0
+        self.arrival_chance = 1.0 / (self.spawn_chance + 1)
+        self.next_arrival = self.clock.ticks + self.arrival_gap()
+        self.events = 0  # ticks that had to be stepped one by one
+
+    def arrival_gap(self):
+        """Ticks without an arrival before the next one (geometric distribution)."""
+        if self.arrival_chance >= 1.0:
+            return 0
+        u = 1.0 - self.streams.arrivals.random()  # (0, 1]
+        return math.floor(math.log(u) / math.log1p(-self.arrival_chance))
+
+    def spawn_car(self):
+        if self.clock.ticks < self.next_arrival:
+            return
+        self.next_arrival = self.clock.ticks + 1 + self.arrival_gap()
+        self.spawn_arrival()
+
+    # ----- Event scheduling -----
+    def ticks_until(self, deadline):
+        """Ticks from now until `deadline(now)` first holds, evaluated on the tick lattice like step() does."""
+        clock = self.clock
+        now = clock.now()
+        if deadline(now):
+            return 0
+        # estimate from the first tick where the clock is certainly past it, then walk back
+        ticks = 1
+        while not deadline(clock.time_at(clock.ticks + ticks)):
+            ticks *= 2
+        low = ticks // 2
+        while low + 1 < ticks:
+            middle = (low + ticks) // 2
+            if deadline(clock.time_at(clock.ticks + middle)):
+                ticks = middle
+            else:
+                low = middle
+        return ticks
+
+    def controller_quiet_ticks(self):
+        """Upcoming ticks in which the light state machine changes nothing (0 if the next tick may)."""
+        if self.emergency_override or self.vehicles.is_emergency().any():
+            return 0
+        now = self.now
+        if self.light_state == "GREEN":
+            limits = [self.ticks_until(lambda t: t - self.green_start_time >= self.max_green)]
+            if now - self.green_start_time < self.min_green:
+                limits.append(self.ticks_until(lambda t: t - self.green_start_time >= self.min_green))
+            elif self.next_direction() != self.light_index:
+                return 0
+            else:
+                # the suggestion only changes with the counts (arrivals, departures) or when a lane starves
+                for d in DIRECTIONS:
+                    served = self.last_served.get(d, 0)
+                    if now - served < self.starve_time:
+                        limits.append(self.ticks_until(lambda t: t - served >= self.starve_time))
+                if self.demand_weight:
+                    # and with the recent demand, whose window only moves bin by bin
+                    recent = self.recent
+                    limits.append(self.ticks_until(lambda t: math.floor(t / recent.bin_seconds) > recent.current))
+            return min(limits)
+        if self.light_state == "DELAY":
+            return self.ticks_until(lambda t: t - self.delay_start_time >= CLEAR_DELAY)
+        # START_SWITCH lasts one tick, WAIT_CLEAR polls the intersection box every tick
+        return 0
+
+    def quiet_ticks(self):
+        """
+        How many ticks from now can be skipped: no arrival, no controller
+        change and only steady vehicle motion. Returns (ticks, moving rows).
+        """
+        ticks = self.next_arrival - self.clock.ticks
+        if ticks > 0:
+            ticks = min(ticks, self.controller_quiet_ticks())
+        if ticks <= 0:
+            return 0, None
+        vehicle_ticks, moving = steady_ticks(self.vehicles, self.green_lanes(), self.safe_distance, self.geometry)
+        return int(min(ticks, vehicle_ticks)), moving
+
+    def skip(self, ticks, moving):
+        """Apply `ticks` quiet ticks at once."""
+        coast(self.vehicles, moving, ticks, self.geometry)
+        self.clock.advance(ticks)
+
+    def run(self, ticks):
+        end = self.clock.ticks + ticks
+        while self.clock.ticks < end:
+            quiet, moving = self.quiet_ticks()
+            quiet = min(quiet, end - self.clock.ticks)
+            if quiet > 0:
+                self.skip(quiet, moving)
+            else:
+                self.step()
+                self.events += 1
+        return self
@@ -1,17 +1,23 @@
 # graph.py
 import pygame
 import sys
-import random
-import time
-import threading
-import sounddevice as sd
-import numpy as np
-
-pygame.init()
-
-WIDTH, HEIGHT = 900, 800
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Traffic Intersection Simulation (State Machine + Virtual IoT Clearance)")
+from render_cache import SurfaceCache, TextCache, Layer, DirtyRects
+from sim_clock import FrameScheduler
+from siren_detector import SirenMonitor, SpectralDetector, GoertzelDetector
+from simulation import Simulation, WIDTH, HEIGHT, FPS, DIRECTIONS, CLEAR_DELAY
+from trip_log import TripLog
+from windowed_metrics import WINDOWS
+from vehicles import VEHICLE_TYPES, VEHICLE_WIDTH
+
+# ----- Siren detection settings -----
+audio_cooldown = 3.0
+fs = 44100
+audio_window = 0.25  # seconds of audio per decision
+audio_hop = 0.1  # seconds of new audio between decisions
+freq_low = 500
+freq_high = 2000
+energy_threshold = 0.005
+detector_engine = "fft"  # "goertzel": only the two siren tones, a fraction of the CPU
 
 # Colors
 ROAD_COLOR = (50, 50, 50)
@@ -25,61 +31,56 @@ BG_COLOR = (34, 139, 34)
 PANEL_BG_ALPHA = 200
 
 clock = pygame.time.Clock()
-FPS = 60
-
-DIRECTIONS = ["N", "E", "S", "W"]
-
-# Timing / parameters
-MIN_GREEN = 5.0
-MAX_GREEN = 30.0
-STARVE_TIME = 25.0
-SAFE_DISTANCE = 15
-SPAWN_CHANCE = 15  # the lower, the more often vehicles spawn (random modulus)
-
-FONT = pygame.font.SysFont("Arial", 16)
-SMALL_FONT = pygame.font.SysFont("Arial", 12)
-def draw_bar_graphs(vehicle_counts, avg_wait_times):
-    # Horizontal bar graph (top-right)
-    start_x, start_y = WIDTH - 200, 50
-    bar_width, max_bar_length = 20, 150
-    for i, dir in enumerate(DIRECTIONS):
-        length = int((vehicle_counts[dir] / max(vehicle_counts.values(), 1)) * max_bar_length)
-        pygame.draw.rect(SCREEN, (0, 255, 0), (start_x, start_y + i * 30, length, bar_width))
-        label = SMALL_FONT.render(f"{dir}: {vehicle_counts[dir]}", True, (255, 255, 255))
-        SCREEN.blit(label, (start_x + 160, start_y + i * 30))
-
-    # Vertical bar graph (bottom-left)
-    start_x, start_y = 50, HEIGHT - 250
-    bar_width, max_bar_height = 20, 250
-    for i, dir in enumerate(DIRECTIONS):
-        height = int((avg_wait_times[dir] / max(avg_wait_times.values(), 1)) * max_bar_height)
-        pygame.draw.rect(SCREEN, (255, 0, 0), (start_x + i * 40, start_y + (max_bar_height - height), bar_width, height))
-        label = SMALL_FONT.render(f"{dir}", True, (255, 255, 255))
-        SCREEN.blit(label, (start_x + i * 40, start_y + max_bar_height + 5))
+SIM_SPEED = 1.0  # simulated seconds per wall-clock second (10.0 = 10x fast-forward)
+RENDER_FPS = FPS  # frames drawn per second; the simulation always ticks at FPS
+DIRTY_RECTS = True  # only push the screen areas that changed (False: full update every frame)
+dirty = DirtyRects((WIDTH, HEIGHT), enabled=DIRTY_RECTS)
+
+text_cache = TextCache()
 
+def render_panel_background(w, h, color=(0, 0, 0, 160)):
+    s = pygame.Surface((w, h), pygame.SRCALPHA)
+    s.fill(color)
+    return s
+
+# translucent panel backgrounds, by size and color
+panel_backgrounds = SurfaceCache(render_panel_background)
 
 # ----- Drawing helpers -----
-def draw_traffic_light(x, y, active_color):
-    pygame.draw.rect(SCREEN, SIGNAL_BOX, (x, y, 30, 70), border_radius=5)
+def render_traffic_light(active_color):
+    surface = pygame.Surface((30, 70), pygame.SRCALPHA)
+    pygame.draw.rect(surface, SIGNAL_BOX, (0, 0, 30, 70), border_radius=5)
     colors = [RED, YELLOW, GREEN]
     for i, color in enumerate(colors):
         light_color = color if color == active_color else (100, 100, 100)
-        pygame.draw.circle(SCREEN, light_color, (x + 15, y + 10 + 25 * i), 7)
+        pygame.draw.circle(surface, light_color, (15, 10 + 25 * i), 7)
+    return surface
 
-def draw_intersection():
+# one rasterized light per lamp state; drawing is a single blit
+traffic_lights = SurfaceCache(render_traffic_light)
+
+def draw_traffic_light(x, y, active_color):
+    return SCREEN.blit(traffic_lights.get(active_color), (x, y))
+
+def render_background():
     # draw background and roads
-    SCREEN.fill(BG_COLOR)
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+    surface.fill(BG_COLOR)
+    pygame.draw.rect(surface, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))
+    pygame.draw.rect(surface, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))
     # central box
-    pygame.draw.rect(SCREEN, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
+    pygame.draw.rect(surface, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
     # lane separators
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    return surface
 
-def draw_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_width):
+def draw_intersection():
+    SCREEN.blit(background, (0, 0))
+
+def paint_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_width):
     """
     Draws top-down rectangle vehicle oriented according to direction.
     x,y are top-left coordinates as existing code expects.
@@ -144,323 +145,70 @@ def draw_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_w
         elif sprite_type == 'car':
             pygame.draw.polygon(screen, (200, 200, 200), [(x + 8, y + 4), (x + 8, y + vehicle_width - 4), (x + 3, y + vehicle_width // 2)])
 
-# ----- Vehicle class -----
-class Car:
-    SPEED = 2
-
-    def __init__(self, direction, vehicle_type):
-        self.direction = direction
-        self.vehicle_type = vehicle_type
-        self.sprite_type = vehicle_type
-        self.vehicle_length = 60 if self.sprite_type == 'bus' else 40
-        self.vehicle_width = 20
-        self.stopped = False
-        self.committed = False
-        self.queued_time = None
-        self.spawn_time = time.time()
-        self.crossed = False
-
-        if direction == "N":
-            self.x = WIDTH // 2 - 15
-            self.y = -self.vehicle_length
-        elif direction == "S":
-            self.x = WIDTH // 2 + 15
-            self.y = HEIGHT + self.vehicle_length
-        elif direction == "E":
-            self.x = WIDTH + self.vehicle_length
-            self.y = HEIGHT // 2 - 15
-        elif direction == "W":
-            self.x = -self.vehicle_length
-            self.y = HEIGHT // 2 + 15
-
-    @property
-    def is_emergency(self):
-        return self.vehicle_type in ("ambulance", "fire")
-
-    def _near_intersection_region(self):
-        cx, cy = WIDTH // 2, HEIGHT // 2
-        if self.direction == "N":
-            return self.y + self.vehicle_length >= cy - 300
-        if self.direction == "S":
-            return self.y - self.vehicle_length <= cy + 300
-        if self.direction == "E":
-            return self.x - self.vehicle_length <= cx + 300
-        if self.direction == "W":
-            return self.x + self.vehicle_length >= cx - 300
-
-    def will_move_this_frame(self, cars):
-        front_car = self.get_front_car(cars)
-        if self.direction == "N":
-            stop_line = HEIGHT // 2 - 60
-            if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
-                return True
-            return False
-        elif self.direction == "S":
-            stop_line = HEIGHT // 2 + 60
-            if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y > stop_line and self.safe_to_move(front_car)):
-                return True
-            return False
-        elif self.direction == "E":
-            stop_line = WIDTH // 2 + 60
-            if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x > stop_line and self.safe_to_move(front_car)):
-                return True
-            return False
-        elif self.direction == "W":
-            stop_line = WIDTH // 2 - 60
-            if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
-                return True
-            return False
-
-    def move(self, cars):
-        front_car = self.get_front_car(cars)
-        will_move = self.will_move_this_frame(cars)
-        if not will_move and self.queued_time is None and not self.committed and self._near_intersection_region():
-            self.queued_time = time.time()
-
-        if self.direction == "N":
-            stop_line = HEIGHT // 2 - 60
-            if not self.committed and self.can_pass() and self.y + self.vehicle_length >= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
-            if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
-                self.y += Car.SPEED
-
-        elif self.direction == "S":
-            stop_line = HEIGHT // 2 + 60
-            if not self.committed and self.can_pass() and self.y <= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
-            if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y > stop_line and self.safe_to_move(front_car)):
-                self.y -= Car.SPEED
-
-        elif self.direction == "E":
-            stop_line = WIDTH // 2 + 60
-            if not self.committed and self.can_pass() and self.x <= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
-            if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x > stop_line and self.safe_to_move(front_car)):
-                self.x -= Car.SPEED
-
-        elif self.direction == "W":
-            stop_line = WIDTH // 2 - 60
-            if not self.committed and self.can_pass() and self.x + self.vehicle_length >= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
-            if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
-                self.x += Car.SPEED
-
-        if not self.crossed:
-            if self.direction == "N" and self.y >= HEIGHT // 2:
-                self.crossed = True
-            if self.direction == "S" and self.y <= HEIGHT // 2:
-                self.crossed = True
-            if self.direction == "E" and self.x <= WIDTH // 2:
-                self.crossed = True
-            if self.direction == "W" and self.x >= WIDTH // 2:
-                self.crossed = True
-
-    def safe_to_move(self, front_car):
-        if not front_car:
-            return True
-        if self.direction == "N":
-            return front_car.y - (self.y + self.vehicle_length) > SAFE_DISTANCE
-        elif self.direction == "S":
-            return self.y - (front_car.y + front_car.vehicle_length) > SAFE_DISTANCE
-        elif self.direction == "E":
-            return self.x - (front_car.x + front_car.vehicle_length) > SAFE_DISTANCE
-        elif self.direction == "W":
-            return front_car.x - (self.x + self.vehicle_length) > SAFE_DISTANCE
-
-    def get_front_car(self, cars):
-        same_lane_cars = [car for car in cars if car.direction == self.direction and car != self]
-        if self.direction == "N":
-            same_lane_cars = [car for car in same_lane_cars if car.y > self.y]
-            return min(same_lane_cars, key=lambda c: c.y, default=None)
-        elif self.direction == "S":
-            same_lane_cars = [car for car in same_lane_cars if car.y < self.y]
-            return max(same_lane_cars, key=lambda c: c.y, default=None)
-        elif self.direction == "E":
-            # eastbound cars front car should be the one with smaller x than this
-            same_lane_cars = [car for car in same_lane_cars if car.x < self.x]
-            return max(same_lane_cars, key=lambda c: c.x, default=None)
-        elif self.direction == "W":
-            same_lane_cars = [car for car in same_lane_cars if car.x > self.x]
-            return min(same_lane_cars, key=lambda c: c.x, default=None)
-
-    def can_pass(self):
-        return DIRECTIONS[light_index] == self.direction and light_state == "GREEN"
-
-    def draw(self):
-        # draw this vehicle using the shared draw_vehicle()
-        draw_vehicle(SCREEN, self.x, self.y, self.direction, self.sprite_type, self.vehicle_length, self.vehicle_width)
-
-# ----- Simulation lists / helpers -----
-cars = []
-
-def spawn_too_close(direction):
-    for c in cars:
-        if c.direction != direction:
-            continue
-        if direction == "N" and c.y < SAFE_DISTANCE:
-            return True
-        if direction == "S" and c.y > HEIGHT - SAFE_DISTANCE:
-            return True
-        if direction == "E" and c.x > WIDTH - SAFE_DISTANCE:
-            return True
-        if direction == "W" and c.x < SAFE_DISTANCE:
-            return True
-    return False
-
-def spawn_car():
-    if random.randint(0, SPAWN_CHANCE) == 0:
-        direction = random.choice(DIRECTIONS)
-        if spawn_too_close(direction):
-            return
-        r = random.random()
-        if r < 0.7:
-            vehicle_type = "car"
-        else:
-            vehicle_type = "bus"
-        cars.append(Car(direction, vehicle_type))
-
-# ----- Light state machine -----
-light_index = 0
-light_state = "GREEN"  # GREEN, START_SWITCH, WAIT_CLEAR, DELAY
-green_start_time = time.time()
-switch_request_time = None
-clear_start_time = None
-delay_start_time = None
-
-last_switch_time = time.time()
-last_served = {d: time.time() for d in DIRECTIONS}
-
-def get_queue_counts():
-    counts = {d: 0 for d in DIRECTIONS}
-    for c in cars:
-        counts[c.direction] += 1
-    return counts
-
-def choose_next_direction(exclude_dir=None):
-    counts = get_queue_counts()
-    now = time.time()
-    starving = [d for d in DIRECTIONS if now - last_served.get(d, 0) >= STARVE_TIME]
-    if exclude_dir:
-        starving = [d for d in starving if d != exclude_dir]
-    if starving:
-        best = max(starving, key=lambda d: counts.get(d, 0))
-        return DIRECTIONS.index(best)
-    if counts:
-        max_count = max(counts.values())
+SPRITE_MARGIN = 2  # wheels stick out a pixel past the vehicle's x/y box
+
+def render_vehicle(direction, sprite_type, vehicle_length, vehicle_width):
+    if direction in ["N", "S"]:
+        size = (vehicle_width + 2 * SPRITE_MARGIN, vehicle_length + 2 * SPRITE_MARGIN)
     else:
-        max_count = 0
-    if max_count == 0:
-        # no queues; rotate to next to avoid permanent same dir
-        return (light_index + 1) % 4
-    best_dirs = [d for d, cnt in counts.items() if cnt == max_count]
-    if exclude_dir:
-        best_dirs = [d for d in best_dirs if d != exclude_dir]
-        if not best_dirs:
-            for d in DIRECTIONS:
-                if d != exclude_dir:
-                    return DIRECTIONS.index(d)
-            return light_index
-    current_dir = DIRECTIONS[light_index]
-    if current_dir in best_dirs:
-        return light_index
-    return DIRECTIONS.index(best_dirs[0])
-
-# ----- Emergency & metrics -----
-emergency_override = False
-emergency_direction = None
-
-sim_start_time = time.time()
-total_wait_time = 0.0
-total_served_waits = 0
-throughput_count = 0
-
-def record_wait_time(queued_time):
-    global total_wait_time, total_served_waits
-    if queued_time is None:
-        return
-    wait = time.time() - queued_time
-    total_wait_time += wait
-    total_served_waits += 1
-
-def get_average_wait():
-    if total_served_waits == 0:
-        return 0.0
-    return total_wait_time / total_served_waits
-
-def get_throughput_per_minute():
-    elapsed_minutes = (time.time() - sim_start_time) / 60.0
-    if elapsed_minutes <= 0:
-        return 0.0
-    return throughput_count / elapsed_minutes
+        size = (vehicle_length + 2 * SPRITE_MARGIN, vehicle_width + 2 * SPRITE_MARGIN)
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    paint_vehicle(surface, SPRITE_MARGIN, SPRITE_MARGIN, direction, sprite_type, vehicle_length, vehicle_width)
+    return surface
+
+# each (direction, type, length, width) is painted once; a vehicle then costs one blit
+vehicle_sprites = SurfaceCache(render_vehicle)
+
+def draw_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_width):
+    sprite = vehicle_sprites.get(direction, sprite_type, vehicle_length, vehicle_width)
+    return screen.blit(sprite, (x - SPRITE_MARGIN, y - SPRITE_MARGIN))
+
+# ----- Simulation -----
+SEED = None  # set to an int to replay exactly the same traffic
+TRIP_LOG = None  # file path (.parquet or .csv) to log every vehicle that leaves the screen
+
 
 def draw_metrics():
     # small translucent box at top-left with overall metrics (keeps original behavior)
-    avg_wait = get_average_wait()
-    tpm = get_throughput_per_minute()
-    counts = get_queue_counts()
-    queued_counts = {d: 0 for d in DIRECTIONS}
-    for c in cars:
-        if c.queued_time is not None:
-            queued_counts[c.direction] += 1
+    avg_wait = sim.get_average_wait()
+    recent_throughput = sim.get_recent_throughput()
+    queued_counts = sim.get_queued_counts()
+    p50, p95, p99 = sim.get_wait_quantiles()
     lines = [
         f"Avg wait (s): {avg_wait:.2f}",
-        f"Throughput (total): {throughput_count}",
-        f"Throughput (per min): {tpm:.2f}",
+        f"Wait p50/p95/p99 (s): {p50:.1f} / {p95:.1f} / {p99:.1f}",
+        f"Throughput (total): {sim.throughput_count}",
+        "Throughput/min 1/5/15m: " + " / ".join(f"{recent_throughput[w]:.1f}" for w in WINDOWS),
         f"Queue N: {queued_counts['N']} E: {queued_counts['E']} S: {queued_counts['S']} W: {queued_counts['W']}",
-        f"Total vehicles on road: {len(cars)}",
-        f"Light State: {light_state} | Green Dir: {DIRECTIONS[light_index]}"
+        f"Total vehicles on road: {len(sim.vehicles)}",
+        f"Light State: {sim.light_state} | Green Dir: {DIRECTIONS[sim.light_index]}"
     ]
     padding = 8
     box_w = 340
     box_h = 20 * len(lines) + padding * 2
     box_x = 10
     box_y = 10
-    s = pygame.Surface((box_w, box_h), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 160))
-    SCREEN.blit(s, (box_x, box_y))
+    SCREEN.blit(panel_backgrounds.get(box_w, box_h), (box_x, box_y))
     for i, line in enumerate(lines):
-        txt = FONT.render(line, True, (255, 255, 255))
-        SCREEN.blit(txt, (box_x + padding, box_y + padding + i * 20))
+        txt = text_cache.render(FONT, line, (255, 255, 255))
+        dirty.track(("metrics", i), SCREEN.blit(txt, (box_x + padding, box_y + padding + i * 20)), line)
+    dirty.track("metrics", (box_x, box_y, box_w, box_h))
 
 # ----- Bar graphs integration (top-right: counts, bottom-right: waits) -----
-def draw_bar_graphs():
-    counts = get_queue_counts()
-    # compute average wait per direction using queued_time lists (current waiting vehicles)
-    wait_times = {d: [] for d in DIRECTIONS}
-    for c in cars:
-        if c.queued_time is not None:
-            wait_times[c.direction].append(time.time() - c.queued_time)
-    avg_wait_dir = {}
-    for d in DIRECTIONS:
-        avg_wait_dir[d] = sum(wait_times[d]) / len(wait_times[d]) if wait_times[d] else 0.0
-
+def paint_count_bars(surface, counts):
     # --- Top-right: Horizontal vehicle count bars (in green box) ---
-    graph_w = 320
-    graph_h = 220
-    padding_top = 80  # space from top
-    padding_right = 11
-    x_offset = WIDTH - graph_w - padding_right
-    y_offset = padding_top
+    # layer-local coordinates; draw_bar_graphs places the panel
+    graph_w, graph_h = surface.get_size()
+    x_offset = 0
+    y_offset = 0
 
     # background box
-    pygame.draw.rect(SCREEN, (0, 115, 0), (x_offset, y_offset, graph_w, graph_h), border_radius=10)
+    pygame.draw.rect(surface, (0, 115, 0), (x_offset, y_offset, graph_w, graph_h), border_radius=10)
     inner_padding = 10
 
     # Title
-    title = FONT.render("Vehicle Counts", True, (255, 255, 255))
-    SCREEN.blit(title, (x_offset + inner_padding, y_offset + inner_padding))
+    title = text_cache.render(FONT, "Vehicle Counts", (255, 255, 255))
+    surface.blit(title, (x_offset + inner_padding, y_offset + inner_padding))
 
     counts_area_top = y_offset + inner_padding + 24
     counts_area_left = x_offset + inner_padding + 90
@@ -468,187 +216,131 @@ def draw_bar_graphs():
     bar_height = 22
     spacing = 38
 
-    max_queue = max(counts.values()) if any(counts.values()) else 1
+    max_queue = max(counts) if any(counts) else 1
     for i, dir in enumerate(DIRECTIONS):
-        count = counts[dir]
+        count = counts[i]
         length = int((count / max_queue) * counts_area_width) if max_queue > 0 else 0
         bar_x = counts_area_left
         bar_y = counts_area_top + i * spacing
         # background (track)
-        pygame.draw.rect(SCREEN, (25, 25, 25), (bar_x, bar_y, counts_area_width, bar_height), border_radius=6)
+        pygame.draw.rect(surface, (25, 25, 25), (bar_x, bar_y, counts_area_width, bar_height), border_radius=6)
         # actual bar
-        pygame.draw.rect(SCREEN, (0, 200, 0), (bar_x, bar_y, length, bar_height), border_radius=6)
+        pygame.draw.rect(surface, (0, 200, 0), (bar_x, bar_y, length, bar_height), border_radius=6)
         # direction label
-        dir_label = FONT.render(f"{dir}", True, (255, 255, 255))
-        SCREEN.blit(dir_label, (x_offset + inner_padding + 8, bar_y + (bar_height // 2) - 8))
+        dir_label = text_cache.render(FONT, f"{dir}", (255, 255, 255))
+        surface.blit(dir_label, (x_offset + inner_padding + 8, bar_y + (bar_height // 2) - 8))
         # numeric count (position right after bar; handle overflow)
-        count_label = FONT.render(str(count), True, (255, 255, 255))
+        count_label = text_cache.render(FONT, str(count), (255, 255, 255))
         if length + 12 < counts_area_width:
-            SCREEN.blit(count_label, (bar_x + length + 8, bar_y + (bar_height // 2) - 8))
+            surface.blit(count_label, (bar_x + length + 8, bar_y + (bar_height // 2) - 8))
         else:
-            SCREEN.blit(count_label, (bar_x + counts_area_width - 20, bar_y + (bar_height // 2) - 8))
+            surface.blit(count_label, (bar_x + counts_area_width - 20, bar_y + (bar_height // 2) - 8))
 
     # legend
-    small = pygame.font.SysFont("Arial", 12)
-    legend1 = small.render("Counts →", True, (255, 255, 255))
-    SCREEN.blit(legend1, (x_offset + graph_w - inner_padding - 70, y_offset + inner_padding + 4))
+    legend1 = text_cache.render(SMALL_FONT, "Counts →", (255, 255, 255))
+    surface.blit(legend1, (x_offset + graph_w - inner_padding - 70, y_offset + inner_padding + 4))
+
+WAIT_AREA_HEIGHT = 200 - (10 * 2) - 40  # graph_h2 - (inner_padding * 2) - 40
 
+def paint_wait_bars(surface, bars):
     # --- Bottom-right: Vertical average wait bars (in separate box) ---
-    graph_w2 = 300
-    graph_h2 = 200
-    padding_bottom = 100
-    x_offset2 = WIDTH - graph_w2 - padding_right
-    y_offset2 = HEIGHT - graph_h2 - padding_bottom
+    # bars is (height, label) per direction; layer-local coordinates
+    graph_w2, graph_h2 = surface.get_size()
+    x_offset2 = 0
+    y_offset2 = 0
+    inner_padding = 10
 
     # background box
-    pygame.draw.rect(SCREEN, (80, 0, 0), (x_offset2, y_offset2, graph_w2, graph_h2), border_radius=10)
+    pygame.draw.rect(surface, (80, 0, 0), (x_offset2, y_offset2, graph_w2, graph_h2), border_radius=10)
 
     # title
-    title2 = FONT.render("Avg Wait (s) per Direction", True, (255, 255, 255))
-    SCREEN.blit(title2, (x_offset2 + inner_padding, y_offset2 + inner_padding))
+    title2 = text_cache.render(FONT, "Avg Wait (s) per Direction", (255, 255, 255))
+    surface.blit(title2, (x_offset2 + inner_padding, y_offset2 + inner_padding))
 
     # plotting area
     vert_area_top = y_offset2 + inner_padding + 26
-    vert_area_height = graph_h2 - (inner_padding * 2) - 40
+    vert_area_height = WAIT_AREA_HEIGHT
     bar_w = 34
     gap = 22
 
-    waits = [avg_wait_dir[d] for d in DIRECTIONS]
-    max_wait = max(max(waits), 1.0)  # avoid 0
-
     # small axis line
     axis_y = vert_area_top + vert_area_height + 6
-    pygame.draw.line(SCREEN, (200, 200, 200), (x_offset2 + inner_padding + 6, axis_y), (x_offset2 + inner_padding + 6 + (bar_w + gap) * len(DIRECTIONS) - gap, axis_y), 2)
+    pygame.draw.line(surface, (200, 200, 200), (x_offset2 + inner_padding + 6, axis_y), (x_offset2 + inner_padding + 6 + (bar_w + gap) * len(DIRECTIONS) - gap, axis_y), 2)
 
     for i, dir in enumerate(DIRECTIONS):
-        wtime = avg_wait_dir[dir]
-        height = int((wtime / max_wait) * vert_area_height) if max_wait > 0 else 0
+        height, label = bars[i]
         bar_x = x_offset2 + inner_padding + 6 + i * (bar_w + gap)
         bar_y = vert_area_top + (vert_area_height - height)
-        pygame.draw.rect(SCREEN, (220, 60, 60), (bar_x, bar_y, bar_w, height), border_radius=6)
+        pygame.draw.rect(surface, (220, 60, 60), (bar_x, bar_y, bar_w, height), border_radius=6)
         # direction label under bar
-        txt_dir = FONT.render(dir, True, (255, 255, 255))
-        SCREEN.blit(txt_dir, (bar_x + (bar_w // 2) - 6, axis_y + 6))
+        txt_dir = text_cache.render(FONT, dir, (255, 255, 255))
+        surface.blit(txt_dir, (bar_x + (bar_w // 2) - 6, axis_y + 6))
         # numeric wait above bar
-        txt_wait = SMALL_FONT.render(f"{wtime:.1f}s", True, (255, 255, 255))
-        SCREEN.blit(txt_wait, (bar_x + (bar_w // 2) - 10, bar_y - 16))
+        txt_wait = text_cache.render(SMALL_FONT, label, (255, 255, 255))
+        surface.blit(txt_wait, (bar_x + (bar_w // 2) - 10, bar_y - 16))
 
     # small legend
-    legend_wait = small.render("Current queued avg (s)", True, (255, 255, 255))
-    SCREEN.blit(legend_wait, (x_offset2 + graph_w2 - inner_padding - 170, y_offset2 + graph_h2 - inner_padding - 18))
+    legend_wait = text_cache.render(SMALL_FONT, "Current queued avg (s)", (255, 255, 255))
+    surface.blit(legend_wait, (x_offset2 + graph_w2 - inner_padding - 170, y_offset2 + graph_h2 - inner_padding - 18))
+
+# the panels are only repainted when a count, bar height or label changes
+count_bars_layer = Layer((320, 220), paint_count_bars)
+wait_bars_layer = Layer((300, 200), paint_wait_bars)
+
+def draw_bar_graphs():
+    counts = sim.get_queue_counts()
+    # average wait per direction of the vehicles queued right now
+    avg_wait_dir = sim.get_current_waits()
+
+    padding_top = 80  # space from top
+    padding_right = 11
+    count_bars = count_bars_layer.get(tuple(counts[d] for d in DIRECTIONS))
+    dirty.track("count_bars", SCREEN.blit(count_bars, (WIDTH - 320 - padding_right, padding_top)),
+                count_bars_layer.state)
+
+    waits = [avg_wait_dir[d] for d in DIRECTIONS]
+    max_wait = max(max(waits), 1.0)  # avoid 0
+    bars = tuple((int((wtime / max_wait) * WAIT_AREA_HEIGHT) if max_wait > 0 else 0, f"{wtime:.1f}s")
+                 for wtime in waits)
+    padding_bottom = 100
+    wait_bars = wait_bars_layer.get(bars)
+    dirty.track("wait_bars", SCREEN.blit(wait_bars, (WIDTH - 300 - padding_right, HEIGHT - 200 - padding_bottom)),
+                wait_bars_layer.state)
 
 # ----- Audio / Siren detection UI -----
 BUTTON_RECT = pygame.Rect(10, 10 + 20 * 7 + 16, 260, 30)
 listening_for_siren = False
-audio_thread = None
-audio_lock = threading.Lock()
-last_audio_trigger = 0
-audio_cooldown = 3.0
-fs = 44100
-chunk_duration = 1.0
-freq_low = 500
-freq_high = 2000
-energy_threshold = 0.005
 
-def set_green_for_emergency(direction):
-    global light_state, light_index, green_start_time, switch_request_time, clear_start_time, delay_start_time, last_switch_time
-    # Set the light_index to emergency direction and force immediate GREEN state
-    light_index = DIRECTIONS.index(direction)
-    light_state = "GREEN"
-    green_start_time = time.time()
-    switch_request_time = None
-    clear_start_time = None
-    delay_start_time = None
-    last_switch_time = time.time()
-    last_served[direction] = time.time()
-
-def audio_listener_loop():
-    global listening_for_siren, cars, emergency_override, emergency_direction, light_index, last_served, last_switch_time, last_audio_trigger
-    while listening_for_siren:
-        try:
-            rec = sd.rec(int(chunk_duration * fs), samplerate=fs, channels=1, dtype='float32')
-            sd.wait()
-            sig = rec.flatten()
-            if sig.size == 0:
-                continue
-            win = np.hanning(len(sig))
-            sig_win = sig * win
-            fft = np.abs(np.fft.rfft(sig_win))
-            freqs = np.fft.rfftfreq(len(sig_win), 1.0 / fs)
-            band_idx = np.where((freqs >= freq_low) & (freqs <= freq_high))[0]
-            if band_idx.size == 0:
-                continue
-            band_energy = np.sum(fft[band_idx])
-            total_energy = np.sum(fft) + 1e-9
-            ratio = band_energy / total_energy
-            now = time.time()
-            if ratio > energy_threshold and now - last_audio_trigger > audio_cooldown:
-                last_audio_trigger = now
-                vehicle_type = random.choice(["ambulance", "fire"])
-                direction = random.choice(DIRECTIONS)
-                with audio_lock:
-                    if not spawn_too_close(direction):
-                        cars.append(Car(direction, vehicle_type))
-                        prioritized_dir = direction
-                        # Immediately set emergency override and switch to that direction using the state machine:
-                        emergency_override = True
-                        emergency_direction = prioritized_dir
-                        # Force state machine to green for emergency
-                        set_green_for_emergency(prioritized_dir)
-        except Exception:
-            time.sleep(0.1)
-    return
-
-MAX_VEHICLE_SIZE = 60
-
-# ----- Virtual IoT clearance function -----
-def intersection_clear():
-    """
-    Virtual IoT sensor: return True if no vehicle is inside the central intersection box.
-    Intersection box is WIDTH//2 - 60 .. +60 and HEIGHT//2 -60 .. +60.
-    """
-    left = WIDTH//2 - 60
-    right = WIDTH//2 + 60
-    top = HEIGHT//2 - 60
-    bottom = HEIGHT//2 + 60
-    for c in cars:
-        # compute approximate bounding box of car as drawn
-        if c.direction in ("N", "S"):
-            rect_left = c.x + 2
-            rect_top = c.y + 5
-            rect_right = rect_left + max(1, c.vehicle_width - 4)
-            rect_bottom = rect_top + max(1, c.vehicle_length - 10)
-        else:
-            # E/W oriented
-            rect_left = c.x + 5
-            rect_top = c.y + 2
-            rect_right = rect_left + max(1, c.vehicle_length - 10)
-            rect_bottom = rect_top + max(1, c.vehicle_width - 4)
-
-        # check overlap with central box
-        if not (rect_right < left or rect_left > right or rect_bottom < top or rect_top > bottom):
-            # vehicle overlaps central area => intersection NOT clear
-            return False
-    return True
+def on_siren():
+    # called from the main loop between two ticks
+    vehicle_type = sim.streams.emergency.choice(["ambulance", "fire"])
+    direction = sim.streams.emergency.choice(DIRECTIONS)
+    # spawns the vehicle and forces the state machine to green for it
+    sim.spawn_emergency(direction, vehicle_type)
+
+# visual debug message while the state machine waits for the intersection to clear
+WAIT_CLEAR_MESSAGES = {
+    "START_SWITCH": "Waiting for intersection to clear...",
+    "WAIT_CLEAR": "Waiting for intersection to clear...",
+    "DELAY": f"Intersection clear — delaying {CLEAR_DELAY:g}s before switch",
+}
 
 # ----- Main loop -----
 def main_loop():
-    global listening_for_siren, audio_thread, light_state, light_index, green_start_time, switch_request_time
-    global clear_start_time, delay_start_time, emergency_override, emergency_direction, throughput_count, last_served
+    global listening_for_siren
 
     # A small pre-spawn so simulation isn't empty initially
     for _ in range(12):
-        spawn_car()
-
-    # visual debug message when WAIT_CLEAR is active
-    wait_clear_msg = ""
+        sim.spawn_car()
 
+    scheduler = FrameScheduler(sim.clock.tick_length, speed=SIM_SPEED, render_fps=RENDER_FPS)
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 listening_for_siren = False
-                if audio_thread and audio_thread.is_alive():
-                    audio_thread.join(timeout=0.5)
+                siren_monitor.close()
+                if sim.trip_log is not None:
+                    sim.trip_log.close()
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -656,120 +348,45 @@ def main_loop():
                     # toggle listening
                     if not listening_for_siren:
                         listening_for_siren = True
-                        audio_thread = threading.Thread(target=audio_listener_loop, daemon=True)
-                        audio_thread.start()
+                        sim.listening_for_siren = True
+                        siren_monitor.start()
                     else:
                         listening_for_siren = False
+                        sim.listening_for_siren = False
+                        siren_monitor.stop(timeout=0)
 
-        now = time.time()
-
-        # spawn and move vehicles
-        spawn_car()
-        for car in cars[:]:
-            car.move(cars)
-
-        # remove off-screen cars and account throughput/waits
-        new_cars = []
-        for car in cars:
-            if -MAX_VEHICLE_SIZE <= car.x <= WIDTH + MAX_VEHICLE_SIZE and -MAX_VEHICLE_SIZE <= car.y <= HEIGHT + MAX_VEHICLE_SIZE:
-                new_cars.append(car)
-            else:
-                if car.crossed:
-                    throughput_count += 1
-                if car.queued_time is not None:
-                    record_wait_time(car.queued_time)
-                    car.queued_time = None
-
-        # emergency detection and override handling
-        emergency_cars = [c for c in new_cars if c.is_emergency]
-        if emergency_cars:
-            def dist_to_center(car):
-                cx, cy = WIDTH // 2, HEIGHT // 2
-                car_center_x = car.x + (car.vehicle_width / 2 if car.direction in ["N", "S"] else car.vehicle_length / 2)
-                car_center_y = car.y + (car.vehicle_length / 2 if car.direction in ["N", "S"] else car.vehicle_width / 2)
-                return (car_center_x - cx) ** 2 + (car_center_y - cy) ** 2
-            prioritized = min(emergency_cars, key=dist_to_center)
-            desired_dir = prioritized.direction
-            if (not emergency_override) or (emergency_direction != desired_dir):
-                emergency_override = True
-                emergency_direction = desired_dir
-                # Force emergency green using state machine helper
-                set_green_for_emergency(desired_dir)
-        else:
-            if emergency_override and not listening_for_siren:
-                just_cleared = emergency_direction
-                emergency_override = False
-                emergency_direction = None
-                last_served[just_cleared] = now
-                # request a switch out of the just cleared direction
-                if light_state == "GREEN":
-                    light_state = "START_SWITCH"
-                    switch_request_time = time.time()
-
-        cars[:] = new_cars
-
-        # ----- State Machine (with IoT clearance every cycle) -----
-        if light_state == "GREEN":
-            elapsed_green = now - green_start_time
-            need_switch = False
-            if elapsed_green >= MAX_GREEN:
-                need_switch = True
-            elif elapsed_green >= MIN_GREEN:
-                suggested = choose_next_direction()
-                if suggested != light_index:
-                    need_switch = True
-            if need_switch and not emergency_override:
-                light_state = "START_SWITCH"
-                switch_request_time = now
-
-        elif light_state == "START_SWITCH":
-            # Enter WAIT_CLEAR so that IoT sensors check the intersection each cycle
-            light_state = "WAIT_CLEAR"
-            clear_start_time = time.time()
-            wait_clear_msg = "Waiting for intersection to clear..."  # visual message
-
-        elif light_state == "WAIT_CLEAR":
-            # Check virtual IoT sensors: don't switch until intersection clear
-            if intersection_clear():
-                # intersection clear now, start the 3s grace delay
-                light_state = "DELAY"
-                delay_start_time = time.time()
-                wait_clear_msg = "Intersection clear — delaying 3s before switch"
-            else:
-                # keep waiting; remain in WAIT_CLEAR state
-                wait_clear_msg = "Waiting for intersection to clear..."
-                # nothing else here — we stay until clear
-
-        elif light_state == "DELAY":
-            # After intersection was clear, wait additional grace period (3 seconds)
-            if now - delay_start_time >= 1.0:
-                prev_dir = DIRECTIONS[light_index]
-                next_idx = choose_next_direction(exclude_dir=prev_dir)
-                light_index = next_idx
-                light_state = "GREEN"
-                green_start_time = time.time()
-                last_served[DIRECTIONS[light_index]] = time.time()
-                wait_clear_msg = ""
+        if listening_for_siren:
+            for _ in siren_monitor.poll():
+                on_siren()
+        for _ in range(scheduler.ticks_due()):
+            sim.step()
+        if not scheduler.should_render():
+            continue
 
         # ----- Rendering -----
         draw_intersection()
 
         # draw vehicles
-        for car in cars:
-            car.draw()
+        store = sim.vehicles
+        for vid, x, y, d, kind, length in zip(store.id.tolist(), store.x.tolist(), store.y.tolist(),
+                                              store.direction().tolist(), store.kind.tolist(),
+                                              store.length.tolist()):
+            rect = draw_vehicle(SCREEN, int(x), int(y), DIRECTIONS[d], VEHICLE_TYPES[kind], int(length), VEHICLE_WIDTH)
+            dirty.track(("vehicle", vid), rect)
 
         # draw signals (so they appear over vehicles)
         for i, direction in enumerate(DIRECTIONS):
-            is_active = (i == light_index and light_state == "GREEN")
+            is_active = (i == sim.light_index and sim.light_state == "GREEN")
             light_color = GREEN if is_active else RED
             if direction == "N":
-                draw_traffic_light(WIDTH // 2 - 45, HEIGHT // 2 - 130, light_color)
+                rect = draw_traffic_light(WIDTH // 2 - 45, HEIGHT // 2 - 130, light_color)
             elif direction == "E":
-                draw_traffic_light(WIDTH // 2 + 70, HEIGHT // 2 - 15, light_color)
+                rect = draw_traffic_light(WIDTH // 2 + 70, HEIGHT // 2 - 15, light_color)
             elif direction == "S":
-                draw_traffic_light(WIDTH // 2 + 45, HEIGHT // 2 + 60, light_color)
+                rect = draw_traffic_light(WIDTH // 2 + 45, HEIGHT // 2 + 60, light_color)
             elif direction == "W":
-                draw_traffic_light(WIDTH // 2 - 70, HEIGHT // 2 - 15, light_color)
+                rect = draw_traffic_light(WIDTH // 2 - 70, HEIGHT // 2 - 15, light_color)
+            dirty.track(("light", direction), rect, light_color)
 
         # draw left-top metrics (original compact panel)
         draw_metrics()
@@ -778,31 +395,51 @@ def main_loop():
         draw_bar_graphs()
 
         # Draw WAIT_CLEAR visual message (center-top, small translucent box)
+        wait_clear_msg = WAIT_CLEAR_MESSAGES.get(sim.light_state, "")
         if wait_clear_msg:
             msg_w = 360
             msg_h = 30
             msg_x = (WIDTH - msg_w) // 2
             msg_y = 8
-            s = pygame.Surface((msg_w, msg_h), pygame.SRCALPHA)
-            s.fill((0, 0, 0, 150))
+            s = panel_backgrounds.get(msg_w, msg_h, (0, 0, 0, 150))
             SCREEN.blit(s, (msg_x, msg_y))
-            txt = FONT.render(wait_clear_msg, True, (255, 255, 255))
-            SCREEN.blit(txt, (msg_x + 10, msg_y + 6))
+            txt = text_cache.render(FONT, wait_clear_msg, (255, 255, 255))
+            dirty.track("wait_clear_text", SCREEN.blit(txt, (msg_x + 10, msg_y + 6)), wait_clear_msg)
+            dirty.track("wait_clear", (msg_x, msg_y, msg_w, msg_h))
 
         # draw audio button (left)
         mouse_pos = pygame.mouse.get_pos()
+        dirty.track("button", BUTTON_RECT, BUTTON_RECT.collidepoint(mouse_pos))
         if BUTTON_RECT.collidepoint(mouse_pos):
             pygame.draw.rect(SCREEN, (220, 220, 0), BUTTON_RECT, border_radius=4)
         else:
             pygame.draw.rect(SCREEN, (200, 200, 0), BUTTON_RECT, border_radius=4)
         if listening_for_siren:
-            txt = FONT.render("Listening for Siren (click to stop)", True, (0, 0, 0))
+            txt = text_cache.render(FONT, "Listening for Siren (click to stop)", (0, 0, 0))
         else:
-            txt = FONT.render("Start Siren Detection (click to start)", True, (0, 0, 0))
-        SCREEN.blit(txt, (BUTTON_RECT.x + 6, BUTTON_RECT.y + 6))
+            txt = text_cache.render(FONT, "Start Siren Detection (click to start)", (0, 0, 0))
+        dirty.track("button_text", SCREEN.blit(txt, (BUTTON_RECT.x + 6, BUTTON_RECT.y + 6)), listening_for_siren)
 
-        pygame.display.update()
-        clock.tick(FPS)
+        dirty.flush()
+        clock.tick(RENDER_FPS)
 
 if __name__ == "__main__":
+    # window, fonts, simulation and siren monitor only exist when run as a script: the monitor's
+    # spawned process imports this module again and must not open a window of its own
+    if detector_engine == "goertzel":
+        siren_detector = GoertzelDetector(fs, audio_window, hop=audio_hop)
+    else:
+        siren_detector = SpectralDetector(fs, audio_window, freq_low, freq_high, energy_threshold)
+    siren_monitor = SirenMonitor(siren_detector, hop=audio_hop, cooldown=audio_cooldown, fs=fs)
+
+    pygame.init()
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Traffic Intersection Simulation (State Machine + Virtual IoT Clearance)")
+    FONT = pygame.font.SysFont("Arial", 16)
+    SMALL_FONT = pygame.font.SysFont("Arial", 12)
+    # grass, roads, box and lane lines never change; rendered once, blitted every frame
+    background = render_background()
+
+    sim = Simulation(seed=SEED, trip_log=TripLog(TRIP_LOG) if TRIP_LOG else None)
+    print(f"Random seed: {sim.streams.seed}")
     main_loop()
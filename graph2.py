@@ -1,16 +1,27 @@
 import asyncio
+import itertools
 import platform
 import pygame
 import sys
-import random
-import time
-import threading
-import numpy as np
+from lanes import LaneIndex
+from rng_streams import RandomStreams
+from render_cache import SurfaceCache, TextCache, Layer, DirtyRects
+from sim_clock import SimClock, FrameScheduler
+from siren_detector import SirenMonitor, SpectralDetector, GoertzelDetector
+from siren_sound import SirenChannels, distance_volume, siren_asset
+from windowed_metrics import WindowedMetrics, WINDOWS
+
+# ----- Siren detection settings -----
+audio_cooldown = 3.0
+fs = 44100
+audio_window = 0.25  # seconds of audio per decision
+audio_hop = 0.1  # seconds of new audio between decisions
+freq_low = 500
+freq_high = 2000
+energy_threshold = 0.005
+detector_engine = "fft"  # "goertzel": only the two siren tones, a fraction of the CPU
 
-pygame.init()
 WIDTH, HEIGHT = 900, 800
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Traffic Intersection Simulation (State Machine + Virtual IoT Clearance)")
 
 # Colors
 ROAD_COLOR = (50, 50, 50)
@@ -25,69 +36,65 @@ PANEL_BG_ALPHA = 200
 BANNER_COLOR = (255, 0, 0)  # Red for emergency banner
 
 clock = pygame.time.Clock()
-FPS = 60
+FPS = 60  # simulation ticks per simulated second
+SIM_SPEED = 1.0  # simulated seconds per wall-clock second (10.0 = 10x fast-forward)
+RENDER_FPS = FPS  # frames drawn per second, independent of the tick rate
+DIRTY_RECTS = True  # only push the screen areas that changed (False: full update every frame)
+dirty = DirtyRects((WIDTH, HEIGHT), enabled=DIRTY_RECTS)
+# simulated time read by the controller and metrics; advanced once per tick
+sim_clock = SimClock(1.0 / FPS)
 DIRECTIONS = ["N", "E", "S", "W"]
 
 # Timing / parameters
 MIN_GREEN = 5.0
 MAX_GREEN = 30.0
 STARVE_TIME = 25.0
+CLEAR_DELAY = 1.0  # grace period after the intersection is clear before switching
 SAFE_DISTANCE = 15
 SPAWN_CHANCE = 15  # the lower, the more often vehicles spawn (random modulus)
-FONT = pygame.font.SysFont("Arial", 16)
-SMALL_FONT = pygame.font.SysFont("Arial", 12)
-
-# ----- Siren sound generation -----
-def generate_siren_sound():
-    sample_rate = 44100
-    duration = 2.0  # 2-second siren loop
-    t = np.linspace(0, duration, int(sample_rate * duration), False)
-  
-    # Create a two-tone siren (alternating frequencies for realism)
-    freq1 = 600  # Lower frequency
-    freq2 = 900  # Higher frequency
-    half_duration = duration / 2
-    t1 = t[:len(t)//2]
-    t2 = t[len(t)//2:]
-  
-    # Generate waveforms
-    siren1 = 0.5 * np.sin(2 * np.pi * freq1 * t1)
-    siren2 = 0.5 * np.sin(2 * np.pi * freq2 * t2)
-  
-    # Combine and normalize
-    siren = np.concatenate([siren1, siren2])
-    siren = (siren * 32767).astype(np.int16)  # Convert to 16-bit PCM
-    siren = np.column_stack((siren, siren))  # Stereo
-    return siren
-
-# Initialize siren sound
-siren_data = generate_siren_sound()
-siren_sound = None
-try:
-    siren_sound = pygame.sndarray.make_sound(siren_data)
-except AttributeError:
-    # Fallback if sndarray is unavailable
-    pass
+SEED = None  # set to an int to replay exactly the same traffic
+text_cache = TextCache()
+
+def render_panel_background(w, h, color=(0, 0, 0, 160)):
+    s = pygame.Surface((w, h), pygame.SRCALPHA)
+    s.fill(color)
+    return s
+
+# translucent panel backgrounds, by size and color
+panel_backgrounds = SurfaceCache(render_panel_background)
 
 # ----- Drawing helpers -----
-def draw_traffic_light(x, y, active_color):
-    pygame.draw.rect(SCREEN, SIGNAL_BOX, (x, y, 30, 70), border_radius=5)
+def render_traffic_light(active_color):
+    surface = pygame.Surface((30, 70), pygame.SRCALPHA)
+    pygame.draw.rect(surface, SIGNAL_BOX, (0, 0, 30, 70), border_radius=5)
     colors = [RED, YELLOW, GREEN]
     for i, color in enumerate(colors):
         light_color = color if color == active_color else (100, 100, 100)
-        pygame.draw.circle(SCREEN, light_color, (x + 15, y + 10 + 25 * i), 7)
+        pygame.draw.circle(surface, light_color, (15, 10 + 25 * i), 7)
+    return surface
+
+# one rasterized light per lamp state; drawing is a single blit
+traffic_lights = SurfaceCache(render_traffic_light)
+
+def draw_traffic_light(x, y, active_color):
+    return SCREEN.blit(traffic_lights.get(active_color), (x, y))
+
+def render_background():
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+    surface.fill(BG_COLOR)
+    pygame.draw.rect(surface, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))
+    pygame.draw.rect(surface, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))
+    pygame.draw.rect(surface, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    return surface
 
 def draw_intersection():
-    SCREEN.fill(BG_COLOR)
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))
-    pygame.draw.rect(SCREEN, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    SCREEN.blit(background, (0, 0))
 
-def draw_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_width):
+def paint_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_width):
     if sprite_type == 'car':
         body_color = (0, 0, 255)
     elif sprite_type == 'bus':
@@ -147,11 +154,33 @@ def draw_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_w
         elif sprite_type == 'car':
             pygame.draw.polygon(screen, (200, 200, 200), [(x + 8, y + 4), (x + 8, y + vehicle_width - 4), (x + 3, y + vehicle_width // 2)])
 
+SPRITE_MARGIN = 2  # wheels stick out a pixel past the vehicle's x/y box
+
+def render_vehicle(direction, sprite_type, vehicle_length, vehicle_width):
+    if direction in ["N", "S"]:
+        size = (vehicle_width + 2 * SPRITE_MARGIN, vehicle_length + 2 * SPRITE_MARGIN)
+    else:
+        size = (vehicle_length + 2 * SPRITE_MARGIN, vehicle_width + 2 * SPRITE_MARGIN)
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    paint_vehicle(surface, SPRITE_MARGIN, SPRITE_MARGIN, direction, sprite_type, vehicle_length, vehicle_width)
+    return surface
+
+# each (direction, type, length, width) is painted once; a vehicle then costs one blit
+vehicle_sprites = SurfaceCache(render_vehicle)
+
+def draw_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_width):
+    sprite = vehicle_sprites.get(direction, sprite_type, vehicle_length, vehicle_width)
+    return screen.blit(sprite, (x - SPRITE_MARGIN, y - SPRITE_MARGIN))
+
 # ----- Vehicle class -----
+# stable per-car keys for the dirty-rect tracker; id() is reused once a car is garbage-collected
+_car_ids = itertools.count()
+
 class Car:
     SPEED = 2
     PIXELS_PER_METER = 10  # Conversion factor for distance display (10 pixels = 1 meter)
     def __init__(self, direction, vehicle_type):
+        self.car_id = next(_car_ids)
         self.direction = direction
         self.vehicle_type = vehicle_type
         self.sprite_type = vehicle_type
@@ -160,7 +189,7 @@ class Car:
         self.stopped = False
         self.committed = False
         self.queued_time = None
-        self.spawn_time = time.time()
+        self.spawn_time = sim_clock.now()
         self.crossed = False
         self.siren_playing = vehicle_type in ("ambulance", "fire")  # Siren for emergency vehicles
         if direction == "N":
@@ -175,9 +204,9 @@ class Car:
         elif direction == "W":
             self.x = -self.vehicle_length
             self.y = HEIGHT // 2 + 15
-        # Start siren sound for emergency vehicles
-        if self.siren_playing and siren_sound:
-            siren_sound.play(loops=-1)  # Loop indefinitely
+        # Start siren sound for emergency vehicles, on a mixer channel of its own
+        if self.siren_playing and siren_channels:
+            siren_channels.start(self, distance_volume(self.get_distance_to_intersection()))
 
     @property
     def is_emergency(self):
@@ -210,8 +239,7 @@ class Car:
         if self.direction == "W":
             return self.x + self.vehicle_length >= cx - 300
 
-    def will_move_this_frame(self, cars):
-        front_car = self.get_front_car(cars)
+    def will_move_this_frame(self, front_car):
         if self.direction == "N":
             stop_line = HEIGHT // 2 - 60
             if self.is_emergency or self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
@@ -233,45 +261,37 @@ class Car:
                 return True
             return False
 
-    def move(self, cars):
-        front_car = self.get_front_car(cars)
-        will_move = self.will_move_this_frame(cars)
+    def move(self):
+        front_car = self.get_front_car()
+        will_move = self.will_move_this_frame(front_car)
         if not will_move and self.queued_time is None and not self.committed and self._near_intersection_region():
-            self.queued_time = time.time()
+            lane_index.mark_queued(self, sim_clock.now())
         if self.direction == "N":
             stop_line = HEIGHT // 2 - 60
             if not self.committed and (self.is_emergency or self.can_pass()) and self.y + self.vehicle_length >= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.is_emergency or self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
                 self.y += Car.SPEED
         elif self.direction == "S":
             stop_line = HEIGHT // 2 + 60
             if not self.committed and (self.is_emergency or self.can_pass()) and self.y <= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.is_emergency or self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y > stop_line and self.safe_to_move(front_car)):
                 self.y -= Car.SPEED
         elif self.direction == "E":
             stop_line = WIDTH // 2 + 60
             if not self.committed and (self.is_emergency or self.can_pass()) and self.x <= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.is_emergency or self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x > stop_line and self.safe_to_move(front_car)):
                 self.x -= Car.SPEED
         elif self.direction == "W":
             stop_line = WIDTH // 2 - 60
             if not self.committed and (self.is_emergency or self.can_pass()) and self.x + self.vehicle_length >= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.is_emergency or self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
                 self.x += Car.SPEED
         if not self.crossed:
@@ -296,90 +316,80 @@ class Car:
         elif self.direction == "W":
             return front_car.x - (self.x + self.vehicle_length) > SAFE_DISTANCE
 
-    def get_front_car(self, cars):
-        same_lane_cars = [car for car in cars if car.direction == self.direction and car != self]
-        if self.direction == "N":
-            same_lane_cars = [car for car in same_lane_cars if car.y > self.y]
-            return min(same_lane_cars, key=lambda c: c.y, default=None)
-        elif self.direction == "S":
-            same_lane_cars = [car for car in same_lane_cars if car.y < self.y]
-            return max(same_lane_cars, key=lambda c: c.y, default=None)
-        elif self.direction == "E":
-            same_lane_cars = [car for car in same_lane_cars if car.x < self.x]
-            return max(same_lane_cars, key=lambda c: c.x, default=None)
-        elif self.direction == "W":
-            same_lane_cars = [car for car in same_lane_cars if car.x > self.x]
-            return min(same_lane_cars, key=lambda c: c.x, default=None)
+    def get_front_car(self):
+        return lane_index.front_of(self)
 
     def can_pass(self):
         # Emergency vehicles can pass regardless of light state
         return self.is_emergency or (DIRECTIONS[light_index] == self.direction and light_state == "GREEN")
 
     def draw(self):
-        draw_vehicle(SCREEN, self.x, self.y, self.direction, self.sprite_type, self.vehicle_length, self.vehicle_width)
+        return draw_vehicle(SCREEN, self.x, self.y, self.direction, self.sprite_type, self.vehicle_length, self.vehicle_width)
 
     def stop_siren(self):
-        if self.siren_playing and siren_sound:
-            siren_sound.stop()
+        if self.siren_playing and siren_channels:
+            siren_channels.stop(self)
             self.siren_playing = False
 
 # ----- Simulation lists / helpers -----
 cars = []
+lane_index = LaneIndex(DIRECTIONS)
 
 def spawn_too_close(direction):
-    for c in cars:
-        if c.direction != direction:
-            continue
-        if direction == "N" and c.y < SAFE_DISTANCE:
-            return True
-        if direction == "S" and c.y > HEIGHT - SAFE_DISTANCE:
-            return True
-        if direction == "E" and c.x > WIDTH - SAFE_DISTANCE:
-            return True
-        if direction == "W" and c.x < SAFE_DISTANCE:
-            return True
-    return False
+    # only the rearmost car of the lane can be near the spawn point
+    c = lane_index.rear(direction)
+    if c is None:
+        return False
+    if direction == "N":
+        return c.y < SAFE_DISTANCE
+    if direction == "S":
+        return c.y > HEIGHT - SAFE_DISTANCE
+    if direction == "E":
+        return c.x > WIDTH - SAFE_DISTANCE
+    return c.x < SAFE_DISTANCE
 
 def spawn_car():
-    if random.randint(0, SPAWN_CHANCE) == 0:
-        direction = random.choice(DIRECTIONS)
+    if rng.arrivals.randint(0, SPAWN_CHANCE) == 0:
+        direction = rng.arrivals.choice(DIRECTIONS)
         if spawn_too_close(direction):
             return
-        r = random.random()
+        r = rng.vehicle_type.random()
         if r < 0.7:
             vehicle_type = "car"
         else:
             vehicle_type = "bus"
-        cars.append(Car(direction, vehicle_type))
+        car = Car(direction, vehicle_type)
+        cars.append(car)
+        lane_index.add(car)
+        recent.record_arrivals(sim_clock.now())
 
 def spawn_emergency_vehicle():
-    direction = random.choice(DIRECTIONS)
+    direction = rng.emergency.choice(DIRECTIONS)
     if not spawn_too_close(direction):
-        vehicle_type = random.choice(["ambulance", "fire"])
+        vehicle_type = rng.emergency.choice(["ambulance", "fire"])
         car = Car(direction, vehicle_type)
         cars.append(car)
+        lane_index.add(car)
+        recent.record_arrivals(sim_clock.now())
         return car
     return None
 
 # ----- Light state machine -----
 light_index = 0
 light_state = "GREEN"
-green_start_time = time.time()
+green_start_time = sim_clock.now()
 switch_request_time = None
 clear_start_time = None
 delay_start_time = None
-last_switch_time = time.time()
-last_served = {d: time.time() for d in DIRECTIONS}
+last_switch_time = sim_clock.now()
+last_served = {d: sim_clock.now() for d in DIRECTIONS}
 
 def get_queue_counts():
-    counts = {d: 0 for d in DIRECTIONS}
-    for c in cars:
-        counts[c.direction] += 1
-    return counts
+    return lane_index.counts()
 
 def choose_next_direction(exclude_dir=None):
     counts = get_queue_counts()
-    now = time.time()
+    now = sim_clock.now()
     starving = [d for d in DIRECTIONS if now - last_served.get(d, 0) >= STARVE_TIME]
     if exclude_dir:
         starving = [d for d in starving if d != exclude_dir]
@@ -408,18 +418,21 @@ def choose_next_direction(exclude_dir=None):
 # ----- Emergency & metrics -----
 emergency_override = False
 emergency_direction = None
-sim_start_time = time.time()
+sim_start_time = sim_clock.now()
 total_wait_time = 0.0
 total_served_waits = 0
 throughput_count = 0
+# throughput, arrivals and waits over the last 1 / 5 / 15 simulated minutes
+recent = WindowedMetrics(start=sim_start_time)
 
 def record_wait_time(queued_time):
     global total_wait_time, total_served_waits
     if queued_time is None:
         return
-    wait = time.time() - queued_time
+    wait = sim_clock.now() - queued_time
     total_wait_time += wait
     total_served_waits += 1
+    recent.record_wait(sim_clock.now(), wait)
 
 def get_average_wait():
     if total_served_waits == 0:
@@ -427,23 +440,19 @@ def get_average_wait():
     return total_wait_time / total_served_waits
 
 def get_throughput_per_minute():
-    elapsed_minutes = (time.time() - sim_start_time) / 60.0
+    elapsed_minutes = (sim_clock.now() - sim_start_time) / 60.0
     if elapsed_minutes <= 0:
         return 0.0
     return throughput_count / elapsed_minutes
 
 def draw_metrics():
     avg_wait = get_average_wait()
-    tpm = get_throughput_per_minute()
-    counts = get_queue_counts()
-    queued_counts = {d: 0 for d in DIRECTIONS}
-    for c in cars:
-        if c.queued_time is not None:
-            queued_counts[c.direction] += 1
+    recent_tpm = [recent.throughput_per_minute(w, sim_clock.now()) for w in WINDOWS]
+    queued_counts = lane_index.queued
     lines = [
         f"Avg wait (s): {avg_wait:.2f}",
         f"Throughput (total): {throughput_count}",
-        f"Throughput (per min): {tpm:.2f}",
+        "Throughput/min 1/5/15m: " + " / ".join(f"{tpm:.1f}" for tpm in recent_tpm),
         f"Queue N: {queued_counts['N']} E: {queued_counts['E']} S: {queued_counts['S']} W: {queued_counts['W']}",
         f"Total vehicles on road: {len(cars)}",
         f"Light State: {light_state} | Green Dir: {DIRECTIONS[light_index]}"
@@ -453,144 +462,120 @@ def draw_metrics():
     box_h = 20 * len(lines) + padding * 2
     box_x = 10
     box_y = 50  # Moved down to avoid emergency banner
-    s = pygame.Surface((box_w, box_h), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 160))
-    SCREEN.blit(s, (box_x, box_y))
+    SCREEN.blit(panel_backgrounds.get(box_w, box_h), (box_x, box_y))
     for i, line in enumerate(lines):
-        txt = FONT.render(line, True, (255, 255, 255))
-        SCREEN.blit(txt, (box_x + padding, box_y + padding + i * 20))
+        txt = text_cache.render(FONT, line, (255, 255, 255))
+        dirty.track(("metrics", i), SCREEN.blit(txt, (box_x + padding, box_y + padding + i * 20)), line)
+    dirty.track("metrics", (box_x, box_y, box_w, box_h))
 
 # ----- Bar graphs integration -----
-def draw_bar_graphs():
-    counts = get_queue_counts()
-    wait_times = {d: [] for d in DIRECTIONS}
-    for c in cars:
-        if c.queued_time is not None:
-            wait_times[c.direction].append(time.time() - c.queued_time)
-    avg_wait_dir = {}
-    for d in DIRECTIONS:
-        avg_wait_dir[d] = sum(wait_times[d]) / len(wait_times[d]) if wait_times[d] else 0.0
-    # Top-right: Horizontal vehicle count bars
-    graph_w = 320
-    graph_h = 220
-    padding_top = 80
-    padding_right = 11
-    x_offset = WIDTH - graph_w - padding_right
-    y_offset = padding_top
-    pygame.draw.rect(SCREEN, (0, 115, 0), (x_offset, y_offset, graph_w, graph_h), border_radius=10)
+def paint_count_bars(surface, counts):
+    # Top-right: Horizontal vehicle count bars, in layer-local coordinates
+    graph_w, graph_h = surface.get_size()
+    x_offset = 0
+    y_offset = 0
+    pygame.draw.rect(surface, (0, 115, 0), (x_offset, y_offset, graph_w, graph_h), border_radius=10)
     inner_padding = 10
-    title = FONT.render("Vehicle Counts", True, (255, 255, 255))
-    SCREEN.blit(title, (x_offset + inner_padding, y_offset + inner_padding))
+    title = text_cache.render(FONT, "Vehicle Counts", (255, 255, 255))
+    surface.blit(title, (x_offset + inner_padding, y_offset + inner_padding))
     counts_area_top = y_offset + inner_padding + 24
     counts_area_left = x_offset + inner_padding + 90
     counts_area_width = graph_w - (inner_padding * 2) - 100
     bar_height = 22
     spacing = 38
-    max_queue = max(counts.values()) if any(counts.values()) else 1
+    max_queue = max(counts) if any(counts) else 1
     for i, dir in enumerate(DIRECTIONS):
-        count = counts[dir]
+        count = counts[i]
         length = int((count / max_queue) * counts_area_width) if max_queue > 0 else 0
         bar_x = counts_area_left
         bar_y = counts_area_top + i * spacing
-        pygame.draw.rect(SCREEN, (25, 25, 25), (bar_x, bar_y, counts_area_width, bar_height), border_radius=6)
-        pygame.draw.rect(SCREEN, (0, 200, 0), (bar_x, bar_y, length, bar_height), border_radius=6)
-        dir_label = FONT.render(f"{dir}", True, (255, 255, 255))
-        SCREEN.blit(dir_label, (x_offset + inner_padding + 8, bar_y + (bar_height // 2) - 8))
-        count_label = FONT.render(str(count), True, (255, 255, 255))
+        pygame.draw.rect(surface, (25, 25, 25), (bar_x, bar_y, counts_area_width, bar_height), border_radius=6)
+        pygame.draw.rect(surface, (0, 200, 0), (bar_x, bar_y, length, bar_height), border_radius=6)
+        dir_label = text_cache.render(FONT, f"{dir}", (255, 255, 255))
+        surface.blit(dir_label, (x_offset + inner_padding + 8, bar_y + (bar_height // 2) - 8))
+        count_label = text_cache.render(FONT, str(count), (255, 255, 255))
         if length + 12 < counts_area_width:
-            SCREEN.blit(count_label, (bar_x + length + 8, bar_y + (bar_height // 2) - 8))
+            surface.blit(count_label, (bar_x + length + 8, bar_y + (bar_height // 2) - 8))
         else:
-            SCREEN.blit(count_label, (bar_x + counts_area_width - 20, bar_y + (bar_height // 2) - 8))
-    small = pygame.font.SysFont("Arial", 12)
-    legend1 = small.render("Counts →", True, (255, 255, 255))
-    SCREEN.blit(legend1, (x_offset + graph_w - inner_padding - 70, y_offset + inner_padding + 4))
-    # Bottom-right: Vertical average wait bars
-    graph_w2 = 300
-    graph_h2 = 200
-    padding_bottom = 100
-    x_offset2 = WIDTH - graph_w2 - padding_right
-    y_offset2 = HEIGHT - graph_h2 - padding_bottom
-    pygame.draw.rect(SCREEN, (80, 0, 0), (x_offset2, y_offset2, graph_w2, graph_h2), border_radius=10)
-    title2 = FONT.render("Avg Wait (s) per Direction", True, (255, 255, 255))
-    SCREEN.blit(title2, (x_offset2 + inner_padding, y_offset2 + inner_padding))
+            surface.blit(count_label, (bar_x + counts_area_width - 20, bar_y + (bar_height // 2) - 8))
+    legend1 = text_cache.render(SMALL_FONT, "Counts →", (255, 255, 255))
+    surface.blit(legend1, (x_offset + graph_w - inner_padding - 70, y_offset + inner_padding + 4))
+
+WAIT_AREA_HEIGHT = 200 - (10 * 2) - 40  # graph_h2 - (inner_padding * 2) - 40
+
+def paint_wait_bars(surface, bars):
+    # Bottom-right: Vertical average wait bars, (height, label) per direction
+    graph_w2, graph_h2 = surface.get_size()
+    x_offset2 = 0
+    y_offset2 = 0
+    inner_padding = 10
+    pygame.draw.rect(surface, (80, 0, 0), (x_offset2, y_offset2, graph_w2, graph_h2), border_radius=10)
+    title2 = text_cache.render(FONT, "Avg Wait (s) per Direction", (255, 255, 255))
+    surface.blit(title2, (x_offset2 + inner_padding, y_offset2 + inner_padding))
     vert_area_top = y_offset2 + inner_padding + 26
-    vert_area_height = graph_h2 - (inner_padding * 2) - 40
+    vert_area_height = WAIT_AREA_HEIGHT
     bar_w = 34
     gap = 22
-    waits = [avg_wait_dir[d] for d in DIRECTIONS]
-    max_wait = max(max(waits), 1.0)
     axis_y = vert_area_top + vert_area_height + 6
-    pygame.draw.line(SCREEN, (200, 200, 200), (x_offset2 + inner_padding + 6, axis_y), (x_offset2 + inner_padding + 6 + (bar_w + gap) * len(DIRECTIONS) - gap, axis_y), 2)
+    pygame.draw.line(surface, (200, 200, 200), (x_offset2 + inner_padding + 6, axis_y), (x_offset2 + inner_padding + 6 + (bar_w + gap) * len(DIRECTIONS) - gap, axis_y), 2)
     for i, dir in enumerate(DIRECTIONS):
-        wtime = avg_wait_dir[dir]
-        height = int((wtime / max_wait) * vert_area_height) if max_wait > 0 else 0
+        height, label = bars[i]
         bar_x = x_offset2 + inner_padding + 6 + i * (bar_w + gap)
         bar_y = vert_area_top + (vert_area_height - height)
-        pygame.draw.rect(SCREEN, (220, 60, 60), (bar_x, bar_y, bar_w, height), border_radius=6)
-        txt_dir = FONT.render(dir, True, (255, 255, 255))
-        SCREEN.blit(txt_dir, (bar_x + (bar_w // 2) - 6, axis_y + 6))
-        txt_wait = SMALL_FONT.render(f"{wtime:.1f}s", True, (255, 255, 255))
-        SCREEN.blit(txt_wait, (bar_x + (bar_w // 2) - 10, bar_y - 16))
-    legend_wait = small.render("Current queued avg (s)", True, (255, 255, 255))
-    SCREEN.blit(legend_wait, (x_offset2 + graph_w2 - inner_padding - 170, y_offset2 + graph_h2 - inner_padding - 18))
+        pygame.draw.rect(surface, (220, 60, 60), (bar_x, bar_y, bar_w, height), border_radius=6)
+        txt_dir = text_cache.render(FONT, dir, (255, 255, 255))
+        surface.blit(txt_dir, (bar_x + (bar_w // 2) - 6, axis_y + 6))
+        txt_wait = text_cache.render(SMALL_FONT, label, (255, 255, 255))
+        surface.blit(txt_wait, (bar_x + (bar_w // 2) - 10, bar_y - 16))
+    legend_wait = text_cache.render(SMALL_FONT, "Current queued avg (s)", (255, 255, 255))
+    surface.blit(legend_wait, (x_offset2 + graph_w2 - inner_padding - 170, y_offset2 + graph_h2 - inner_padding - 18))
+
+# the panels are only repainted when a count, bar height or label changes
+count_bars_layer = Layer((320, 220), paint_count_bars)
+wait_bars_layer = Layer((300, 200), paint_wait_bars)
+
+def draw_bar_graphs():
+    counts = get_queue_counts()
+    now = sim_clock.now()
+    avg_wait_dir = {d: lane_index.average_wait(d, now) for d in DIRECTIONS}
+    padding_top = 80
+    padding_right = 11
+    count_bars = count_bars_layer.get(tuple(counts[d] for d in DIRECTIONS))
+    dirty.track("count_bars", SCREEN.blit(count_bars, (WIDTH - 320 - padding_right, padding_top)),
+                count_bars_layer.state)
+    waits = [avg_wait_dir[d] for d in DIRECTIONS]
+    max_wait = max(max(waits), 1.0)
+    bars = tuple((int((wtime / max_wait) * WAIT_AREA_HEIGHT) if max_wait > 0 else 0, f"{wtime:.1f}s")
+                 for wtime in waits)
+    padding_bottom = 100
+    wait_bars = wait_bars_layer.get(bars)
+    dirty.track("wait_bars", SCREEN.blit(wait_bars, (WIDTH - 300 - padding_right, HEIGHT - 200 - padding_bottom)),
+                wait_bars_layer.state)
 
 # ----- Audio / Siren detection UI -----
 BUTTON_RECT = pygame.Rect(10, 10 + 20 * 7 + 16 + 40, 260, 30)  # Adjusted to avoid banner
 listening_for_siren = False
-audio_thread = None
-audio_lock = threading.Lock()
-last_audio_trigger = 0
-audio_cooldown = 3.0
-fs = 44100
-chunk_duration = 1.0
-freq_low = 500
-freq_high = 2000
-energy_threshold = 0.005
 
 def set_green_for_emergency(direction):
     global light_state, light_index, green_start_time, switch_request_time, clear_start_time, delay_start_time, last_switch_time
     light_index = DIRECTIONS.index(direction)
     light_state = "GREEN"
-    green_start_time = time.time()
+    green_start_time = sim_clock.now()
     switch_request_time = None
     clear_start_time = None
     delay_start_time = None
-    last_switch_time = time.time()
-    last_served[direction] = time.time()
-
-def audio_listener_loop():
-    global listening_for_siren, cars, emergency_override, emergency_direction, last_audio_trigger
-    while listening_for_siren:
-        try:
-            import sounddevice as sd
-            rec = sd.rec(int(chunk_duration * fs), samplerate=fs, channels=1, dtype='float32')
-            sd.wait()
-            sig = rec.flatten()
-            if sig.size == 0:
-                continue
-            win = np.hanning(len(sig))
-            sig_win = sig * win
-            fft = np.abs(np.fft.rfft(sig_win))
-            freqs = np.fft.rfftfreq(len(sig_win), 1.0 / fs)
-            band_idx = np.where((freqs >= freq_low) & (freqs <= freq_high))[0]
-            if band_idx.size == 0:
-                continue
-            band_energy = np.sum(fft[band_idx])
-            total_energy = np.sum(fft) + 1e-9
-            ratio = band_energy / total_energy
-            now = time.time()
-            if ratio > energy_threshold and now - last_audio_trigger > audio_cooldown:
-                last_audio_trigger = now
-                vehicle = spawn_emergency_vehicle()
-                if vehicle:
-                    with audio_lock:
-                        prioritized_dir = vehicle.direction
-                        emergency_override = True
-                        emergency_direction = prioritized_dir
-                        set_green_for_emergency(prioritized_dir)
-        except Exception:
-            time.sleep(0.1)
-    return
+    last_switch_time = sim_clock.now()
+    last_served[direction] = sim_clock.now()
+
+def on_siren():
+    # called from the main loop between two ticks
+    global emergency_override, emergency_direction
+    vehicle = spawn_emergency_vehicle()
+    if vehicle:
+        prioritized_dir = vehicle.direction
+        emergency_override = True
+        emergency_direction = prioritized_dir
+        set_green_for_emergency(prioritized_dir)
 
 MAX_VEHICLE_SIZE = 60
 
@@ -622,12 +607,18 @@ def draw_emergency_banner():
         banner_h = 30
         banner_x = (WIDTH - banner_w) // 2
         banner_y = 8
-        s = pygame.Surface((banner_w, banner_h), pygame.SRCALPHA)
-        s.fill((BANNER_COLOR[0], BANNER_COLOR[1], BANNER_COLOR[2], 200))
-        SCREEN.blit(s, (banner_x, banner_y))
-        txt = FONT.render("EMERGENCY VEHICLE DETECTED!", True, (255, 255, 255))
+        s = panel_backgrounds.get(banner_w, banner_h, (BANNER_COLOR[0], BANNER_COLOR[1], BANNER_COLOR[2], 200))
+        dirty.track("banner", SCREEN.blit(s, (banner_x, banner_y)))
+        txt = text_cache.render(FONT, "EMERGENCY VEHICLE DETECTED!", (255, 255, 255))
         txt_rect = txt.get_rect(center=(banner_x + banner_w // 2, banner_y + banner_h // 2))
-        SCREEN.blit(txt, txt_rect)
+        dirty.track("banner_text", SCREEN.blit(txt, txt_rect))
+
+# ----- Siren volume, louder as the vehicle gets closer -----
+def update_siren_volumes():
+    if siren_channels:
+        for c in cars:
+            if c.siren_playing:
+                siren_channels.set_distance(c, c.get_distance_to_intersection())
 
 # ----- Dynamic distance display -----
 def draw_emergency_distance():
@@ -641,40 +632,121 @@ def draw_emergency_distance():
         dist_x = 10
         dist_y = HEIGHT - dist_h - 10  # Position above bottom edge, below traffic lanes
         # Draw translucent background
-        s = pygame.Surface((dist_w, dist_h), pygame.SRCALPHA)
-        s.fill((0, 0, 0, 160))
-        SCREEN.blit(s, (dist_x, dist_y))
+        s = panel_backgrounds.get(dist_w, dist_h)
+        dirty.track("distances", SCREEN.blit(s, (dist_x, dist_y)))
         # Display distance for each emergency vehicle
         for i, car in enumerate(emergency_cars):
             distance = car.get_distance_to_intersection()
             vehicle_type = car.vehicle_type.capitalize()
             direction = car.direction
-            txt = FONT.render(f"{vehicle_type} ({direction}): {distance:.1f}m", True, (255, 255, 255))
-            SCREEN.blit(txt, (dist_x + padding, dist_y + padding + i * line_height))
+            label = f"{vehicle_type} ({direction}): {distance:.1f}m"
+            txt = text_cache.render(FONT, label, (255, 255, 255))
+            dirty.track(("distances", i), SCREEN.blit(txt, (dist_x + padding, dist_y + padding + i * line_height)), label)
+
+# ----- Simulation tick -----
+wait_clear_msg = ""
+
+def step_simulation():
+    """Advance vehicles and the light controller by one tick of sim_clock."""
+    global light_state, light_index, green_start_time, switch_request_time, clear_start_time, delay_start_time
+    global emergency_override, emergency_direction, throughput_count, wait_clear_msg
+    now = sim_clock.now()
+    spawn_car()
+    for car in cars[:]:
+        car.move()
+    # emergency vehicles ignore the car ahead, so lanes can fall out of order
+    lane_index.resort()
+    new_cars = []
+    for car in cars:
+        if -MAX_VEHICLE_SIZE <= car.x <= WIDTH + MAX_VEHICLE_SIZE and -MAX_VEHICLE_SIZE <= car.y <= HEIGHT + MAX_VEHICLE_SIZE:
+            new_cars.append(car)
+        else:
+            lane_index.discard(car)
+            if car.crossed:
+                throughput_count += 1
+                recent.record_departures(now)
+            if car.queued_time is not None:
+                record_wait_time(car.queued_time)
+            if car.is_emergency:
+                car.stop_siren()  # Stop siren when vehicle exits
+    cars[:] = new_cars
+    emergency_cars = [c for c in cars if c.is_emergency]
+    if emergency_cars:
+        def dist_to_center(car):
+            cx, cy = WIDTH // 2, HEIGHT // 2
+            car_center_x = car.x + (car.vehicle_width / 2 if car.direction in ["N", "S"] else car.vehicle_length / 2)
+            car_center_y = car.y + (car.vehicle_length / 2 if car.direction in ["N", "S"] else car.vehicle_width / 2)
+            return (car_center_x - cx) ** 2 + (car_center_y - cy) ** 2
+        prioritized = min(emergency_cars, key=dist_to_center)
+        desired_dir = prioritized.direction
+        if (not emergency_override) or (emergency_direction != desired_dir):
+            emergency_override = True
+            emergency_direction = desired_dir
+            set_green_for_emergency(desired_dir)
+    else:
+        if emergency_override and not listening_for_siren:
+            just_cleared = emergency_direction
+            emergency_override = False
+            emergency_direction = None
+            last_served[just_cleared] = now
+            if light_state == "GREEN":
+                light_state = "START_SWITCH"
+                switch_request_time = sim_clock.now()
+    if light_state == "GREEN":
+        elapsed_green = now - green_start_time
+        need_switch = False
+        if elapsed_green >= MAX_GREEN:
+            need_switch = True
+        elif elapsed_green >= MIN_GREEN:
+            suggested = choose_next_direction()
+            if suggested != light_index:
+                need_switch = True
+        if need_switch and not emergency_override:
+            light_state = "START_SWITCH"
+            switch_request_time = now
+    elif light_state == "START_SWITCH":
+        light_state = "WAIT_CLEAR"
+        clear_start_time = sim_clock.now()
+        wait_clear_msg = "Waiting for intersection to clear..."
+    elif light_state == "WAIT_CLEAR":
+        if intersection_clear():
+            light_state = "DELAY"
+            delay_start_time = sim_clock.now()
+            wait_clear_msg = f"Intersection clear — delaying {CLEAR_DELAY:g}s before switch"
+        else:
+            wait_clear_msg = "Waiting for intersection to clear..."
+    elif light_state == "DELAY":
+        if now - delay_start_time >= CLEAR_DELAY:
+            prev_dir = DIRECTIONS[light_index]
+            next_idx = choose_next_direction(exclude_dir=prev_dir)
+            light_index = next_idx
+            light_state = "GREEN"
+            green_start_time = sim_clock.now()
+            last_served[DIRECTIONS[light_index]] = sim_clock.now()
+            wait_clear_msg = ""
+    sim_clock.advance()
 
 # ----- Main loop -----
 async def main():
-    global listening_for_siren, audio_thread, light_state, light_index, green_start_time, switch_request_time
-    global clear_start_time, delay_start_time, emergency_override, emergency_direction, throughput_count, last_served
+    global listening_for_siren, emergency_override, emergency_direction
     for _ in range(12):
         spawn_car()
-    wait_clear_msg = ""
+    scheduler = FrameScheduler(sim_clock.tick_length, speed=SIM_SPEED, render_fps=RENDER_FPS)
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 listening_for_siren = False
-                if audio_thread and audio_thread.is_alive():
-                    audio_thread.join(timeout=0.5)
+                siren_monitor.close()
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if BUTTON_RECT.collidepoint(event.pos):
                     if not listening_for_siren:
                         listening_for_siren = True
-                        audio_thread = threading.Thread(target=audio_listener_loop, daemon=True)
-                        audio_thread.start()
+                        siren_monitor.start()
                     else:
                         listening_for_siren = False
+                        siren_monitor.stop(timeout=0)
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_e:
                     vehicle = spawn_emergency_vehicle()
@@ -682,90 +754,30 @@ async def main():
                         emergency_override = True
                         emergency_direction = vehicle.direction
                         set_green_for_emergency(vehicle.direction)
-        now = time.time()
-        spawn_car()
-        for car in cars[:]:
-            car.move(cars)
-        new_cars = []
-        for car in cars:
-            if -MAX_VEHICLE_SIZE <= car.x <= WIDTH + MAX_VEHICLE_SIZE and -MAX_VEHICLE_SIZE <= car.y <= HEIGHT + MAX_VEHICLE_SIZE:
-                new_cars.append(car)
-            else:
-                if car.crossed:
-                    throughput_count += 1
-                if car.queued_time is not None:
-                    record_wait_time(car.queued_time)
-                if car.is_emergency:
-                    car.stop_siren()  # Stop siren when vehicle exits
-        cars[:] = new_cars
-        emergency_cars = [c for c in cars if c.is_emergency]
-        if emergency_cars:
-            def dist_to_center(car):
-                cx, cy = WIDTH // 2, HEIGHT // 2
-                car_center_x = car.x + (car.vehicle_width / 2 if car.direction in ["N", "S"] else car.vehicle_length / 2)
-                car_center_y = car.y + (car.vehicle_length / 2 if car.direction in ["N", "S"] else car.vehicle_width / 2)
-                return (car_center_x - cx) ** 2 + (car_center_y - cy) ** 2
-            prioritized = min(emergency_cars, key=dist_to_center)
-            desired_dir = prioritized.direction
-            if (not emergency_override) or (emergency_direction != desired_dir):
-                emergency_override = True
-                emergency_direction = desired_dir
-                set_green_for_emergency(desired_dir)
-        else:
-            if emergency_override and not listening_for_siren:
-                just_cleared = emergency_direction
-                emergency_override = False
-                emergency_direction = None
-                last_served[just_cleared] = now
-                if light_state == "GREEN":
-                    light_state = "START_SWITCH"
-                    switch_request_time = time.time()
-        if light_state == "GREEN":
-            elapsed_green = now - green_start_time
-            need_switch = False
-            if elapsed_green >= MAX_GREEN:
-                need_switch = True
-            elif elapsed_green >= MIN_GREEN:
-                suggested = choose_next_direction()
-                if suggested != light_index:
-                    need_switch = True
-            if need_switch and not emergency_override:
-                light_state = "START_SWITCH"
-                switch_request_time = now
-        elif light_state == "START_SWITCH":
-            light_state = "WAIT_CLEAR"
-            clear_start_time = time.time()
-            wait_clear_msg = "Waiting for intersection to clear..."
-        elif light_state == "WAIT_CLEAR":
-            if intersection_clear():
-                light_state = "DELAY"
-                delay_start_time = time.time()
-                wait_clear_msg = "Intersection clear — delaying 3s before switch"
-            else:
-                wait_clear_msg = "Waiting for intersection to clear..."
-        elif light_state == "DELAY":
-            if now - delay_start_time >= 1.0:
-                prev_dir = DIRECTIONS[light_index]
-                next_idx = choose_next_direction(exclude_dir=prev_dir)
-                light_index = next_idx
-                light_state = "GREEN"
-                green_start_time = time.time()
-                last_served[DIRECTIONS[light_index]] = time.time()
-                wait_clear_msg = ""
+        if listening_for_siren:
+            for _ in siren_monitor.poll():
+                on_siren()
+        for _ in range(scheduler.ticks_due()):
+            step_simulation()
+            update_siren_volumes()
+        if not scheduler.should_render():
+            await asyncio.sleep(0)
+            continue
         draw_intersection()
         for car in cars:
-            car.draw()
+            dirty.track(("vehicle", car.car_id), car.draw(), (car.direction, car.sprite_type, car.vehicle_length))
         for i, direction in enumerate(DIRECTIONS):
             is_active = (i == light_index and light_state == "GREEN")
             light_color = GREEN if is_active else RED
             if direction == "N":
-                draw_traffic_light(WIDTH // 2 - 45, HEIGHT // 2 - 130, light_color)
+                rect = draw_traffic_light(WIDTH // 2 - 45, HEIGHT // 2 - 130, light_color)
             elif direction == "E":
-                draw_traffic_light(WIDTH // 2 + 70, HEIGHT // 2 - 15, light_color)
+                rect = draw_traffic_light(WIDTH // 2 + 70, HEIGHT // 2 - 15, light_color)
             elif direction == "S":
-                draw_traffic_light(WIDTH // 2 + 45, HEIGHT // 2 + 60, light_color)
+                rect = draw_traffic_light(WIDTH // 2 + 45, HEIGHT // 2 + 60, light_color)
             elif direction == "W":
-                draw_traffic_light(WIDTH // 2 - 70, HEIGHT // 2 - 15, light_color)
+                rect = draw_traffic_light(WIDTH // 2 - 70, HEIGHT // 2 - 15, light_color)
+            dirty.track(("light", direction), rect, light_color)
         draw_metrics()
         draw_bar_graphs()
         draw_emergency_banner()
@@ -775,26 +787,55 @@ async def main():
             msg_h = 30
             msg_x = (WIDTH - msg_w) // 2
             msg_y = 50  # Moved down to avoid banner
-            s = pygame.Surface((msg_w, msg_h), pygame.SRCALPHA)
-            s.fill((0, 0, 0, 150))
-            SCREEN.blit(s, (msg_x, msg_y))
-            txt = FONT.render(wait_clear_msg, True, (255, 255, 255))
-            SCREEN.blit(txt, (msg_x + 10, msg_y + 6))
+            s = panel_backgrounds.get(msg_w, msg_h, (0, 0, 0, 150))
+            dirty.track("wait_clear", SCREEN.blit(s, (msg_x, msg_y)))
+            txt = text_cache.render(FONT, wait_clear_msg, (255, 255, 255))
+            dirty.track("wait_clear_text", SCREEN.blit(txt, (msg_x + 10, msg_y + 6)), wait_clear_msg)
         mouse_pos = pygame.mouse.get_pos()
+        dirty.track("button", BUTTON_RECT, BUTTON_RECT.collidepoint(mouse_pos))
         if BUTTON_RECT.collidepoint(mouse_pos):
             pygame.draw.rect(SCREEN, (220, 220, 0), BUTTON_RECT, border_radius=4)
         else:
             pygame.draw.rect(SCREEN, (200, 200, 0), BUTTON_RECT, border_radius=4)
         if listening_for_siren:
-            txt = FONT.render("Listening for Siren (click to stop)", True, (0, 0, 0))
+            txt = text_cache.render(FONT, "Listening for Siren (click to stop)", (0, 0, 0))
         else:
-            txt = FONT.render("Start Siren Detection (click to start)", True, (0, 0, 0))
-        SCREEN.blit(txt, (BUTTON_RECT.x + 6, BUTTON_RECT.y + 6))
-        pygame.display.update()
-        await asyncio.sleep(1.0 / FPS)
-
-if platform.system() == "Emscripten":
-    asyncio.ensure_future(main())
-else:
-    if __name__ == "__main__":
-        asyncio.run(main())
\ No newline at end of file
+            txt = text_cache.render(FONT, "Start Siren Detection (click to start)", (0, 0, 0))
+        dirty.track("button_text", SCREEN.blit(txt, (BUTTON_RECT.x + 6, BUTTON_RECT.y + 6)), listening_for_siren)
+        dirty.flush()
+        await asyncio.sleep(scheduler.idle_time())
+
+if __name__ == "__main__":
+    # window, fonts, sound, traffic and siren monitor only exist when run as a script: the monitor's
+    # spawned process imports this module again and must not open a window of its own
+    if detector_engine == "goertzel":
+        siren_detector = GoertzelDetector(fs, audio_window, hop=audio_hop)
+    else:
+        siren_detector = SpectralDetector(fs, audio_window, freq_low, freq_high, energy_threshold)
+    siren_monitor = SirenMonitor(siren_detector, hop=audio_hop, cooldown=audio_cooldown, fs=fs)
+
+    pygame.init()
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Traffic Intersection Simulation (State Machine + Virtual IoT Clearance)")
+    FONT = pygame.font.SysFont("Arial", 16)
+    SMALL_FONT = pygame.font.SysFont("Arial", 12)
+    # grass, roads, box and lane lines never change; rendered once, blitted every frame
+    background = render_background()
+
+    # Initialize siren sound, synthesized once and then loaded from the cache
+    siren_sound = None
+    siren_channels = None
+    try:
+        siren_sound = pygame.mixer.Sound(str(siren_asset()))
+        siren_channels = SirenChannels(siren_sound)
+    except (pygame.error, OSError):
+        # no audio device or no writable cache: run without siren sound
+        pass
+
+    rng = RandomStreams(SEED)
+    print(f"Random seed: {rng.seed}")
+
+    if platform.system() == "Emscripten":
+        asyncio.ensure_future(main())
+    else:
+        asyncio.run(main())
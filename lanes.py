@@ -0,0 +1,138 @@
+# lanes.py
+"""
+Per-direction lane index shared by the intersection simulations.
+
+Each lane keeps its vehicles ordered from the front (furthest along the
+direction of travel) to the back, and every car remembers its slot in that
+list, so the car ahead of / behind any vehicle is a neighbouring slot instead
+of a scan over the whole `cars` list.
+
+The index also keeps per-direction counters of the vehicles present, queued
+and committed in a vehicles.LaneCounts (one lane per direction, the same
+counters the headless engine keeps), updated on spawn, queue entry, commit
+and despawn, so the controller and the overlays read them without scanning
+`cars`.
+"""
+from vehicles import LaneCounts
+
+
+def travel_position(car):
+    # how far the car has progressed along its direction of travel (bigger = further ahead)
+    if car.direction == "N":
+        return car.y
+    if car.direction == "S":
+        return -car.y
+    if car.direction == "E":
+        return -car.x
+    return car.x
+
+
+class LaneIndex:
+    def __init__(self, directions):
+        self.directions = list(directions)
+        self.lanes = {d: [] for d in self.directions}
+        self._dirty = set()
+        self.lane_of = {d: i for i, d in enumerate(self.directions)}
+        self.lane_counts = LaneCounts(len(self.directions))
+
+    def add(self, car):
+        # new vehicles always enter at the back of their lane
+        lane = self.lanes[car.direction]
+        car.lane_slot = len(lane)
+        lane.append(car)
+        self.lane_counts.enter(self.lane_of[car.direction])
+        if car.queued_time is not None:
+            self.lane_counts.queue(self.lane_of[car.direction], car.queued_time)
+        if car.committed:
+            self.lane_counts.commit(self.lane_of[car.direction])
+
+    def discard(self, car):
+        lane = self.lanes[car.direction]
+        slot = getattr(car, "lane_slot", None)
+        if slot is not None and slot < len(lane) and lane[slot] is car:
+            del lane[slot]
+        elif car in lane:
+            lane.remove(car)
+        else:
+            return
+        self._dirty.add(car.direction)
+        queued_time = car.queued_time if car.queued_time is not None else float("nan")
+        self.lane_counts.remove([self.lane_of[car.direction]], [car.committed], [queued_time])
+
+    def mark_queued(self, car, now):
+        """`car` stopped in front of the intersection and starts waiting."""
+        car.queued_time = now
+        self.lane_counts.queue(self.lane_of[car.direction], now)
+
+    def mark_committed(self, car):
+        """`car` passed the stop line: it is committed and no longer queued."""
+        car.committed = True
+        lane = self.lane_of[car.direction]
+        self.lane_counts.commit(lane)
+        if car.queued_time is not None:
+            self.lane_counts.unqueue(lane, car.queued_time)
+            car.queued_time = None
+
+    @property
+    def queued(self):
+        """Vehicles waiting in front of the intersection, per direction."""
+        return dict(zip(self.directions, self.lane_counts.queued.tolist()))
+
+    @property
+    def committed(self):
+        """Vehicles past the stop line and still on screen, per direction."""
+        return dict(zip(self.directions, self.lane_counts.committed.tolist()))
+
+    def counts(self):
+        """Vehicles present per direction."""
+        return dict(zip(self.directions, self.lane_counts.present.tolist()))
+
+    def average_wait(self, direction, now):
+        """Mean time the queued vehicles of `direction` have been waiting so far."""
+        return float(self.lane_counts.average_waits(now)[self.lane_of[direction]])
+
+    def _reindex(self, direction):
+        for slot, car in enumerate(self.lanes[direction]):
+            car.lane_slot = slot
+        self._dirty.discard(direction)
+
+    def front_of(self, car):
+        """Vehicle directly ahead of `car` in its lane, or None."""
+        if car.direction in self._dirty:
+            self._reindex(car.direction)
+        slot = car.lane_slot
+        return self.lanes[car.direction][slot - 1] if slot > 0 else None
+
+    def behind_of(self, car):
+        """Vehicle directly behind `car` in its lane, or None."""
+        if car.direction in self._dirty:
+            self._reindex(car.direction)
+        lane = self.lanes[car.direction]
+        slot = car.lane_slot
+        return lane[slot + 1] if slot + 1 < len(lane) else None
+
+    def rear(self, direction):
+        lane = self.lanes[direction]
+        return lane[-1] if lane else None
+
+    def resort(self):
+        """
+        Restore front-to-back order after a frame of movement.
+        Lanes are almost always already sorted (vehicles only overtake when an
+        emergency vehicle drives through a queue), so this insertion pass is
+        linear in the number of vehicles.
+        """
+        for direction, lane in self.lanes.items():
+            moved = False
+            for i in range(1, len(lane)):
+                car = lane[i]
+                pos = travel_position(car)
+                j = i - 1
+                while j >= 0 and travel_position(lane[j]) < pos:
+                    lane[j + 1] = lane[j]
+                    j -= 1
+                if j != i - 1:
+                    lane[j + 1] = car
+                    moved = True
+            if moved or direction in self._dirty:
+                self._reindex(direction)
@@ -0,0 +1,222 @@
+# network.py
+"""
+A road network of simulation.py intersections.
+
+The network is a networkx graph: every node is a signalized intersection,
+every edge a road segment between two of them. Node attribute "pos" gives
+the intersection's (x, y) position with y growing southwards like the
+screen; an edge's "length" attribute is the driving distance in pixels
+between leaving one intersection's screen and entering the next one. An
+undirected graph has two-way roads, a DiGraph one-way ones.
+
+NetworkSimulation runs the intersections as the groups of one
+BatchSimulation (group i = i-th node), so hundreds of signals still cost one
+vectorized `advance` per tick. A vehicle leaving an intersection keeps its
+heading: if there is a road that way it travels along it and then enters
+the neighbour on the same approach (a southbound "N" car enters the next
+intersection from the north), with its id and spawn time preserved.
+Vehicles that find the entry blocked wait at the end of the road, one
+entering per approach and tick, so queues spill back onto the road instead
+of overlapping. Outside arrivals only spawn on approaches no road feeds.
+
+    python network.py --rows 20 --cols 20 --minutes 10
+"""
+import argparse
+import math
+import time
+
+import networkx as nx
+import numpy as np
+
+from batch_simulation import BatchSimulation
+from simulation import FPS
+from vehicles import SPEED, travel_coordinate
+
+ROAD_LENGTH = 200  # default pixels between two neighbouring screens
+
+# compass heading (dx, dy) of the vehicles of each approach: "N" cars come from the north, so head south
+HEADINGS = np.array([(0, 1), (-1, 0), (0, -1), (1, 0)])
+
+
+def grid_network(rows, cols, road_length=ROAD_LENGTH):
+    """rows x cols city grid of two-way roads; node (r, c) sits at pos (c, r)."""
+    graph = nx.grid_2d_graph(rows, cols)
+    for r, c in graph.nodes:
+        graph.nodes[r, c]["pos"] = (c, r)
+    nx.set_edge_attributes(graph, road_length, "length")
+    return graph
+
+
+def corridor_network(length, road_length=ROAD_LENGTH):
+    """A west-east arterial of `length` intersections."""
+    return grid_network(1, length, road_length)
+
+
+def downstream_nodes(graph, node):
+    """{approach index: next node} for the vehicles leaving `node` on each approach."""
+    x, y = graph.nodes[node]["pos"]
+    neighbours = graph.successors(node) if graph.is_directed() else graph.neighbors(node)
+    downstream = {}
+    for neighbour in neighbours:
+        nx_, ny = graph.nodes[neighbour]["pos"]
+        dx, dy = nx_ - x, ny - y
+        distance = math.hypot(dx, dy)
+        if distance == 0:
+            continue
+        # the approach whose heading points most directly at the neighbour, within 45 degrees
+        alignment = HEADINGS @ (dx, dy) / distance
+        d = int(np.argmax(alignment))
+        if alignment[d] > math.sqrt(0.5) and d not in downstream:
+            downstream[d] = neighbour
+    return downstream
+
+
+def road_ticks(graph, node, neighbour):
+    """Ticks a vehicle needs for the road from `node` to `neighbour`."""
+    return math.ceil(graph.edges[node, neighbour].get("length", ROAD_LENGTH) / SPEED)
+
+
+class NetworkSimulation(BatchSimulation):
+    def __init__(self, graph, nodes=None, **kwargs):
+        """Simulates `nodes` of the graph (default: all) as groups, in that order."""
+        self.graph = graph
+        self.nodes = list(graph.nodes if nodes is None else nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        n = len(self.nodes)
+        super().__init__(n, **kwargs)
+
+        # lane -> lane entered downstream (-1: leaves the network) and the road's length in ticks
+        self.next_lane = np.full(n * 4, -1, dtype=np.int64)
+        self.road_ticks = np.zeros(n * 4, dtype=np.int64)
+        for node in graph.nodes:
+            for d, neighbour in downstream_nodes(graph, node).items():
+                if neighbour not in self.node_index:
+                    continue
+                # fed by a road, so no outside arrivals on this approach
+                self.entry_lanes[self.node_index[neighbour] * 4 + d] = False
+                if node in self.node_index:
+                    lane = self.node_index[node] * 4 + d
+                    self.next_lane[lane] = self.node_index[neighbour] * 4 + d
+                    self.road_ticks[lane] = road_ticks(graph, node, neighbour)
+
+        # vehicles on the roads, in the order they left: lane entered, tick due there, and what they keep
+        self.road = {
+            "lane": np.zeros(0, dtype=np.int64),
+            "due": np.zeros(0, dtype=np.int64),
+            "id": np.zeros(0, dtype=np.int64),
+            "length": np.zeros(0),
+            "kind": np.zeros(0, dtype=np.int8),
+            "spawn_time": np.zeros(0),
+        }
+        self.exited = 0
+        self.total_trip_time = 0.0
+
+    def group_of(self, node):
+        return self.node_index[node]
+
+    # ----- Vehicles -----
+    def spawn_cars(self):
+        self.enter_from_roads()
+        super().spawn_cars()
+
+    def enter_from_roads(self):
+        road = self.road
+        due = np.flatnonzero(road["due"] <= self.clock.ticks)
+        if due.size == 0:
+            return
+        # the first vehicle due on each approach may enter if its spawn point is clear
+        lanes, first = np.unique(road["lane"][due], return_index=True)
+        candidates = due[first]
+        store = self.vehicles
+        lowest = np.full(self.num_groups * 4, np.inf)
+        np.minimum.at(lowest, store.lane, travel_coordinate(store))
+        d = lanes & 3
+        entering = candidates[lowest[lanes] >= self.spawn_threshold[d]]
+        if entering.size == 0:
+            return
+
+        lane = road["lane"][entering]
+        d = lane & 3
+        length = road["length"][entering]
+        x, y = self.geometry.spawn_positions(d, length)
+        store.extend(x, y, lane, length, road["kind"][entering], self.now)
+        self.lane_counts.enter(lane)
+        store.id[-entering.size:] = road["id"][entering]
+        store.spawn_time[-entering.size:] = road["spawn_time"][entering]
+        keep = np.ones(road["lane"].size, dtype=bool)
+        keep[entering] = False
+        for name, column in road.items():
+            road[name] = column[keep]
+
+    def depart(self, leaving):
+        store = self.vehicles
+        next_lane = self.next_lane[store.lane[leaving]]
+        on_road = next_lane >= 0
+        spawn_time = store.spawn_time[leaving]
+
+        exiting = spawn_time[~on_road]
+        self.exited += exiting.size
+        self.total_trip_time += float(np.sum(self.now - exiting))
+
+        if on_road.any():
+            road = self.road
+            lane = store.lane[leaving][on_road]
+            added = {
+                "lane": next_lane[on_road],
+                "due": self.clock.ticks + self.road_ticks[lane],
+                "id": store.id[leaving][on_road],
+                "length": store.length[leaving][on_road],
+                "kind": store.kind[leaving][on_road],
+                "spawn_time": spawn_time[on_road],
+            }
+            for name, column in added.items():
+                road[name] = np.concatenate([road[name], column])
+
+    # ----- Metrics -----
+    def vehicles_on_roads(self):
+        return int(self.road["lane"].size)
+
+    def waiting_on_roads(self):
+        """Vehicles that reached the end of their road but could not enter yet (spillback)."""
+        return int(np.count_nonzero(self.road["due"] < self.clock.ticks))
+
+    def get_average_trip_time(self):
+        """Mean seconds from entering the network to leaving it."""
+        return self.total_trip_time / self.exited if self.exited else 0.0
+
+    def get_network_throughput_per_minute(self):
+        elapsed_minutes = self.now / 60.0
+        return self.exited / elapsed_minutes if elapsed_minutes > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a grid of intersections headless.")
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--road-length", type=float, default=ROAD_LENGTH)
+    parser.add_argument("--minutes", type=float, default=10.0, help="simulated minutes")
+    parser.add_argument("--spawn-chance", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    options = {"seed": args.seed}
+    if args.spawn_chance is not None:
+        options["spawn_chance"] = args.spawn_chance
+    sim = NetworkSimulation(grid_network(args.rows, args.cols, args.road_length), **options)
+    ticks = int(args.minutes * 60 * FPS)
+    started = time.perf_counter()
+    sim.run(ticks)
+    elapsed = time.perf_counter() - started
+
+    print(f"{sim.num_groups} intersections, {ticks} ticks in {elapsed:.1f}s "
+          f"({ticks / elapsed:.0f} ticks/s)")
+    print(f"Left the network: {sim.exited} ({sim.get_network_throughput_per_minute():.1f}/min), "
+          f"avg trip {sim.get_average_trip_time():.1f}s")
+    print(f"On the roads: {sim.vehicles_on_roads()}, waiting to enter: {sim.waiting_on_roads()}, "
+          f"inside intersections: {len(sim.vehicles)}")
+    print(f"Avg wait per intersection: {sim.get_average_wait().mean():.2f}s, "
+          f"crossings/min: {sim.get_throughput_per_minute().mean():.1f}")
+
+
+if __name__ == "__main__":
+    main()
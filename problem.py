@@ -1,7 +1,8 @@
 import pygame
 import sys
-import random
-import time
+from rng_streams import RandomStreams
+from render_cache import SurfaceCache
+from sim_clock import SimClock
 
 # Initialize Pygame
 pygame.init()
@@ -24,40 +25,61 @@ BG_COLOR = (34, 139, 34)
 # Clock
 clock = pygame.time.Clock()
 FPS = 60
+# simulated time read by the controller and metrics; advanced once per frame
+sim_clock = SimClock(1.0 / FPS)
 
 # Directions
 DIRECTIONS = ["N", "E", "S", "W"]
 
 # Traffic light state
 light_index = 0
-last_switch_time = time.time()
+last_switch_time = sim_clock.now()
 SIGNAL_DURATION = 15  # seconds
 
 SAFE_DISTANCE = 45  # Minimum distance between cars in queue
 SPAWN_CHANCE = 50  # Higher number → fewer cars (was 20 before)
+SEED = None  # set to an int to replay exactly the same traffic
+rng = RandomStreams(SEED)
+print(f"Random seed: {rng.seed}")
 
-def draw_traffic_light(x, y, active_color):
-    pygame.draw.rect(SCREEN, SIGNAL_BOX, (x, y, 30, 70), border_radius=5)
+def render_traffic_light(active_color):
+    surface = pygame.Surface((30, 70), pygame.SRCALPHA)
+    pygame.draw.rect(surface, SIGNAL_BOX, (0, 0, 30, 70), border_radius=5)
     colors = [RED, YELLOW, GREEN]
     for i, color in enumerate(colors):
         light_color = color if color == active_color else (100, 100, 100)
-        pygame.draw.circle(SCREEN, light_color, (x + 15, y + 10 + 25 * i), 7)
+        pygame.draw.circle(surface, light_color, (15, 10 + 25 * i), 7)
+    return surface
 
-def draw_intersection():
-    SCREEN.fill(BG_COLOR)
+# one rasterized light per lamp state; drawing is a single blit
+traffic_lights = SurfaceCache(render_traffic_light)
+
+def draw_traffic_light(x, y, active_color):
+    SCREEN.blit(traffic_lights.get(active_color), (x, y))
+
+def render_background():
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+    surface.fill(BG_COLOR)
 
     # Roads
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))  # Vertical
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))  # Horizontal
+    pygame.draw.rect(surface, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))  # Vertical
+    pygame.draw.rect(surface, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))  # Horizontal
 
     # Yellow box
-    pygame.draw.rect(SCREEN, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
+    pygame.draw.rect(surface, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
 
     # Lane lines
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    return surface
+
+# grass, roads, box and lane lines never change; rendered once, blitted every frame
+background = render_background()
+
+def draw_intersection():
+    SCREEN.blit(background, (0, 0))
 
     # Traffic lights
     for i, direction in enumerate(DIRECTIONS):
@@ -167,8 +189,8 @@ cars = []
 
 def spawn_car():
     # Reduced spawn chance for fewer cars
-    if random.randint(0, SPAWN_CHANCE) == 0:
-        direction = random.choice(DIRECTIONS)
+    if rng.arrivals.randint(0, SPAWN_CHANCE) == 0:
+        direction = rng.arrivals.choice(DIRECTIONS)
 
         # Prevent spawning if another car is too close
         if not any(c.direction == direction and (
@@ -186,9 +208,9 @@ while True:
             pygame.quit()
             sys.exit()
 
-    if time.time() - last_switch_time > SIGNAL_DURATION:
+    if sim_clock.now() - last_switch_time > SIGNAL_DURATION:
         light_index = (light_index + 1) % 4
-        last_switch_time = time.time()
+        last_switch_time = sim_clock.now()
 
     draw_intersection()
     spawn_car()
@@ -202,3 +224,4 @@ while True:
 
     pygame.display.update()
     clock.tick(FPS)   
+    sim_clock.advance()
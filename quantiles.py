@@ -0,0 +1,107 @@
+# quantiles.py
+"""
+Constant-memory streaming quantiles for wait times.
+
+A QuantileSketch counts samples in logarithmically sized buckets (the
+DDSketch layout): bucket i holds the values in (gamma^(i-1), gamma^i], with
+gamma = (1 + a) / (1 - a) for a relative accuracy `a`. Any quantile read
+from it is within `a` of the true sample value, and the memory is a fixed
+array of bucket counts however many samples are added. Values below
+`min_value` (a zero wait) share one bucket reported as 0, values above
+`max_value` are clamped into the last one.
+
+WaitQuantiles keeps one sketch per (direction, vehicle type) and merges
+them on demand, so p50 / p95 / p99 can be asked per approach, per type or
+overall at any moment.
+"""
+import math
+
+import numpy as np
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=0.01, min_value=1e-3, max_value=1e5):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.offset = math.ceil(math.log(min_value) / self.log_gamma) - 1
+        size = math.ceil(math.log(max_value) / self.log_gamma) - self.offset + 1
+        self.counts = np.zeros(size, dtype=np.int64)  # counts[0]: values below min_value
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def bucket(self, value):
+        if value < self.min_value:
+            return 0
+        return min(math.ceil(math.log(value) / self.log_gamma) - self.offset, len(self.counts) - 1)
+
+    def add(self, value):
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        small = values < self.min_value
+        buckets = np.ceil(np.log(np.where(small, 1.0, values)) / self.log_gamma) - self.offset
+        buckets = np.where(small, 0, np.minimum(buckets, len(self.counts) - 1)).astype(np.int64)
+        np.add.at(self.counts, buckets, 1)
+        self.count += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1) of the samples so far, or 0.0 before any sample."""
+        if self.count == 0:
+            return 0.0
+        value = self.value_at_rank(self.counts, q * (self.count - 1))
+        return min(max(value, self.min), self.max)
+
+    def value_at_rank(self, counts, rank):
+        """Value of the sample at 0-based `rank` in a bucket histogram laid out like this sketch."""
+        bucket = int(np.searchsorted(np.cumsum(counts), rank, side="right"))
+        if bucket == 0:
+            return 0.0
+        # midpoint (in relative terms) of the bucket's range
+        return 2 * self.gamma ** (bucket + self.offset) / (self.gamma + 1)
+
+
+class WaitQuantiles:
+    """One QuantileSketch per (direction, vehicle type), addressed by index."""
+
+    def __init__(self, directions, vehicle_types, **sketch_options):
+        self.directions = list(directions)
+        self.vehicle_types = list(vehicle_types)
+        self.sketch_options = sketch_options
+        self.sketches = [[QuantileSketch(**sketch_options) for _ in self.vehicle_types]
+                         for _ in self.directions]
+
+    def add(self, direction, kind, wait):
+        self.sketches[direction][kind].add(wait)
+
+    def sketch(self, direction=None, vehicle_type=None):
+        """Merged sketch of one approach and/or vehicle type (by name); None means all."""
+        merged = QuantileSketch(**self.sketch_options)
+        for d, name in enumerate(self.directions):
+            if direction is not None and name != direction:
+                continue
+            for k, type_name in enumerate(self.vehicle_types):
+                if vehicle_type is None or type_name == vehicle_type:
+                    merged.merge(self.sketches[d][k])
+        return merged
+
+    def quantiles(self, qs=(0.5, 0.95, 0.99), direction=None, vehicle_type=None):
+        sketch = self.sketch(direction, vehicle_type)
+        return [sketch.quantile(q) for q in qs]
@@ -1,7 +1,9 @@
 import pygame
 import sys
-import random
-import time
+from lanes import LaneIndex
+from rng_streams import RandomStreams
+from render_cache import SurfaceCache, TextCache
+from sim_clock import SimClock
 
 # Initialize Pygame
 pygame.init()
@@ -24,6 +26,8 @@ BG_COLOR = (34, 139, 34)
 # Clock
 clock = pygame.time.Clock()
 FPS = 60
+# simulated time read by the controller and metrics; advanced once per frame
+sim_clock = SimClock(1.0 / FPS)
 
 # Directions
 DIRECTIONS = ["N", "E", "S", "W"]
@@ -34,29 +38,57 @@ MAX_GREEN = 30.0  # if green lasts this long, controller will consider switching
 STARVE_TIME = 25.0  # if a lane hasn't had green for this long, it's prioritized
 SAFE_DISTANCE = 45  # Minimum distance between cars in queue
 SPAWN_CHANCE = 20  # Higher number → fewer vehicles
+SEED = None  # set to an int to replay exactly the same traffic
+rng = RandomStreams(SEED)
+print(f"Random seed: {rng.seed}")
 
 # Font for metrics
 FONT = pygame.font.SysFont("Arial", 16)
+text_cache = TextCache()
 
-def draw_traffic_light(x, y, active_color):
-    pygame.draw.rect(SCREEN, SIGNAL_BOX, (x, y, 30, 70), border_radius=5)
+def render_panel_background(w, h):
+    s = pygame.Surface((w, h), pygame.SRCALPHA)
+    s.fill((0, 0, 0, 160))
+    return s
+
+# translucent panel backgrounds, by size
+panel_backgrounds = SurfaceCache(render_panel_background)
+
+def render_traffic_light(active_color):
+    surface = pygame.Surface((30, 70), pygame.SRCALPHA)
+    pygame.draw.rect(surface, SIGNAL_BOX, (0, 0, 30, 70), border_radius=5)
     colors = [RED, YELLOW, GREEN]
     for i, color in enumerate(colors):
         light_color = color if color == active_color else (100, 100, 100)
-        pygame.draw.circle(SCREEN, light_color, (x + 15, y + 10 + 25 * i), 7)
+        pygame.draw.circle(surface, light_color, (15, 10 + 25 * i), 7)
+    return surface
 
-def draw_intersection():
-    SCREEN.fill(BG_COLOR)
+# one rasterized light per lamp state; drawing is a single blit
+traffic_lights = SurfaceCache(render_traffic_light)
+
+def draw_traffic_light(x, y, active_color):
+    SCREEN.blit(traffic_lights.get(active_color), (x, y))
+
+def render_background():
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+    surface.fill(BG_COLOR)
     # Roads
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))  # Vertical
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))  # Horizontal
+    pygame.draw.rect(surface, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))  # Vertical
+    pygame.draw.rect(surface, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))  # Horizontal
     # Yellow box
-    pygame.draw.rect(SCREEN, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
+    pygame.draw.rect(surface, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
     # Lane lines
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    return surface
+
+# grass, roads, box and lane lines never change; rendered once, blitted every frame
+background = render_background()
+
+def draw_intersection():
+    SCREEN.blit(background, (0, 0))
     # Traffic lights (shifted to sides)
     for i, direction in enumerate(DIRECTIONS):
         is_active = i == light_index
@@ -70,7 +102,7 @@ def draw_intersection():
         elif direction == "W":
             draw_traffic_light(WIDTH // 2 - 70, HEIGHT // 2 - 15, light_color)
 
-def draw_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_width):
+def paint_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_width):
     if sprite_type == 'car':
         body_color = (0, 0, 255)  # blue
     elif sprite_type == 'bus':
@@ -147,6 +179,24 @@ def draw_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_w
             # Windshield
             pygame.draw.polygon(screen, (200, 200, 200), [(x + 8, y + 4), (x + 8, y + vehicle_width - 4), (x + 3, y + vehicle_width // 2)])
 
+SPRITE_MARGIN = 2  # wheels stick out a pixel past the vehicle's x/y box
+
+def render_vehicle(direction, sprite_type, vehicle_length, vehicle_width):
+    if direction in ["N", "S"]:
+        size = (vehicle_width + 2 * SPRITE_MARGIN, vehicle_length + 2 * SPRITE_MARGIN)
+    else:
+        size = (vehicle_length + 2 * SPRITE_MARGIN, vehicle_width + 2 * SPRITE_MARGIN)
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    paint_vehicle(surface, SPRITE_MARGIN, SPRITE_MARGIN, direction, sprite_type, vehicle_length, vehicle_width)
+    return surface
+
+# each (direction, type, length, width) is painted once; a vehicle then costs one blit
+vehicle_sprites = SurfaceCache(render_vehicle)
+
+def draw_vehicle(screen, x, y, direction, sprite_type, vehicle_length, vehicle_width):
+    sprite = vehicle_sprites.get(direction, sprite_type, vehicle_length, vehicle_width)
+    screen.blit(sprite, (x - SPRITE_MARGIN, y - SPRITE_MARGIN))
+
 class Car:
     SPEED = 2
 
@@ -159,7 +209,7 @@ class Car:
         self.stopped = False
         self.committed = False
         self.queued_time = None
-        self.spawn_time = time.time()
+        self.spawn_time = sim_clock.now()
         self.crossed = False
         if direction == "N":
             self.x = WIDTH // 2 - 15
@@ -189,8 +239,7 @@ class Car:
         if self.direction == "W":
             return self.x + self.vehicle_length >= cx - 300
 
-    def will_move_this_frame(self, cars):
-        front_car = self.get_front_car(cars)
+    def will_move_this_frame(self, front_car):
         if self.direction == "N":
             stop_line = HEIGHT // 2 - 60
             if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
@@ -212,45 +261,37 @@ class Car:
                 return True
             return False
 
-    def move(self, cars):
-        front_car = self.get_front_car(cars)
-        will_move = self.will_move_this_frame(cars)
+    def move(self):
+        front_car = self.get_front_car()
+        will_move = self.will_move_this_frame(front_car)
         if not will_move and self.queued_time is None and not self.committed and self._near_intersection_region():
-            self.queued_time = time.time()
+            lane_index.mark_queued(self, sim_clock.now())
         if self.direction == "N":
             stop_line = HEIGHT // 2 - 60
             if not self.committed and self.can_pass() and self.y + self.vehicle_length >= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
                 self.y += Car.SPEED
         elif self.direction == "S":
             stop_line = HEIGHT // 2 + 60
             if not self.committed and self.can_pass() and self.y <= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y > stop_line and self.safe_to_move(front_car)):
                 self.y -= Car.SPEED
         elif self.direction == "E":
             stop_line = WIDTH // 2 + 60
             if not self.committed and self.can_pass() and self.x <= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x > stop_line and self.safe_to_move(front_car)):
                 self.x -= Car.SPEED
         elif self.direction == "W":
             stop_line = WIDTH // 2 - 60
             if not self.committed and self.can_pass() and self.x + self.vehicle_length >= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x + self.vehicle_length < stop_line and self.safe_to_move(front_car)):
                 self.x += Car.SPEED
         if not self.crossed:
@@ -275,20 +316,8 @@ class Car:
         elif self.direction == "W":
             return front_car.x - (self.x + self.vehicle_length) > SAFE_DISTANCE
 
-    def get_front_car(self, cars):
-        same_lane_cars = [car for car in cars if car.direction == self.direction and car != self]
-        if self.direction == "N":
-            same_lane_cars = [car for car in same_lane_cars if car.y > self.y]
-            return min(same_lane_cars, key=lambda c: c.y, default=None)
-        elif self.direction == "S":
-            same_lane_cars = [car for car in same_lane_cars if car.y < self.y]
-            return max(same_lane_cars, key=lambda c: c.y, default=None)
-        elif self.direction == "E":
-            same_lane_cars = [car for car in same_lane_cars if car.x < self.x]
-            return max(same_lane_cars, key=lambda c: c.x, default=None)
-        elif self.direction == "W":
-            same_lane_cars = [car for car in same_lane_cars if car.x > self.x]
-            return min(same_lane_cars, key=lambda c: c.x, default=None)
+    def get_front_car(self):
+        return lane_index.front_of(self)
 
     def can_pass(self):
         return DIRECTIONS[light_index] == self.direction
@@ -297,27 +326,27 @@ class Car:
         draw_vehicle(SCREEN, self.x, self.y, self.direction, self.sprite_type, self.vehicle_length, self.vehicle_width)
 
 cars = []
+lane_index = LaneIndex(DIRECTIONS)
 
 def spawn_too_close(direction):
-    for c in cars:
-        if c.direction != direction:
-            continue
-        if direction == "N" and c.y < SAFE_DISTANCE:
-            return True
-        if direction == "S" and c.y > HEIGHT - SAFE_DISTANCE:
-            return True
-        if direction == "E" and c.x > WIDTH - SAFE_DISTANCE:
-            return True
-        if direction == "W" and c.x < SAFE_DISTANCE:
-            return True
-    return False
+    # only the rearmost car of the lane can be near the spawn point
+    c = lane_index.rear(direction)
+    if c is None:
+        return False
+    if direction == "N":
+        return c.y < SAFE_DISTANCE
+    if direction == "S":
+        return c.y > HEIGHT - SAFE_DISTANCE
+    if direction == "E":
+        return c.x > WIDTH - SAFE_DISTANCE
+    return c.x < SAFE_DISTANCE
 
 def spawn_car():
-    if random.randint(0, SPAWN_CHANCE) == 0:
-        direction = random.choice(DIRECTIONS)
+    if rng.arrivals.randint(0, SPAWN_CHANCE) == 0:
+        direction = rng.arrivals.choice(DIRECTIONS)
         if spawn_too_close(direction):
             return
-        r = random.random()
+        r = rng.vehicle_type.random()
         if r < 0.5:
             vehicle_type = "car"
         elif r < 0.98:
@@ -326,23 +355,22 @@ def spawn_car():
             vehicle_type = "ambulance"
         else:
             vehicle_type = "fire"
-        cars.append(Car(direction, vehicle_type))
+        car = Car(direction, vehicle_type)
+        cars.append(car)
+        lane_index.add(car)
 
 
 # Adaptive controller state
 light_index = 0
-last_switch_time = time.time()
-last_served = {d: time.time() for d in DIRECTIONS}
+last_switch_time = sim_clock.now()
+last_served = {d: sim_clock.now() for d in DIRECTIONS}
 
 def get_queue_counts():
-    counts = {d: 0 for d in DIRECTIONS}
-    for c in cars:
-        counts[c.direction] += 1
-    return counts
+    return lane_index.counts()
 
 def choose_next_direction(exclude_dir=None):
     counts = get_queue_counts()
-    now = time.time()
+    now = sim_clock.now()
     starving = [d for d in DIRECTIONS if now - last_served.get(d, 0) >= STARVE_TIME]
     if exclude_dir:
         starving = [d for d in starving if d != exclude_dir]
@@ -373,7 +401,7 @@ emergency_override = False
 emergency_direction = None
 
 # Metrics variables
-sim_start_time = time.time()
+sim_start_time = sim_clock.now()
 total_wait_time = 0.0
 total_served_waits = 0
 throughput_count = 0
@@ -382,7 +410,7 @@ def record_wait_time(queued_time):
     global total_wait_time, total_served_waits
     if queued_time is None:
         return
-    wait = time.time() - queued_time
+    wait = sim_clock.now() - queued_time
     total_wait_time += wait
     total_served_waits += 1
 
@@ -392,7 +420,7 @@ def get_average_wait():
     return total_wait_time / total_served_waits
 
 def get_throughput_per_minute():
-    elapsed_minutes = (time.time() - sim_start_time) / 60.0
+    elapsed_minutes = (sim_clock.now() - sim_start_time) / 60.0
     if elapsed_minutes <= 0:
         return 0.0
     return throughput_count / elapsed_minutes
@@ -400,11 +428,7 @@ def get_throughput_per_minute():
 def draw_metrics():
     avg_wait = get_average_wait()
     tpm = get_throughput_per_minute()
-    counts = get_queue_counts()
-    queued_counts = {d: 0 for d in DIRECTIONS}
-    for c in cars:
-        if c.queued_time is not None:
-            queued_counts[c.direction] += 1
+    queued_counts = lane_index.queued
     lines = [
         f"Avg wait (s): {avg_wait:.2f}",
         f"Throughput (total): {throughput_count}",
@@ -417,11 +441,9 @@ def draw_metrics():
     box_h = 20 * len(lines) + padding * 2
     box_x = 10
     box_y = 10
-    s = pygame.Surface((box_w, box_h), pygame.SRCALPHA)
-    s.fill((0, 0, 0, 160))
-    SCREEN.blit(s, (box_x, box_y))
+    SCREEN.blit(panel_backgrounds.get(box_w, box_h), (box_x, box_y))
     for i, line in enumerate(lines):
-        txt = FONT.render(line, True, (255, 255, 255))
+        txt = text_cache.render(FONT, line, (255, 255, 255))
         SCREEN.blit(txt, (box_x + padding, box_y + padding + i * 20))
 
 # Main loop
@@ -431,7 +453,7 @@ while True:
         if event.type == pygame.QUIT:
             pygame.quit()
             sys.exit()
-    now = time.time()
+    now = sim_clock.now()
     elapsed = now - last_switch_time
     emergency_cars = [c for c in cars if c.is_emergency]
     if emergency_cars:
@@ -477,13 +499,14 @@ while True:
     draw_intersection()
     spawn_car()
     for car in cars[:]:
-        car.move(cars)
+        car.move()
         car.draw()
     new_cars = []
     for car in cars:
         if -MAX_VEHICLE_SIZE <= car.x <= WIDTH + MAX_VEHICLE_SIZE and -MAX_VEHICLE_SIZE <= car.y <= HEIGHT + MAX_VEHICLE_SIZE:
             new_cars.append(car)
         else:
+            lane_index.discard(car)
             if car.crossed:
                 throughput_count += 1
             if car.queued_time is not None:
@@ -492,4 +515,5 @@ while True:
     cars = new_cars
     draw_metrics()
     pygame.display.update()
-    clock.tick(FPS)
\ No newline at end of file
+    clock.tick(FPS)
+    sim_clock.advance()
\ No newline at end of file
@@ -0,0 +1,114 @@
+# render_cache.py
+"""
+Caches for the pygame front ends.
+
+A SurfaceCache calls its render function once per distinct key and keeps the
+resulting Surface, so scenery that never changes (the road background, a
+traffic light in a given state) is rasterized once and then only blitted.
+TextCache does the same for font rendering, and a Layer holds an overlay
+panel that is only redrawn when the values it displays change. DirtyRects
+limits the display update to the areas that changed since the last frame.
+"""
+from collections import OrderedDict
+
+import pygame
+
+
+class SurfaceCache:
+    def __init__(self, render):
+        self.render = render
+        self.surfaces = {}
+
+    def get(self, *key):
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = self.render(*key)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+class TextCache:
+    """Rendered text keyed by (font, string, color); least recently used entries are dropped."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = font.render(text, True, color)
+            if len(self.surfaces) > self.max_entries:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+
+class Layer:
+    """
+    Transparent surface that is repainted only when the state it shows
+    changes. `paint(surface, state)` draws in layer-local coordinates.
+    """
+
+    def __init__(self, size, paint):
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.paint = paint
+        self.state = None
+
+    def get(self, state):
+        if state != self.state:
+            self.surface.fill((0, 0, 0, 0))
+            self.paint(self.surface, state)
+            self.state = state
+        return self.surface
+
+
+class DirtyRects:
+    """
+    Pushes only the changed parts of a frame to the display.
+
+    The frame is still composed in full on the screen surface; each drawn
+    item is tracked under a stable key with its screen rect and a `state`
+    that changes whenever its pixels do. An item that moved, changed state,
+    appeared or disappeared dirties both its old and new rect, and `flush()`
+    updates just those. When they cover more than `full_update_ratio` of the
+    screen (dense scenes), one full update is cheaper and is used instead.
+    """
+
+    def __init__(self, size, enabled=True, full_update_ratio=0.4):
+        self.enabled = enabled
+        self.max_dirty_area = size[0] * size[1] * full_update_ratio
+        self.previous = None  # nothing on the display yet: first flush is a full update
+        self.current = {}
+
+    def track(self, key, rect, state=None):
+        if self.enabled:
+            self.current[key] = (pygame.Rect(rect), state)
+        return rect
+
+    def flush(self):
+        previous, current = self.previous, self.current
+        self.current = {}
+        if not self.enabled or previous is None:
+            self.previous = current
+            pygame.display.update()
+            return
+        self.previous = current
+        dirty = []
+        for key, drawn in current.items():
+            before = previous.get(key)
+            if before != drawn:
+                dirty.append(drawn[0])
+                if before is not None:
+                    dirty.append(before[0])
+        for key, before in previous.items():
+            if key not in current:
+                dirty.append(before[0])
+        if sum(rect.w * rect.h for rect in dirty) > self.max_dirty_area:
+            pygame.display.update()
+        elif dirty:
+            pygame.display.update(dirty)
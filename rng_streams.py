@@ -0,0 +1,23 @@
+# rng_streams.py
+"""
+Seeded random streams for one simulation run.
+
+Arrivals, vehicle types and emergency events each draw from their own
+random.Random, all derived from a single seed, so a run can be replayed
+exactly from its seed and consuming one stream differently (say, a new
+emergency rule) does not shift the traffic the others produce.
+"""
+import random
+
+STREAMS = ("arrivals", "vehicle_type", "emergency")
+
+
+class RandomStreams:
+    def __init__(self, seed=None):
+        if seed is None:
+            # pick one and keep it, so an unseeded run can still be replayed
+            seed = random.SystemRandom().randrange(2 ** 32)
+        self.seed = seed
+        for name in STREAMS:
+            # str seeds hash deterministically (unlike hash()), independent of PYTHONHASHSEED
+            setattr(self, name, random.Random(f"{seed}:{name}"))
@@ -0,0 +1,86 @@
+# sim_clock.py
+"""
+Simulated time source shared by the intersection simulations.
+
+Every timestamp the controller and metrics use (spawn / queue times, green
+and delay timers, starvation, throughput per minute) is read from a SimClock
+instead of time.time(). The clock only moves when the simulation advances a
+tick, so the same run gives the same numbers whether it is rendered at 60 FPS
+or fast-forwarded headless.
+
+FrameScheduler paces the rendered front ends: it turns elapsed wall-clock
+time into a number of fixed simulation ticks per frame, so the simulation
+speed no longer depends on how fast frames are drawn.
+"""
+import time
+
+
+class SimClock:
+    def __init__(self, tick_length=1.0 / 60, start=0.0):
+        self.tick_length = tick_length
+        self.start = start
+        self.ticks = 0
+
+    def now(self):
+        return self.time_at(self.ticks)
+
+    def time_at(self, ticks):
+        # computed from the tick count so long runs don't accumulate float drift
+        return self.start + ticks * self.tick_length
+
+    def advance(self, ticks=1):
+        self.ticks += ticks
+        return self.now()
+
+    def seconds(self, ticks):
+        return ticks * self.tick_length
+
+
+class FrameScheduler:
+    """
+    Fixed-step simulation with an independent frame rate.
+
+    Each frame, `ticks_due()` converts the wall-clock time since the last
+    frame, scaled by `speed` (simulated seconds per real second, so 10.0 is a
+    10x fast-forward), into whole ticks of `tick_length`; the remainder carries
+    over to the next frame. Frame gaps longer than `max_frame_time` (window
+    dragged, debugger pause, steps slower than real time) are clamped, so the
+    simulation slows down instead of trying to catch up forever.
+
+    `should_render()` skips drawing a frame when stepping already used up the
+    frame budget, but never more than `max_skipped` frames in a row.
+    """
+
+    def __init__(self, tick_length, speed=1.0, render_fps=60, max_frame_time=0.25, max_skipped=5,
+                 timer=time.perf_counter):
+        self.tick_length = tick_length
+        self.speed = speed
+        self.frame_time = 1.0 / render_fps
+        self.max_frame_time = max_frame_time
+        self.max_skipped = max_skipped
+        self.timer = timer
+        self.pending = 0.0  # ticks owed to the simulation, fractional
+        self.frame_start = None
+        self.skipped = 0
+
+    def ticks_due(self):
+        now = self.timer()
+        if self.frame_start is not None:
+            elapsed = min(now - self.frame_start, self.max_frame_time)
+            self.pending += elapsed * self.speed / self.tick_length
+        self.frame_start = now
+        # tolerance so timer rounding doesn't turn one tick per frame into 0, 2, 0, 2...
+        ticks = int(self.pending + 1e-6)
+        self.pending = max(self.pending - ticks, 0.0)
+        return ticks
+
+    def should_render(self):
+        if self.timer() - self.frame_start > self.frame_time and self.skipped < self.max_skipped:
+            self.skipped += 1
+            return False
+        self.skipped = 0
+        return True
+
+    def idle_time(self):
+        """Seconds left in the current frame's budget, for loops that sleep between frames."""
+        return max(self.frame_start + self.frame_time - self.timer(), 0.0)
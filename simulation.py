@@ -0,0 +1,396 @@
+# simulation.py
+"""
+Headless core of the graph.py intersection: vehicles, the adaptive light
+state machine (GREEN -> START_SWITCH -> WAIT_CLEAR -> DELAY) and the wait /
+throughput metrics, with no pygame display, fonts or mixer.
+
+Vehicles live in a NumPy VehicleStore (see vehicles.py) and are moved by one
+vectorized step per tick. A Simulation advances its SimClock by one fixed
+tick (1 / FPS simulated seconds by default) per step, so `run(ticks)` goes as
+fast as the CPU allows.
+graph.py drives the same object once per rendered frame.
+event_simulation.py jumps over the ticks in which nothing but motion happens.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from quantiles import WaitQuantiles
+from rng_streams import RandomStreams
+from sim_clock import SimClock
+from trip_log import TripLog
+from windowed_metrics import WindowedMetrics
+from vehicles import (VehicleStore, LaneCounts, Geometry, VEHICLE_TYPES, FIRST_EMERGENCY_KIND, advance,
+                      in_bounds, box_occupied, distance_to_center_sq, travel_coordinate, vehicle_length)
+
+WIDTH, HEIGHT = 900, 800
+FPS = 60
+
+DIRECTIONS = ["N", "E", "S", "W"]
+
+# Timing / parameters
+MIN_GREEN = 5.0
+MAX_GREEN = 30.0
+STARVE_TIME = 25.0
+SAFE_DISTANCE = 15
+SPAWN_CHANCE = 15  # the lower, the more often vehicles spawn (random modulus)
+CLEAR_DELAY = 1.0  # grace period after the intersection is clear before switching
+DEMAND_WINDOW = 60.0  # arrivals over the last minute are the "recent demand" the controller can weigh
+
+
+# ----- Simulation -----
+class Simulation:
+    def __init__(self, min_green=MIN_GREEN, max_green=MAX_GREEN, starve_time=STARVE_TIME,
+                 safe_distance=SAFE_DISTANCE, spawn_chance=SPAWN_CHANCE, clock=None, seed=None, trip_log=None,
+                 demand_weight=0.0):
+        self.min_green = min_green
+        self.max_green = max_green
+        self.starve_time = starve_time
+        self.safe_distance = safe_distance
+        self.spawn_chance = spawn_chance
+        # score added per arrival an approach had in the last DEMAND_WINDOW; 0 = present vehicles only
+        self.demand_weight = demand_weight
+        # every timer and metric reads this clock; it only moves in step()
+        self.clock = clock if clock is not None else SimClock(1.0 / FPS)
+        # separate arrival / vehicle type / emergency streams, all derived from `seed`
+        self.streams = RandomStreams(seed)
+
+        self.geometry = Geometry(WIDTH, HEIGHT)
+        self.vehicles = VehicleStore()
+        # vehicles present / queued / committed per direction, kept up to date instead of recounted
+        self.lane_counts = LaneCounts(len(DIRECTIONS))
+        self.spawn_threshold = self.geometry.spawn_threshold(safe_distance)
+
+        # light state machine
+        self.light_index = 0
+        self.light_state = "GREEN"  # GREEN, START_SWITCH, WAIT_CLEAR, DELAY
+        self.green_start_time = self.now
+        self.switch_request_time = None
+        self.clear_start_time = None
+        self.delay_start_time = None
+        self.last_switch_time = self.now
+        self.last_served = {d: self.now for d in DIRECTIONS}
+        # direction index chosen by an external controller (traffic_env.py); None = adaptive
+        self.requested_direction = None
+
+        # emergency override (set by the siren detector in graph.py)
+        self.emergency_override = False
+        self.emergency_direction = None
+        self.listening_for_siren = False
+
+        # metrics
+        self.sim_start_time = self.now
+        self.total_wait_time = 0.0
+        self.total_served_waits = 0
+        self.throughput_count = 0
+        # p50 / p95 / p99 of the recorded waits, per direction and vehicle type
+        self.wait_quantiles = WaitQuantiles(DIRECTIONS, VEHICLE_TYPES)
+        # throughput, arrivals (also per approach) and waits over the last 1 / 5 / 15 simulated minutes
+        self.recent = WindowedMetrics(start=self.now, approaches=len(DIRECTIONS))
+        # optional TripLog (trip_log.py) that receives every vehicle leaving the screen
+        self.trip_log = trip_log
+
+    @property
+    def now(self):
+        return self.clock.now()
+
+    # ----- Vehicles -----
+    def add_vehicle(self, direction, vehicle_type):
+        d = DIRECTIONS.index(direction)
+        length = vehicle_length(vehicle_type)
+        x, y = self.geometry.spawn_position(d, length)
+        self.recent.record_arrivals(self.now, approach=d)
+        self.lane_counts.enter(d)
+        return self.vehicles.add(x, y, d, length, VEHICLE_TYPES.index(vehicle_type), self.now)
+
+    def spawn_too_close(self, direction):
+        d = DIRECTIONS.index(direction)
+        store = self.vehicles
+        in_lane = store.lane == d
+        return bool(np.any(travel_coordinate(store)[in_lane] < self.spawn_threshold[d]))
+
+    def spawn_car(self):
+        if self.streams.arrivals.randint(0, self.spawn_chance) == 0:
+            self.spawn_arrival()
+
+    def spawn_arrival(self):
+        # a vehicle arrives this tick: pick its approach and type
+        direction = self.streams.arrivals.choice(DIRECTIONS)
+        if self.spawn_too_close(direction):
+            return
+        r = self.streams.vehicle_type.random()
+        if r < 0.7:
+            vehicle_type = "car"
+        else:
+            vehicle_type = "bus"
+        self.add_vehicle(direction, vehicle_type)
+
+    def spawn_emergency(self, direction, vehicle_type):
+        """Spawn an emergency vehicle and force its approach green. Returns True if it spawned."""
+        if self.spawn_too_close(direction):
+            return False
+        self.add_vehicle(direction, vehicle_type)
+        self.emergency_override = True
+        self.emergency_direction = direction
+        self.set_green_for_emergency(direction)
+        return True
+
+    # ----- Controller -----
+    def green_lanes(self):
+        # can_pass per lane
+        green = np.zeros(len(DIRECTIONS), dtype=bool)
+        if self.light_state == "GREEN":
+            green[self.light_index] = True
+        return green
+
+    def get_queue_counts(self):
+        return dict(zip(DIRECTIONS, self.lane_counts.present.tolist()))
+
+    def get_queued_counts(self):
+        return dict(zip(DIRECTIONS, self.lane_counts.queued.tolist()))
+
+    def get_current_waits(self):
+        # average wait of the vehicles queued right now, per direction
+        return dict(zip(DIRECTIONS, self.lane_counts.average_waits(self.now).tolist()))
+
+    def get_recent_demand(self):
+        """Arrivals per direction over the last DEMAND_WINDOW seconds."""
+        return dict(zip(DIRECTIONS, self.recent.approach_arrivals(DEMAND_WINDOW, self.now).tolist()))
+
+    def get_direction_scores(self):
+        """What choose_next_direction ranks the directions by: vehicles present, plus weighted recent demand."""
+        counts = self.get_queue_counts()
+        if not self.demand_weight:
+            return counts
+        demand = self.get_recent_demand()
+        return {d: counts[d] + self.demand_weight * demand[d] for d in DIRECTIONS}
+
+    def choose_next_direction(self, exclude_dir=None):
+        counts = self.get_direction_scores()
+        now = self.now
+        starving = [d for d in DIRECTIONS if now - self.last_served.get(d, 0) >= self.starve_time]
+        if exclude_dir:
+            starving = [d for d in starving if d != exclude_dir]
+        if starving:
+            best = max(starving, key=lambda d: counts.get(d, 0))
+            return DIRECTIONS.index(best)
+        if counts:
+            max_count = max(counts.values())
+        else:
+            max_count = 0
+        if max_count == 0:
+            # no queues; rotate to next to avoid permanent same dir
+            return (self.light_index + 1) % 4
+        best_dirs = [d for d, cnt in counts.items() if cnt == max_count]
+        if exclude_dir:
+            best_dirs = [d for d in best_dirs if d != exclude_dir]
+            if not best_dirs:
+                for d in DIRECTIONS:
+                    if d != exclude_dir:
+                        return DIRECTIONS.index(d)
+                return self.light_index
+        current_dir = DIRECTIONS[self.light_index]
+        if current_dir in best_dirs:
+            return self.light_index
+        return DIRECTIONS.index(best_dirs[0])
+
+    def next_direction(self, exclude_dir=None):
+        requested = self.requested_direction
+        if requested is not None and DIRECTIONS[requested] != exclude_dir:
+            return requested
+        return self.choose_next_direction(exclude_dir)
+
+    def set_green_for_emergency(self, direction):
+        self.light_index = DIRECTIONS.index(direction)
+        self.light_state = "GREEN"
+        self.green_start_time = self.now
+        self.switch_request_time = None
+        self.clear_start_time = None
+        self.delay_start_time = None
+        self.last_switch_time = self.now
+        self.last_served[direction] = self.now
+
+    def intersection_clear(self):
+        """
+        Virtual IoT sensor: return True if no vehicle is inside the central intersection box.
+        Intersection box is WIDTH//2 - 60 .. +60 and HEIGHT//2 -60 .. +60.
+        """
+        return not np.any(box_occupied(self.vehicles, self.geometry))
+
+    # ----- Metrics -----
+    def record_wait_time(self, queued_time, direction, vehicle_type):
+        if queued_time is None:
+            return
+        self.record_waits(np.array([self.now - queued_time]), np.array([DIRECTIONS.index(direction)]),
+                          np.array([VEHICLE_TYPES.index(vehicle_type)]))
+
+    def record_waits(self, waits, directions, kinds):
+        now = self.now
+        for wait, d, kind in zip(waits.tolist(), directions.tolist(), kinds.tolist()):
+            self.total_wait_time += wait
+            self.wait_quantiles.add(d, kind, wait)
+            self.recent.record_wait(now, wait)
+        self.total_served_waits += len(waits)
+
+    def get_average_wait(self):
+        if self.total_served_waits == 0:
+            return 0.0
+        return self.total_wait_time / self.total_served_waits
+
+    def get_wait_quantiles(self, qs=(0.5, 0.95, 0.99), direction=None, vehicle_type=None):
+        """Wait-time quantiles so far, overall or for one direction / vehicle type."""
+        return self.wait_quantiles.quantiles(qs, direction, vehicle_type)
+
+    def get_recent_metrics(self):
+        """Throughput / arrivals per minute and wait mean / percentiles over each sliding window."""
+        return self.recent.summary(self.now)
+
+    def get_recent_throughput(self):
+        """Departures per minute over each sliding window, without the wait percentiles of get_recent_metrics."""
+        now = self.now
+        return {w: self.recent.throughput_per_minute(w, now) for w in self.recent.windows}
+
+    def get_throughput_per_minute(self):
+        elapsed_minutes = (self.now - self.sim_start_time) / 60.0
+        if elapsed_minutes <= 0:
+            return 0.0
+        return self.throughput_count / elapsed_minutes
+
+    # ----- Tick -----
+    def step(self):
+        now = self.now
+
+        # spawn and move vehicles
+        self.spawn_car()
+        store = self.vehicles
+        waits, served = advance(store, self.green_lanes(), now, self.safe_distance, self.geometry,
+                                self.lane_counts)
+        if served.size:
+            self.record_waits(waits, store.direction()[served], store.kind[served])
+
+        # remove off-screen vehicles and account throughput/waits
+        keep = in_bounds(store, self.geometry)
+        if not keep.all():
+            leaving = ~keep
+            departed = int(np.count_nonzero(store.crossed[leaving]))
+            self.throughput_count += departed
+            self.recent.record_departures(now, departed)
+            queued = store.queued_time[leaving]
+            waiting = ~np.isnan(queued)
+            self.record_waits(now - queued[waiting], store.direction()[leaving][waiting],
+                              store.kind[leaving][waiting])
+            if self.trip_log is not None:
+                self.trip_log.record(store, leaving, now)
+            self.lane_counts.leave(store, leaving)
+            store.compact(keep)
+
+        # emergency detection and override handling
+        if store.count and store.kind.max() >= FIRST_EMERGENCY_KIND:
+            rows = np.flatnonzero(store.is_emergency())
+            prioritized = rows[np.argmin(distance_to_center_sq(store, self.geometry)[rows])]
+            desired_dir = DIRECTIONS[store.direction()[prioritized]]
+            if (not self.emergency_override) or (self.emergency_direction != desired_dir):
+                self.emergency_override = True
+                self.emergency_direction = desired_dir
+                self.set_green_for_emergency(desired_dir)
+        else:
+            if self.emergency_override and not self.listening_for_siren:
+                just_cleared = self.emergency_direction
+                self.emergency_override = False
+                self.emergency_direction = None
+                self.last_served[just_cleared] = now
+                # request a switch out of the just cleared direction
+                if self.light_state == "GREEN":
+                    self.light_state = "START_SWITCH"
+                    self.switch_request_time = now
+
+        # ----- State Machine (with IoT clearance every cycle) -----
+        if self.light_state == "GREEN":
+            elapsed_green = now - self.green_start_time
+            need_switch = False
+            if elapsed_green >= self.max_green:
+                need_switch = True
+            elif elapsed_green >= self.min_green:
+                suggested = self.next_direction()
+                if suggested != self.light_index:
+                    need_switch = True
+            if need_switch and not self.emergency_override:
+                self.light_state = "START_SWITCH"
+                self.switch_request_time = now
+
+        elif self.light_state == "START_SWITCH":
+            # Enter WAIT_CLEAR so that IoT sensors check the intersection each cycle
+            self.light_state = "WAIT_CLEAR"
+            self.clear_start_time = now
+
+        elif self.light_state == "WAIT_CLEAR":
+            # don't switch until the virtual IoT sensors report the box clear
+            if self.intersection_clear():
+                self.light_state = "DELAY"
+                self.delay_start_time = now
+
+        elif self.light_state == "DELAY":
+            if now - self.delay_start_time >= CLEAR_DELAY:
+                prev_dir = DIRECTIONS[self.light_index]
+                self.light_index = self.next_direction(exclude_dir=prev_dir)
+                self.light_state = "GREEN"
+                self.green_start_time = now
+                self.last_served[DIRECTIONS[self.light_index]] = now
+
+        self.clock.advance()
+
+    def run(self, ticks):
+        for _ in range(ticks):
+            self.step()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the intersection simulation headless.")
+    parser.add_argument("--minutes", type=float, default=60.0, help="simulated minutes to run")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--spawn-chance", type=int, default=SPAWN_CHANCE,
+                        help="1 / (n + 1) arrival odds per tick; raise it for light (overnight) traffic")
+    parser.add_argument("--demand-weight", type=float, default=0.0,
+                        help="let the controller also weigh each approach's arrivals over the last minute")
+    parser.add_argument("--events", action="store_true",
+                        help="jump between significant events instead of stepping every tick")
+    parser.add_argument("--trip-log", default=None,
+                        help="write one row per departed vehicle to this .parquet (or .csv) file")
+    args = parser.parse_args()
+
+    trip_log = TripLog(args.trip_log) if args.trip_log else None
+    if args.events:
+        from event_simulation import EventSimulation  # imports this module, so not at the top
+        sim = EventSimulation(seed=args.seed, spawn_chance=args.spawn_chance, trip_log=trip_log,
+                              demand_weight=args.demand_weight)
+    else:
+        sim = Simulation(seed=args.seed, spawn_chance=args.spawn_chance, trip_log=trip_log,
+                         demand_weight=args.demand_weight)
+    ticks = int(args.minutes * 60 * FPS)
+    started = time.perf_counter()
+    sim.run(ticks)
+    elapsed = time.perf_counter() - started
+    print(f"Seed: {sim.streams.seed}")
+    print(f"Simulated {args.minutes:.1f} min ({ticks} ticks) in {elapsed:.2f}s")
+    if args.events:
+        print(f"Stepped {sim.events} of the {ticks} ticks, skipped the rest")
+    print(f"Avg wait (s): {sim.get_average_wait():.2f}")
+    print(f"Throughput (total): {sim.throughput_count}")
+    print(f"Throughput (per min): {sim.get_throughput_per_minute():.2f}")
+    for window, recent in sim.get_recent_metrics().items():
+        print(f"Last {window / 60:.0f} min: {recent['throughput_per_min']:.2f} veh/min out, "
+              f"{recent['arrivals_per_min']:.2f} in, wait {recent['mean_wait']:.2f}s "
+              f"(p95 {recent['wait_p95']:.2f}s)")
+    print("Wait p50/p95/p99 (s): " + " / ".join(f"{q:.2f}" for q in sim.get_wait_quantiles()))
+    for direction in DIRECTIONS:
+        p50, p95, p99 = sim.get_wait_quantiles(direction=direction)
+        print(f"  {direction}: {p50:.2f} / {p95:.2f} / {p99:.2f}")
+    if trip_log is not None:
+        trip_log.close()
+        print(f"Trips logged: {trip_log.rows_written} -> {args.trip_log}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+# siren_detector.py
+"""
+Streaming siren detection for the "Listen for Siren" button.
+
+The microphone is opened once as a sounddevice InputStream whose callback
+only copies each block into a RingBuffer. A listener thread wakes up every
+`hop` seconds of audio and runs the detector over the latest `window`
+seconds, so a siren is noticed about one hop after it starts instead of
+after a whole blocking one-second recording.
+
+SpectralDetector is the same test the UIs used to run per chunk: the share
+of the Hann-windowed magnitude spectrum that falls in the siren band. The
+window function and the band's FFT bins depend only on the window length,
+so they are computed once.
+
+GoertzelDetector is the cheaper engine: instead of a whole spectrum it
+measures only a few DFT bins around the two siren tones (what a Goertzel
+filter per frequency computes, done as precomputed kernels dotted with
+the window), and it can follow the two-tone alternation of the siren.
+
+SirenMonitor keeps all of that away from the simulation: the listener
+runs in a process of its own (its FFTs no longer compete with the main
+loop for the GIL) and only puts the wall-clock time of each detection on a
+queue, which the main loop drains between two ticks. The process is
+spawned, on every platform, the first time listening starts: fork is not
+available on Windows and is unsafe once pygame runs SDL's threads. A
+spawned process imports the UI script again (as __mp_main__), so the
+scripts keep their pygame setup behind `if __name__ == "__main__"`.
+
+Where the audio comes from is up to the source: MicrophoneSource (live,
+through sounddevice) or ReplaySource (a recorded clip, in real time or as
+fast as possible). `replay()` pushes a clip through the same
+StreamAnalyzer without any thread, which is what siren_benchmark.py uses.
+"""
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+FS = 44100
+WINDOW = 0.25  # seconds of audio analysed per decision
+HOP = 0.1  # seconds of new audio between two decisions
+FREQ_LOW = 500
+FREQ_HIGH = 2000
+ENERGY_THRESHOLD = 0.005
+COOLDOWN = 3.0  # seconds after a detection before the next one can fire
+SIREN_TONES = (600, 900)  # Hz, the two tones of siren_sound.generate_siren_sound
+TONE_SPREAD = 0.03  # relative detuning still counted as a tone (Doppler, other sirens)
+TONE_THRESHOLD = 0.005  # share of the window's power at one siren tone
+
+
+class RingBuffer:
+    """Fixed-size sample buffer: one writer (the audio callback), readers take the latest samples."""
+
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.written = 0  # samples written since the start, the read position of the newest one + 1
+        self.condition = threading.Condition()
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32).ravel()
+        total = samples.size
+        samples = samples[-self.capacity:]
+        start = (self.written + total - samples.size) % self.capacity
+        first = min(samples.size, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:samples.size - first] = samples[first:]
+        with self.condition:
+            self.written += total
+            self.condition.notify_all()
+
+    def latest(self, n):
+        """Copy of the newest `n` samples, oldest first (None until that many were written)."""
+        if self.written < n:
+            return None
+        end = self.written % self.capacity
+        if end >= n:
+            return self.data[end - n:end].copy()
+        return np.concatenate([self.data[end - n:], self.data[:end]])
+
+    def wait(self, position, timeout=None):
+        """Block until `position` samples have been written; False on timeout."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.written >= position, timeout)
+
+
+class SpectralDetector:
+    def __init__(self, fs=FS, window=WINDOW, freq_low=FREQ_LOW, freq_high=FREQ_HIGH,
+                 threshold=ENERGY_THRESHOLD):
+        self.fs = fs
+        self.size = int(round(window * fs))
+        self.threshold = threshold
+        self.window = np.hanning(self.size).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.size, 1.0 / fs)
+        self.band = slice(int(np.searchsorted(freqs, freq_low, side="left")),
+                          int(np.searchsorted(freqs, freq_high, side="right")))
+        if self.band.start >= self.band.stop:
+            raise ValueError(f"no FFT bin between {freq_low} and {freq_high} Hz for a {window}s window")
+
+    def ratio(self, samples):
+        """Share of the spectrum's magnitude inside the siren band."""
+        spectrum = np.abs(np.fft.rfft(samples * self.window))
+        return spectrum[self.band].sum() / (spectrum.sum() + 1e-9)
+
+    def detect(self, samples):
+        return self.ratio(samples) > self.threshold
+
+
+class GoertzelDetector:
+    """
+    Power at the siren tones only. Each tone is watched through a few bins
+    spread over +-`spread` of its frequency; a tone counts as present when
+    its strongest bin holds more than `threshold` of the window's power
+    (a pure tone gives 1.0). With `alternation` seconds, a detection also
+    needs the other tone to have been present within that time, like the
+    alternating two-tone siren; this rejects a steady whistle or hum but
+    delays the first detection until the siren switches tones.
+    """
+
+    def __init__(self, fs=FS, window=WINDOW, tones=SIREN_TONES, spread=TONE_SPREAD, bins_per_tone=7,
+                 threshold=TONE_THRESHOLD, alternation=0.0, hop=HOP):
+        self.fs = fs
+        self.size = int(round(window * fs))
+        self.threshold = threshold
+        self.tones = tuple(tones)
+        window_function = np.hanning(self.size)
+        self.window = window_function.astype(np.float32)
+        n = np.arange(self.size)
+        freqs = np.array([tone * (1 + offset) for tone in self.tones
+                          for offset in np.linspace(-spread, spread, bins_per_tone)])
+        phase = 2 * np.pi * freqs[:, None] / fs * n
+        # cos and sin rows of every bin
+        self.kernels = np.concatenate([np.cos(phase), np.sin(phase)]).astype(np.float32)
+        self.bins = freqs.size
+        self.bins_per_tone = bins_per_tone
+        # |X|^2 / energy of the windowed samples is this for a pure tone on a bin
+        self.full_scale = float(np.sum(window_function)) ** 2 / (2 * float(np.sum(window_function ** 2)))
+        self.alternation = int(round(alternation / hop)) if alternation else 0
+        self.windows = 0  # windows analysed so far
+        self.last_heard = [None] * len(self.tones)  # window index each tone was last present in
+
+    def tone_shares(self, samples):
+        """Share of the window's power at each tone (strongest of its bins)."""
+        windowed = np.asarray(samples, dtype=np.float32) * self.window
+        projections = self.kernels @ windowed
+        power = projections[:self.bins] ** 2 + projections[self.bins:] ** 2
+        shares = power / (self.full_scale * (float(np.dot(windowed, windowed)) + 1e-12))
+        return shares.reshape(len(self.tones), self.bins_per_tone).max(axis=1)
+
+    def ratio(self, samples):
+        return float(self.tone_shares(samples).max())
+
+    def detect(self, samples):
+        present = self.tone_shares(samples) > self.threshold
+        window = self.windows
+        self.windows += 1
+        for tone in np.flatnonzero(present):
+            self.last_heard[tone] = window
+        if not present.any():
+            return False
+        if not self.alternation:
+            return True
+        # every tone heard recently: the siren has switched at least once
+        return all(last is not None and window - last <= self.alternation for last in self.last_heard)
+
+
+def load_wav(path):
+    """(mono float32 samples in [-1, 1], sample rate) of a 16-bit PCM WAV file."""
+    with wave.open(str(path), "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM is supported")
+        fs = wav.getframerate()
+        channels = wav.getnchannels()
+        frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    samples = frames.reshape(-1, channels)[:, 0].astype(np.float32) / 32768.0
+    return samples, fs
+
+
+class MicrophoneSource:
+    """Live input from the default device (sounddevice is only imported when opened)."""
+
+    def __init__(self, fs=FS):
+        self.fs = fs
+
+    def open(self, write, blocksize):
+        import sounddevice as sd
+        return sd.InputStream(samplerate=self.fs, channels=1, dtype="float32", blocksize=blocksize,
+                              callback=lambda indata, frames, time_info, status: write(indata[:, 0]))
+
+
+class ReplaySource:
+    """
+    A recorded clip (NumPy array or WAV file) played into the detector in
+    blocks, paced like a live input when `realtime` is set. SirenListener
+    reopens a source that ended, so under a listener the clip loops.
+    """
+
+    def __init__(self, samples, fs=FS, realtime=True):
+        self.samples = np.asarray(samples, dtype=np.float32).ravel()
+        self.fs = fs
+        self.realtime = realtime
+
+    @classmethod
+    def from_wav(cls, path, realtime=True):
+        samples, fs = load_wav(path)
+        return cls(samples, fs, realtime)
+
+    def open(self, write, blocksize):
+        return _ReplayStream(self, write, blocksize)
+
+
+class _ReplayStream:
+    # the part of sounddevice's InputStream that SirenListener uses: a context manager with `active`
+    def __init__(self, source, write, blocksize):
+        self.source = source
+        self.write = write
+        self.blocksize = blocksize
+        self.active = False
+
+    def __enter__(self):
+        self.active = True
+        threading.Thread(target=self._play, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+
+    def _play(self):
+        source = self.source
+        started = time.perf_counter()
+        for start in range(0, source.samples.size, self.blocksize):
+            if not self.active:
+                return
+            block = source.samples[start:start + self.blocksize]
+            if source.realtime:
+                time.sleep(max(0.0, started + (start + block.size) / source.fs - time.perf_counter()))
+            self.write(block)
+        self.active = False
+
+
+class StreamAnalyzer:
+    """
+    Hop scheduling and cooldown over a RingBuffer, in samples: the detection
+    path shared by the live listener and offline replay.
+    """
+
+    def __init__(self, detector, hop=HOP, cooldown=COOLDOWN, fs=FS):
+        self.detector = detector
+        self.hop = max(1, int(round(hop * fs)))
+        self.cooldown = int(round(cooldown * fs))
+        self.buffer = RingBuffer(4 * max(detector.size, self.hop))
+        self.position = detector.size  # samples written when the next window is due
+        self.last_trigger = None
+
+    def write(self, samples):
+        self.buffer.write(samples)
+
+    def ready(self):
+        return self.buffer.written >= self.position
+
+    def analyse(self):
+        """Run the detector over the newest window; the sample count at a (new) detection, else None."""
+        end = self.buffer.written
+        # if analysis fell behind, skip straight to the newest window
+        self.position = max(self.position, end) + self.hop
+        if not self.detector.detect(self.buffer.latest(self.detector.size)):
+            return None
+        if self.last_trigger is not None and end - self.last_trigger <= self.cooldown:
+            return None
+        self.last_trigger = end
+        return end
+
+
+def replay(samples, detector, hop=HOP, cooldown=COOLDOWN, fs=FS):
+    """Sample positions at which the listener would fire on `samples`, computed as fast as possible."""
+    analyzer = StreamAnalyzer(detector, hop, cooldown, fs)
+    samples = np.asarray(samples, dtype=np.float32).ravel()
+    detections = []
+    for start in range(0, samples.size, analyzer.hop):
+        analyzer.write(samples[start:start + analyzer.hop])
+        while analyzer.ready():
+            detected = analyzer.analyse()
+            if detected is not None:
+                detections.append(detected)
+    return detections
+
+
+class SirenListener:
+    """
+    Calls `on_siren()` from its own thread whenever the detector fires, at
+    most once per `cooldown` seconds, until stop().
+    """
+
+    def __init__(self, on_siren, detector=None, hop=HOP, cooldown=COOLDOWN, fs=FS, source=None):
+        self.on_siren = on_siren
+        self.analyzer = StreamAnalyzer(detector if detector is not None else SpectralDetector(fs), hop, cooldown, fs)
+        self.source = source if source is not None else MicrophoneSource(fs)
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=0.5):
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+
+    def _run(self):
+        analyzer = self.analyzer
+        while self.running:
+            try:
+                with self.source.open(analyzer.write, analyzer.hop) as stream:
+                    while self.running and stream.active:
+                        if analyzer.buffer.wait(analyzer.position, timeout=0.5) and analyzer.analyse() is not None:
+                            self.on_siren()
+            except Exception:
+                time.sleep(0.1)
+
+
+class SirenMonitor:
+    """
+    A SirenListener whose detections wait in a queue until poll(); it only
+    listens between start() and stop(). The listener lives in a process
+    spawned by the first start() and kept until close(), so the detector and
+    source must be picklable. Without processes (pygbag's browser build) it
+    falls back to the listener's thread, still delivering through the queue.
+    """
+
+    def __init__(self, detector=None, hop=HOP, cooldown=COOLDOWN, fs=FS, source=None):
+        self.listener_args = (detector, hop, cooldown, fs, source)
+        self.isolated = sys.platform != "emscripten"
+        self.listener = None
+        self.worker = None
+        if self.isolated:
+            self.context = multiprocessing.get_context("spawn")
+            self.events = self.context.Queue()
+            self.listening = self.context.Event()
+            self.closing = self.context.Event()
+        else:
+            self.events = queue.SimpleQueue()
+
+    def start(self):
+        self.poll()  # drop detections left over from the previous session
+        if self.isolated:
+            self.listening.set()
+            if self.worker is None:
+                self.worker = self.context.Process(target=_monitor, daemon=True,
+                                                   args=(self.events, self.listening, self.closing,
+                                                         self.listener_args))
+                self.worker.start()
+        elif self.listener is None:
+            self.listener = SirenListener(lambda: self.events.put(time.time()), *self.listener_args)
+            self.listener.start()
+
+    def stop(self, timeout=0.5):
+        if self.isolated:
+            self.listening.clear()
+        elif self.listener is not None:
+            self.listener.stop(timeout)
+            self.listener = None
+
+    def close(self, timeout=0.5):
+        """Stop listening for good and end the monitor's process, if it was started."""
+        self.stop(timeout)
+        if self.worker is not None:
+            self.closing.set()
+            if timeout:
+                self.worker.join(timeout)
+
+    def poll(self):
+        """Times of the detections since the last call, oldest first; never blocks."""
+        detections = []
+        while True:
+            try:
+                detections.append(self.events.get_nowait())
+            except queue.Empty:
+                return detections
+
+
+def _monitor(events, listening, closing, listener_args):
+    """The monitor's process: a SirenListener runs while `listening` is set."""
+    listener = None
+    parent = multiprocessing.parent_process()
+    # also end with the UI if it exits without closing the monitor
+    while parent.is_alive():
+        if listening.is_set() and listener is None:
+            listener = SirenListener(lambda: events.put(time.time()), *listener_args)
+            listener.start()
+        elif not listening.is_set() and listener is not None:
+            listener.stop()
+            listener = None
+        if closing.wait(0.1):
+            break
+    if listener is not None:
+        listener.stop()
@@ -0,0 +1,122 @@
+# siren_sound.py
+"""
+Synthesized two-tone siren, shared by the UIs (playback) and the detector benchmark.
+
+The UIs load the siren from a WAV file written on first use into the user
+cache directory, so later launches skip the NumPy synthesis. Playback goes
+through SirenChannels: every sounding vehicle gets its own mixer channel,
+looped and turned down with its distance to the intersection, so several
+emergencies never restart or silence each other's siren.
+"""
+import os
+import wave
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 44100
+SIREN_ASSET_VERSION = 1  # bump when generate_siren_sound changes, so stale caches are ignored
+SIREN_CHANNELS = 8  # sirens that can sound at the same time
+REFERENCE_DISTANCE = 10.0  # meters at which a siren plays at half volume
+
+
+def generate_siren_sound():
+    sample_rate = SAMPLE_RATE
+    duration = 2.0  # 2-second siren loop
+    t = np.linspace(0, duration, int(sample_rate * duration), False)
+
+    # Create a two-tone siren (alternating frequencies for realism)
+    freq1 = 600  # Lower frequency
+    freq2 = 900  # Higher frequency
+    t1 = t[:len(t)//2]
+    t2 = t[len(t)//2:]
+
+    # Generate waveforms
+    siren1 = 0.5 * np.sin(2 * np.pi * freq1 * t1)
+    siren2 = 0.5 * np.sin(2 * np.pi * freq2 * t2)
+
+    # Combine and normalize
+    siren = np.concatenate([siren1, siren2])
+    siren = (siren * 32767).astype(np.int16)  # Convert to 16-bit PCM
+    siren = np.column_stack((siren, siren))  # Stereo
+    return siren
+
+
+def default_cache_dir():
+    """$XDG_CACHE_HOME/traffic-sim, or ~/.cache/traffic-sim; read when called, not at import."""
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "traffic-sim"
+
+
+def siren_asset(cache_dir=None):
+    """
+    Path of the siren as a 16-bit stereo WAV in `cache_dir` (default_cache_dir()
+    if None), synthesized and written on first use.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    path = Path(cache_dir) / f"siren-v{SIREN_ASSET_VERSION}.wav"
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    siren = generate_siren_sound()
+    with wave.open(str(partial), "wb") as wav:
+        wav.setnchannels(siren.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(siren.astype("<i2").tobytes())
+    os.replace(partial, path)  # another launch may be writing the same file
+    return path
+
+
+def distance_volume(distance, reference=REFERENCE_DISTANCE):
+    """Volume 0..1 of a siren `distance` meters away (1 at the intersection)."""
+    return reference / (reference + max(0.0, distance))
+
+
+class SirenChannels:
+    """
+    A pool of reserved mixer channels playing one looped siren each. A
+    vehicle that starts while all channels are busy waits for the next
+    free one.
+    """
+
+    def __init__(self, sound, channels=SIREN_CHANNELS):
+        import pygame
+        self.sound = sound
+        # the first channels are reserved, so other sounds never take a siren's channel
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), channels))
+        pygame.mixer.set_reserved(channels)
+        self.free = [pygame.mixer.Channel(i) for i in reversed(range(channels))]
+        self.playing = {}  # vehicle -> Channel
+        self.waiting = {}  # vehicle -> volume, for vehicles without a channel yet, in start order
+
+    def start(self, vehicle, volume=1.0):
+        if vehicle in self.playing or vehicle in self.waiting:
+            return
+        if not self.free:
+            self.waiting[vehicle] = volume
+            return
+        channel = self.free.pop()
+        channel.set_volume(volume)
+        channel.play(self.sound, loops=-1)
+        self.playing[vehicle] = channel
+
+    def stop(self, vehicle):
+        self.waiting.pop(vehicle, None)
+        channel = self.playing.pop(vehicle, None)
+        if channel is None:
+            return
+        channel.stop()
+        self.free.append(channel)
+        if self.waiting:
+            # the longest waiting vehicle, at the volume of its last known distance
+            waiting = next(iter(self.waiting))
+            self.start(waiting, self.waiting.pop(waiting))
+
+    def set_distance(self, vehicle, distance):
+        channel = self.playing.get(vehicle)
+        if channel is not None:
+            channel.set_volume(distance_volume(distance))
+        elif vehicle in self.waiting:
+            self.waiting[vehicle] = distance_volume(distance)
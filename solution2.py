@@ -1,7 +1,9 @@
 import pygame
 import sys
-import random
-import time
+from lanes import LaneIndex
+from rng_streams import RandomStreams
+from render_cache import SurfaceCache, TextCache
+from sim_clock import SimClock
 
 # Initialize Pygame
 pygame.init()
@@ -25,6 +27,8 @@ CAR_COLOR = (0, 0, 255)
 # Clock
 clock = pygame.time.Clock()
 FPS = 60
+# simulated time read by the controller and metrics; advanced once per frame
+sim_clock = SimClock(1.0 / FPS)
 
 # Directions
 DIRECTIONS = ["N", "E", "S", "W"]
@@ -37,32 +41,60 @@ STARVE_TIME = 25.0   # if a lane hasn't had green for this long, it's prioritize
 SAFE_DISTANCE = 45  # Minimum distance between cars in queue
 SPAWN_CHANCE = 50   # Higher number → fewer normal cars (was 20 before)
 EMERGENCY_SPAWN_CHANCE = 800  # Rare emergency spawn
+SEED = None  # set to an int to replay exactly the same traffic
+rng = RandomStreams(SEED)
+print(f"Random seed: {rng.seed}")
 
 # Font for metrics
 FONT = pygame.font.SysFont("Arial", 16)
+text_cache = TextCache()
 
-def draw_traffic_light(x, y, active_color):
-    pygame.draw.rect(SCREEN, SIGNAL_BOX, (x, y, 30, 70), border_radius=5)
+def render_panel_background(w, h):
+    s = pygame.Surface((w, h), pygame.SRCALPHA)  # per-pixel alpha
+    s.fill((0, 0, 0, 160))  # black with alpha
+    return s
+
+# translucent panel backgrounds, by size
+panel_backgrounds = SurfaceCache(render_panel_background)
+
+def render_traffic_light(active_color):
+    surface = pygame.Surface((30, 70), pygame.SRCALPHA)
+    pygame.draw.rect(surface, SIGNAL_BOX, (0, 0, 30, 70), border_radius=5)
     colors = [RED, YELLOW, GREEN]
     for i, color in enumerate(colors):
         light_color = color if color == active_color else (100, 100, 100)
-        pygame.draw.circle(SCREEN, light_color, (x + 15, y + 10 + 25 * i), 7)
+        pygame.draw.circle(surface, light_color, (15, 10 + 25 * i), 7)
+    return surface
 
-def draw_intersection():
-    SCREEN.fill(BG_COLOR)
+# one rasterized light per lamp state; drawing is a single blit
+traffic_lights = SurfaceCache(render_traffic_light)
+
+def draw_traffic_light(x, y, active_color):
+    SCREEN.blit(traffic_lights.get(active_color), (x, y))
+
+def render_background():
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+    surface.fill(BG_COLOR)
 
     # Roads
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))  # Vertical
-    pygame.draw.rect(SCREEN, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))  # Horizontal
+    pygame.draw.rect(surface, ROAD_COLOR, (WIDTH // 2 - 60, 0, 120, HEIGHT))  # Vertical
+    pygame.draw.rect(surface, ROAD_COLOR, (0, HEIGHT // 2 - 60, WIDTH, 120))  # Horizontal
 
     # Yellow box
-    pygame.draw.rect(SCREEN, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
+    pygame.draw.rect(surface, BOX_COLOR, (WIDTH // 2 - 60, HEIGHT // 2 - 60, 120, 120), width=3)
 
     # Lane lines
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
-    pygame.draw.line(SCREEN, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 - 30, 0), (WIDTH // 2 - 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (WIDTH // 2 + 30, 0), (WIDTH // 2 + 30, HEIGHT), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 - 30), (WIDTH, HEIGHT // 2 - 30), 2)
+    pygame.draw.line(surface, LINE_COLOR, (0, HEIGHT // 2 + 30), (WIDTH, HEIGHT // 2 + 30), 2)
+    return surface
+
+# grass, roads, box and lane lines never change; rendered once, blitted every frame
+background = render_background()
+
+def draw_intersection():
+    SCREEN.blit(background, (0, 0))
 
     # Traffic lights
     for i, direction in enumerate(DIRECTIONS):
@@ -94,7 +126,7 @@ class Car:
         self.stopped = False
         self.committed = False   # flag for cars inside intersection
         self.queued_time = None  # when the car joined a queue (waiting)
-        self.spawn_time = time.time()
+        self.spawn_time = sim_clock.now()
         self.crossed = False     # whether it crossed the intersection center (counts towards throughput)
 
         # spawn positions depend on direction
@@ -131,9 +163,8 @@ class Car:
         if self.direction == "W":
             return self.x + Car.HEIGHT >= cx - 300
 
-    def will_move_this_frame(self, cars):
+    def will_move_this_frame(self, front_car):
         """Return True if the car would move this frame according to traffic rules (without updating position)."""
-        front_car = self.get_front_car(cars)
         if self.direction == "N":
             stop_line = HEIGHT // 2 - 60
             # movement condition (mirror of move())
@@ -159,27 +190,25 @@ class Car:
                 return True
             return False
 
-    def move(self, cars):
-        front_car = self.get_front_car(cars)
+    def move(self):
+        front_car = self.get_front_car()
 
         # Before moving, compute whether we would move. This helps determine queued_time.
-        will_move = self.will_move_this_frame(cars)
+        will_move = self.will_move_this_frame(front_car)
 
         # If car would NOT move, and it's near intersection, and it's not already recorded as queued, set queued_time.
         if not will_move and self.queued_time is None and not self.committed and self._near_intersection_region():
             # Car is effectively stopped / waiting (either due to red light or queue in front)
-            self.queued_time = time.time()
+            lane_index.mark_queued(self, sim_clock.now())
 
         # Movement and committed handling
         if self.direction == "N":
             stop_line = HEIGHT // 2 - 60
             # mark committed when crossing stop line while allowed
             if not self.committed and self.can_pass() and self.y + Car.HEIGHT >= stop_line:
-                self.committed = True
                 # when committed becomes True, if queued_time exists, the wait ended now
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
 
             if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y + Car.HEIGHT < stop_line and self.safe_to_move(front_car)):
                 self.y += Car.SPEED
@@ -187,30 +216,24 @@ class Car:
         elif self.direction == "S":
             stop_line = HEIGHT // 2 + 60
             if not self.committed and self.can_pass() and self.y <= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.y > stop_line and self.safe_to_move(front_car)):
                 self.y -= Car.SPEED
 
         elif self.direction == "E":
             stop_line = WIDTH // 2 + 60
             if not self.committed and self.can_pass() and self.x <= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x > stop_line and self.safe_to_move(front_car)):
                 self.x -= Car.SPEED
 
         elif self.direction == "W":
             stop_line = WIDTH // 2 - 60
             if not self.committed and self.can_pass() and self.x + Car.HEIGHT >= stop_line:
-                self.committed = True
-                if self.queued_time is not None:
-                    record_wait_time(self.queued_time)
-                    self.queued_time = None
+                record_wait_time(self.queued_time)
+                lane_index.mark_committed(self)
             if self.committed or (self.can_pass() and self.safe_to_move(front_car)) or (self.x + Car.HEIGHT < stop_line and self.safe_to_move(front_car)):
                 self.x += Car.SPEED
 
@@ -237,20 +260,8 @@ class Car:
         elif self.direction == "W":
             return front_car.x - (self.x + Car.HEIGHT) > SAFE_DISTANCE
 
-    def get_front_car(self, cars):
-        same_lane_cars = [car for car in cars if car.direction == self.direction and car != self]
-        if self.direction == "N":
-            same_lane_cars = [car for car in same_lane_cars if car.y > self.y]
-            return min(same_lane_cars, key=lambda c: c.y, default=None)
-        elif self.direction == "S":
-            same_lane_cars = [car for car in same_lane_cars if car.y < self.y]
-            return max(same_lane_cars, key=lambda c: c.y, default=None)
-        elif self.direction == "E":
-            same_lane_cars = [car for car in same_lane_cars if car.x < self.x]
-            return max(same_lane_cars, key=lambda c: c.x, default=None)
-        elif self.direction == "W":
-            same_lane_cars = [car for car in same_lane_cars if car.x > self.x]
-            return min(same_lane_cars, key=lambda c: c.x, default=None)
+    def get_front_car(self):
+        return lane_index.front_of(self)
 
     def can_pass(self):
         # can pass only if its direction has green (light_index)
@@ -272,21 +283,21 @@ class Car:
 
 
 cars = []
+lane_index = LaneIndex(DIRECTIONS)
 
 def spawn_too_close(direction):
     # Prevent spawning if another car is too close to spawn point
-    for c in cars:
-        if c.direction != direction:
-            continue
-        if direction == "N" and c.y < SAFE_DISTANCE:
-            return True
-        if direction == "S" and c.y > HEIGHT - SAFE_DISTANCE:
-            return True
-        if direction == "E" and c.x > WIDTH - SAFE_DISTANCE:
-            return True
-        if direction == "W" and c.x < SAFE_DISTANCE:
-            return True
-    return False
+    # only the rearmost car of the lane can be near the spawn point
+    c = lane_index.rear(direction)
+    if c is None:
+        return False
+    if direction == "N":
+        return c.y < SAFE_DISTANCE
+    if direction == "S":
+        return c.y > HEIGHT - SAFE_DISTANCE
+    if direction == "E":
+        return c.x > WIDTH - SAFE_DISTANCE
+    return c.x < SAFE_DISTANCE
 
 def spawn_car():
     """
@@ -294,30 +305,31 @@ def spawn_car():
     Uses SPAWN_CHANCE for normal cars and EMERGENCY_SPAWN_CHANCE for emergencies.
     """
     # First, possibly spawn an emergency vehicle (rare)
-    if random.randint(0, EMERGENCY_SPAWN_CHANCE) == 0:
-        direction = random.choice(DIRECTIONS)
-        vehicle_type = random.choice(["ambulance", "fire"])  # randomly ambulance or fire van
+    if rng.emergency.randint(0, EMERGENCY_SPAWN_CHANCE) == 0:
+        direction = rng.emergency.choice(DIRECTIONS)
+        vehicle_type = rng.emergency.choice(["ambulance", "fire"])  # randomly ambulance or fire van
         if not spawn_too_close(direction):
-            cars.append(Car(direction, vehicle_type))
+            car = Car(direction, vehicle_type)
+            cars.append(car)
+            lane_index.add(car)
         return
 
     # Otherwise maybe spawn a normal car
-    if random.randint(0, SPAWN_CHANCE) == 0:
-        direction = random.choice(DIRECTIONS)
+    if rng.arrivals.randint(0, SPAWN_CHANCE) == 0:
+        direction = rng.arrivals.choice(DIRECTIONS)
         if not spawn_too_close(direction):
-            cars.append(Car(direction, "normal"))
+            car = Car(direction, "normal")
+            cars.append(car)
+            lane_index.add(car)
 
 # Adaptive controller state
 light_index = 0
-last_switch_time = time.time()
+last_switch_time = sim_clock.now()
 # track when each direction last had green (for starvation prevention)
-last_served = {d: time.time() for d in DIRECTIONS}
+last_served = {d: sim_clock.now() for d in DIRECTIONS}
 
 def get_queue_counts():
-    counts = {d: 0 for d in DIRECTIONS}
-    for c in cars:
-        counts[c.direction] += 1
-    return counts
+    return lane_index.counts()
 
 def choose_next_direction(exclude_dir=None):
     """
@@ -329,7 +341,7 @@ def choose_next_direction(exclude_dir=None):
     If exclude_dir is set, that direction will not be selected (used to force the emergency direction to turn red after passing).
     """
     counts = get_queue_counts()
-    now = time.time()
+    now = sim_clock.now()
 
     # find starving lanes
     starving = [d for d in DIRECTIONS if now - last_served.get(d, 0) >= STARVE_TIME]
@@ -369,7 +381,7 @@ emergency_override = False
 emergency_direction = None  # string like "N","E"... when emergency active
 
 # Metrics variables
-sim_start_time = time.time()
+sim_start_time = sim_clock.now()
 total_wait_time = 0.0     # sum of wait times for cars that waited
 total_served_waits = 0    # number of cars which waited (used to compute average wait)
 throughput_count = 0      # number of cars that actually passed intersection (counted when they leave screen after crossing center)
@@ -379,7 +391,7 @@ def record_wait_time(queued_time):
     global total_wait_time, total_served_waits
     if queued_time is None:
         return
-    wait = time.time() - queued_time
+    wait = sim_clock.now() - queued_time
     total_wait_time += wait
     total_served_waits += 1
 
@@ -389,7 +401,7 @@ def get_average_wait():
     return total_wait_time / total_served_waits
 
 def get_throughput_per_minute():
-    elapsed_minutes = (time.time() - sim_start_time) / 60.0
+    elapsed_minutes = (sim_clock.now() - sim_start_time) / 60.0
     if elapsed_minutes <= 0:
         return 0.0
     return throughput_count / elapsed_minutes
@@ -398,12 +410,8 @@ def draw_metrics():
     # Prepare strings
     avg_wait = get_average_wait()
     tpm = get_throughput_per_minute()
-    counts = get_queue_counts()
-    queued_counts = {d: 0 for d in DIRECTIONS}
     # queued = cars that currently have queued_time set (waiting in line)
-    for c in cars:
-        if c.queued_time is not None:
-            queued_counts[c.direction] += 1
+    queued_counts = lane_index.queued
 
     # Build display lines
     lines = [
@@ -420,13 +428,11 @@ def draw_metrics():
     box_h = 20 * len(lines) + padding * 2
     box_x = 10
     box_y = 10
-    s = pygame.Surface((box_w, box_h), pygame.SRCALPHA)  # per-pixel alpha
-    s.fill((0, 0, 0, 160))  # black with alpha
-    SCREEN.blit(s, (box_x, box_y))
+    SCREEN.blit(panel_backgrounds.get(box_w, box_h), (box_x, box_y))
 
     # Render lines
     for i, line in enumerate(lines):
-        txt = FONT.render(line, True, (255, 255, 255))
+        txt = text_cache.render(FONT, line, (255, 255, 255))
         SCREEN.blit(txt, (box_x + padding, box_y + padding + i * 20))
 
 # Main loop
@@ -436,7 +442,7 @@ while True:
             pygame.quit()
             sys.exit()
 
-    now = time.time()
+    now = sim_clock.now()
     elapsed = now - last_switch_time
 
     # --- Emergency detection & override logic ---
@@ -500,7 +506,7 @@ while True:
 
     # Move & draw cars
     for car in cars:
-        car.move(cars)
+        car.move()
         car.draw()
 
     # Remove cars outside screen bounds (they've passed)
@@ -509,6 +515,7 @@ while True:
         if -Car.HEIGHT <= car.x <= WIDTH + Car.HEIGHT and -Car.HEIGHT <= car.y <= HEIGHT + Car.HEIGHT:
             new_cars.append(car)
         else:
+            lane_index.discard(car)
             # car has left screen - count throughput only if it actually crossed the intersection center
             if car.crossed:
                 throughput_count += 1
@@ -526,3 +533,4 @@ while True:
     # Update display
     pygame.display.update()
     clock.tick(FPS)
+    sim_clock.advance()
@@ -0,0 +1,101 @@
+# sweep.py
+"""
+Parameter sweep for the adaptive controller.
+
+Every combination of the given MIN_GREEN / MAX_GREEN / STARVE_TIME /
+SAFE_DISTANCE / SPAWN_CHANCE values is run headless (simulation.py) once
+per seed on a process pool, and the average wait, wait p50 / p95 / p99 and
+throughput per minute of each run are collected into one pandas table.
+
+    python sweep.py --min-green 3,5,8 --max-green 20,30 --seeds 0,1,2 --out results.csv
+"""
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from simulation import (Simulation, FPS, MIN_GREEN, MAX_GREEN, STARVE_TIME, SAFE_DISTANCE,
+                        SPAWN_CHANCE)
+
+PARAMETERS = ["min_green", "max_green", "starve_time", "safe_distance", "spawn_chance"]
+WAIT_QUANTILES = ["wait_p50", "wait_p95", "wait_p99"]
+
+
+def run_config(params, seed, minutes):
+    """Run one configuration headless and return its metrics as a table row."""
+    sim = Simulation(seed=seed, **params)
+    sim.run(int(minutes * 60 * FPS))
+    return {
+        **params,
+        "seed": seed,
+        "avg_wait": sim.get_average_wait(),
+        "throughput": sim.throughput_count,
+        "throughput_per_min": sim.get_throughput_per_minute(),
+        **dict(zip(WAIT_QUANTILES, sim.get_wait_quantiles())),
+    }
+
+
+def grid(values):
+    """Expand {parameter: [values]} into one dict per combination."""
+    names = list(values)
+    for combo in itertools.product(*(values[name] for name in names)):
+        yield dict(zip(names, combo))
+
+
+def run_sweep(values, seeds, minutes, workers=None):
+    tasks = [(params, seed) for params in grid(values) for seed in seeds]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_config, params, seed, minutes) for params, seed in tasks]
+        rows = [future.result() for future in futures]
+    return pd.DataFrame(rows, columns=PARAMETERS + ["seed", "avg_wait", *WAIT_QUANTILES, "throughput",
+                                                    "throughput_per_min"])
+
+
+def summarize(results):
+    """Mean and spread over seeds for each configuration."""
+    return (results.groupby(PARAMETERS)[["avg_wait", "wait_p95", "throughput_per_min"]]
+            .agg(["mean", "std"])
+            .sort_values(("avg_wait", "mean")))
+
+
+def _floats(text):
+    return [float(v) for v in text.split(",")]
+
+
+def _ints(text):
+    return [int(v) for v in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep controller parameters over a process pool.")
+    parser.add_argument("--min-green", type=_floats, default=[MIN_GREEN])
+    parser.add_argument("--max-green", type=_floats, default=[MAX_GREEN])
+    parser.add_argument("--starve-time", type=_floats, default=[STARVE_TIME])
+    parser.add_argument("--safe-distance", type=_ints, default=[SAFE_DISTANCE])
+    parser.add_argument("--spawn-chance", type=_ints, default=[SPAWN_CHANCE])
+    parser.add_argument("--seeds", type=_ints, default=[0, 1, 2])
+    parser.add_argument("--minutes", type=float, default=30.0, help="simulated minutes per run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default=None, help="write every run to this CSV file")
+    args = parser.parse_args()
+
+    values = {
+        "min_green": args.min_green,
+        "max_green": args.max_green,
+        "starve_time": args.starve_time,
+        "safe_distance": args.safe_distance,
+        "spawn_chance": args.spawn_chance,
+    }
+    started = time.perf_counter()
+    results = run_sweep(values, args.seeds, args.minutes, args.workers)
+    print(f"{len(results)} runs in {time.perf_counter() - started:.1f}s")
+    if args.out:
+        results.to_csv(args.out, index=False)
+    print(summarize(results).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("stable_baselines3")
+
+from batch_env import TrafficSignalVecEnv
+from simulation import DIRECTIONS, FPS
+
+
+def test_reset_and_step_shapes():
+    env = TrafficSignalVecEnv(3, episode_seconds=2.0, seed=0)
+    obs = env.reset()
+    assert obs.shape == (3, 3 * len(DIRECTIONS))
+    assert env.observation_space.contains(obs[0])
+    done = False
+    steps = 0
+    while not done:
+        obs, rewards, dones, infos = env.step(np.array([0, 1, 2]))
+        assert obs.shape == (3, 3 * len(DIRECTIONS))
+        assert rewards.shape == dones.shape == (3,)
+        assert len(infos) == 3
+        assert all(env.observation_space.contains(o) for o in obs)
+        done = dones.all()
+        steps += 1
+    assert "terminal_observation" in infos[0]
+    assert steps == int(np.ceil(2.0 * FPS / env.decision_ticks))
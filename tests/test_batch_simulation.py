@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from batch_simulation import LIGHT_STATES, BatchSimulation
+from simulation import FPS, Simulation
+
+SEEDS = [3, 11, 12, 40]
+TICKS = 2 * 60 * FPS
+
+
+@pytest.mark.parametrize("spawn_chance", [15, 3])
+def test_each_group_replays_a_standalone_simulation(spawn_chance):
+    batch = BatchSimulation(len(SEEDS), spawn_chance=spawn_chance, group_seeds=SEEDS)
+    singles = [Simulation(seed=seed, spawn_chance=spawn_chance) for seed in SEEDS]
+    for tick in range(TICKS):
+        batch.step()
+        for sim in singles:
+            sim.step()
+        if tick % 600 == 0 or tick == TICKS - 1:
+            store = batch.vehicles
+            for k, sim in enumerate(singles):
+                rows = (store.lane >> 2) == k
+                assert np.array_equal(store.x[rows], sim.vehicles.x)
+                assert np.array_equal(store.y[rows], sim.vehicles.y)
+                assert np.array_equal(store.lane[rows] & 3, sim.vehicles.lane)
+                assert np.array_equal(store.committed[rows], sim.vehicles.committed)
+                assert LIGHT_STATES[batch.light_state[k]] == sim.light_state
+                assert batch.light_index[k] == sim.light_index
+    for k, sim in enumerate(singles):
+        assert sim.throughput_count > 0
+        assert batch.throughput_count[k] == sim.throughput_count
+        assert batch.total_served_waits[k] == sim.total_served_waits
+        assert batch.total_wait_time[k] == pytest.approx(sim.total_wait_time)
+        assert batch.get_queue_counts()[k].tolist() == list(sim.get_queue_counts().values())
+
+
+def test_group_seeds_must_match_the_groups():
+    with pytest.raises(ValueError):
+        BatchSimulation(3, group_seeds=[1, 2])
+
+
+def test_reset_groups_only_touches_those_groups():
+    batch = BatchSimulation(3, seed=1, spawn_chance=5).run(2000)
+    before = batch.throughput_count.copy()
+    batch.reset_groups(np.array([1]))
+    assert batch.throughput_count.tolist() == [before[0], 0, before[2]]
+    assert not np.any((batch.vehicles.lane >> 2) == 1)
+    assert batch.get_queue_counts()[1].sum() == 0
+    assert batch.get_queue_counts()[0].sum() > 0
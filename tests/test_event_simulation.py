@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from event_simulation import EventSimulation
+from simulation import FPS
+
+MINUTES = 10
+
+
+def tick_by_tick(sim, ticks):
+    # Simulation.run, with EventSimulation's arrival draws: every tick goes through step()
+    for _ in range(ticks):
+        sim.step()
+    return sim
+
+
+@pytest.mark.parametrize("seed, spawn_chance, demand_weight", [
+    (1, 15, 0.0),
+    (2, 120, 0.0),
+    (3, 600, 0.0),
+    (4, 40, 0.5),
+])
+def test_skipping_gives_the_same_run_as_stepping_every_tick(seed, spawn_chance, demand_weight):
+    ticks = MINUTES * 60 * FPS
+    stepped = tick_by_tick(EventSimulation(seed=seed, spawn_chance=spawn_chance, demand_weight=demand_weight), ticks)
+    skipped = EventSimulation(seed=seed, spawn_chance=spawn_chance, demand_weight=demand_weight).run(ticks)
+
+    assert skipped.events < ticks
+    assert skipped.clock.ticks == stepped.clock.ticks
+    assert skipped.throughput_count == stepped.throughput_count
+    assert skipped.total_served_waits == stepped.total_served_waits
+    assert skipped.total_wait_time == pytest.approx(stepped.total_wait_time)
+    assert skipped.light_state == stepped.light_state
+    assert skipped.light_index == stepped.light_index
+    assert skipped.last_served == stepped.last_served
+    # coasting adds SPEED * ticks at once where stepping adds SPEED per tick
+    np.testing.assert_allclose(skipped.vehicles.x, stepped.vehicles.x)
+    np.testing.assert_allclose(skipped.vehicles.y, stepped.vehicles.y)
+    assert skipped.lane_counts.present.tolist() == stepped.lane_counts.present.tolist()
+
+
+def test_a_run_can_be_continued_in_pieces():
+    ticks = 3 * 60 * FPS
+    whole = EventSimulation(seed=5, spawn_chance=60).run(ticks)
+    pieces = EventSimulation(seed=5, spawn_chance=60)
+    for _ in range(3):
+        pieces.run(ticks // 3)
+    assert pieces.throughput_count == whole.throughput_count
+    assert pieces.total_wait_time == pytest.approx(whole.total_wait_time)
+    assert (pieces.light_state, pieces.light_index) == (whole.light_state, whole.light_index)
@@ -0,0 +1,126 @@
+import random
+
+import pytest
+
+from lanes import LaneIndex, travel_position
+
+DIRECTIONS = ["N", "E", "S", "W"]
+
+
+class Car:
+    def __init__(self, direction, position):
+        self.direction = direction
+        self.x = self.y = 0.0
+        self.queued_time = None
+        self.committed = False
+        self.advance(position)
+
+    def advance(self, distance):
+        # move `distance` further along the direction of travel
+        if self.direction == "N":
+            self.y += distance
+        elif self.direction == "S":
+            self.y -= distance
+        elif self.direction == "E":
+            self.x -= distance
+        else:
+            self.x += distance
+
+
+def check_against_scan(index, cars, now):
+    for d in DIRECTIONS:
+        lane = sorted((car for car in cars if car.direction == d), key=travel_position, reverse=True)
+        assert index.lanes[d] == lane
+        assert index.rear(d) is (lane[-1] if lane else None)
+        for ahead, car in zip([None] + lane, lane):
+            assert index.front_of(car) is ahead
+        for car, behind in zip(lane, lane[1:] + [None]):
+            assert index.behind_of(car) is behind
+        queued = [car.queued_time for car in lane if car.queued_time is not None]
+        assert index.queued[d] == len(queued)
+        assert index.committed[d] == sum(car.committed for car in lane)
+        expected_wait = now - sum(queued) / len(queued) if queued else 0.0
+        assert index.average_wait(d, now) == pytest.approx(expected_wait)
+    assert index.counts() == {d: sum(car.direction == d for car in cars) for d in DIRECTIONS}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_traffic_matches_a_full_scan(seed):
+    rng = random.Random(seed)
+    index = LaneIndex(DIRECTIONS)
+    cars = []
+    for tick in range(600):
+        now = tick / 60.0
+        action = rng.random()
+        if action < 0.3:
+            d = rng.choice(DIRECTIONS)
+            behind_all = min((travel_position(car) for car in cars if car.direction == d), default=0.0)
+            car = Car(d, 0.0)
+            car.advance(behind_all - travel_position(car) - rng.uniform(1, 50))
+            index.add(car)
+            cars.append(car)
+        elif action < 0.45 and cars:
+            car = rng.choice(cars)
+            index.discard(car)
+            cars.remove(car)
+        elif action < 0.6 and cars:
+            car = rng.choice(cars)
+            if car.queued_time is None and not car.committed:
+                index.mark_queued(car, now)
+            elif not car.committed:
+                index.mark_committed(car)
+        for car in cars:
+            # mostly in step, now and then one overtakes (an emergency vehicle through a queue)
+            car.advance(2.0 if rng.random() > 0.02 else 80.0)
+        index.resort()
+        check_against_scan(index, cars, now)
+
+
+def test_queue_commit_and_despawn_transitions():
+    index = LaneIndex(DIRECTIONS)
+    first, second, third = Car("N", 0.0), Car("N", -60.0), Car("N", -120.0)
+    for car in (first, second, third):
+        index.add(car)
+    assert index.counts()["N"] == 3 and index.queued["N"] == 0
+
+    index.mark_queued(first, 10.0)
+    index.mark_queued(second, 12.0)
+    assert index.queued["N"] == 2
+    assert index.average_wait("N", 20.0) == pytest.approx(9.0)
+
+    # passing the stop line: committed, and no longer waiting
+    index.mark_committed(first)
+    assert first.committed and first.queued_time is None
+    assert index.queued["N"] == 1 and index.committed["N"] == 1
+    assert index.average_wait("N", 20.0) == pytest.approx(8.0)
+
+    # a committed car leaving the screen
+    index.discard(first)
+    assert index.committed["N"] == 0 and index.counts()["N"] == 2
+
+    # a car despawned while still queued: the counters drop it, the car keeps its
+    # queue time so the caller can still record its wait (realistic.py, solution2.py)
+    index.discard(second)
+    assert second.queued_time == 12.0
+    assert index.queued["N"] == 0
+    assert index.average_wait("N", 30.0) == 0.0
+    assert index.lane_counts.queued_since[index.lane_of["N"]] == 0.0
+
+    # discarding twice, or a car that was never added, changes nothing
+    index.discard(second)
+    index.discard(Car("N", -500.0))
+    assert index.counts() == {"N": 1, "E": 0, "S": 0, "W": 0}
+    assert index.front_of(third) is None and index.rear("N") is third
+
+
+def test_a_car_added_already_queued_or_committed_is_counted():
+    index = LaneIndex(DIRECTIONS)
+    queued, committed = Car("E", 0.0), Car("E", -60.0)
+    queued.queued_time = 3.0
+    committed.committed = True
+    index.add(queued)
+    index.add(committed)
+    assert index.queued["E"] == 1 and index.committed["E"] == 1
+    index.discard(queued)
+    index.discard(committed)
+    assert index.queued["E"] == index.committed["E"] == 0
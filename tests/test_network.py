@@ -0,0 +1,45 @@
+import networkx as nx
+
+from network import NetworkSimulation, corridor_network, downstream_nodes, grid_network, road_ticks
+from simulation import FPS
+
+
+def test_vehicles_keep_their_heading_into_the_next_intersection():
+    graph = grid_network(3, 3)
+    # "N" vehicles come from the north and head south, "E" ones head west, ...
+    assert downstream_nodes(graph, (1, 1)) == {0: (2, 1), 1: (1, 0), 2: (0, 1), 3: (1, 2)}
+    assert downstream_nodes(graph, (0, 0)) == {0: (1, 0), 3: (0, 1)}
+
+
+def test_outside_arrivals_only_on_approaches_no_road_feeds():
+    sim = NetworkSimulation(grid_network(3, 3))
+    entry = sim.entry_lanes.reshape(-1, 4)
+    assert not entry[sim.group_of((1, 1))].any()
+    # roads reach the north-west corner from the east and the south, arrivals from the north and the west
+    assert entry[sim.group_of((0, 0))].tolist() == [True, False, False, True]
+
+
+def test_one_way_roads_only_feed_downstream():
+    graph = nx.DiGraph()
+    graph.add_node("a", pos=(0, 0))
+    graph.add_node("b", pos=(1, 0))
+    graph.add_edge("a", "b", length=90)
+    sim = NetworkSimulation(graph)
+    assert downstream_nodes(graph, "b") == {}
+    # westbound vehicles ("W" approach) leave a into b
+    assert sim.next_lane[sim.group_of("a") * 4 + 3] == sim.group_of("b") * 4 + 3
+    assert sim.road_ticks[sim.group_of("a") * 4 + 3] == road_ticks(graph, "a", "b")
+    assert not sim.entry_lanes[sim.group_of("b") * 4 + 3]
+
+
+def test_every_vehicle_is_accounted_for():
+    sim = NetworkSimulation(corridor_network(4, road_length=120), seed=5, spawn_chance=8)
+    seen = set()
+    for _ in range(2 * 60 * FPS):
+        sim.step()
+        seen.update(sim.vehicles.id.tolist())
+        on_roads = set(sim.road["id"].tolist())
+        assert on_roads.isdisjoint(sim.vehicles.id.tolist())
+    assert sim.exited > 0 and sim.vehicles_on_roads() > 0
+    assert sim.exited + len(sim.vehicles) + sim.vehicles_on_roads() == len(seen)
+    assert sim.get_average_trip_time() > 0
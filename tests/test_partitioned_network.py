@@ -0,0 +1,109 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import partitioned_network
+from batch_simulation import BatchSimulation
+from network import NetworkSimulation, grid_network
+from partitioned_network import PartitionedNetwork, RegionSimulation, partition_graph
+from vehicles import travel_coordinate
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                                reason="PartitionedNetwork forks its workers")
+
+TICKS = 1800
+
+
+def scheduled_arrivals(self):
+    """
+    Outside arrivals fixed by (node, tick) instead of drawn from the region's
+    streams, so a partitioned run must reproduce the single simulation exactly.
+    """
+    rows, cols = np.array(self.nodes).T
+    code = (rows * 7919 + cols * 104729 + self.clock.ticks * 31) % 127
+    spawning = np.flatnonzero(code < 4)
+    d = code[spawning]
+    lane = spawning * 4 + d
+    is_bus = (rows[spawning] + self.clock.ticks) % 3 == 0
+
+    store = self.vehicles
+    lowest = np.full(self.num_groups * 4, np.inf)
+    np.minimum.at(lowest, store.lane, travel_coordinate(store))
+    free = (lowest[lane] >= self.spawn_threshold[d]) & self.entry_lanes[lane]
+    d, lane, is_bus = d[free], lane[free], is_bus[free]
+    length = np.where(is_bus, 60, 40)
+    x, y = self.geometry.spawn_positions(d, length)
+    store.extend(x, y, lane, length, is_bus.astype(np.int8), self.now)
+    self.lane_counts.enter(lane)
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    # workers are forked, so they inherit the patched class
+    monkeypatch.setattr(BatchSimulation, "spawn_cars", scheduled_arrivals)
+
+
+def test_partition_gives_contiguous_strips():
+    graph = grid_network(4, 6)
+    region_of = partition_graph(graph, 3)
+    assert sorted(set(region_of.values())) == [0, 1, 2]
+    assert all(list(region_of.values()).count(r) == 8 for r in range(3))
+    # west to east: a node's region never decreases along a row
+    for r in range(4):
+        assert [region_of[r, c] for c in range(6)] == sorted(region_of[r, c] for c in range(6))
+
+
+@pytest.mark.parametrize("rows, cols, parts", [(3, 3, 4), (3, 5, 4), (5, 7, 3), (2, 6, 6)])
+def test_roads_only_join_neighbouring_strips(rows, cols, parts):
+    graph = grid_network(rows, cols)
+    region_of = partition_graph(graph, parts)
+    regions = sorted(set(region_of.values()))
+    assert regions == list(range(min(parts, cols)))
+    for a, b in graph.edges:
+        assert abs(region_of[a] - region_of[b]) <= 1
+    # whole columns: every node of a column is in the same region
+    for c in range(cols):
+        assert len({region_of[r, c] for r in range(rows)}) == 1
+
+
+@pytest.mark.parametrize("sync_ticks", [None, 1])
+def test_matches_a_single_network_simulation(scheduled, sync_ticks):
+    graph = grid_network(2, 6, road_length=150)
+    single = NetworkSimulation(graph, seed=0).run(TICKS)
+    with PartitionedNetwork(graph, workers=3, sync_ticks=sync_ticks, seed=0) as network:
+        network.run(TICKS // 2).run(TICKS - TICKS // 2)
+        stats = network.stats()
+
+    assert single.exited > 0
+    assert stats["exited"] == single.exited
+    assert stats["average_trip_time"] == pytest.approx(single.get_average_trip_time())
+    assert stats["vehicles"] == len(single.vehicles)
+    assert stats["on_roads"] == single.vehicles_on_roads()
+    assert stats["waiting_on_roads"] == single.waiting_on_roads()
+    for node in graph.nodes:
+        group = single.group_of(node)
+        assert stats["average_wait"][node] == pytest.approx(single.get_average_wait()[group])
+        assert stats["crossings_per_minute"][node] == pytest.approx(single.get_throughput_per_minute()[group])
+
+
+def test_sync_ticks_longer_than_the_shortest_cut_road_is_refused():
+    graph = grid_network(2, 4, road_length=150)
+    with pytest.raises(ValueError, match="sync_ticks"):
+        PartitionedNetwork(graph, workers=2, sync_ticks=10_000)
+
+
+def test_a_failing_worker_raises_instead_of_hanging(monkeypatch):
+    step = RegionSimulation.step
+
+    def failing_step(self):
+        if self.region == 1 and self.clock.ticks == 50:
+            raise ValueError("region 1 broke")
+        step(self)
+
+    monkeypatch.setattr(RegionSimulation, "step", failing_step)
+    monkeypatch.setattr(partitioned_network, "REPLY_POLL_SECONDS", 0.05)
+    network = PartitionedNetwork(grid_network(3, 6), workers=3, seed=0)
+    with pytest.raises(RuntimeError, match="region 1 broke"):
+        network.run(200)
+    assert not any(process.is_alive() for process in network.processes)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from quantiles import QuantileSketch, WaitQuantiles
+
+QS = [0.0, 0.01, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1.0]
+
+
+def samples(name, n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    if name == "exponential":
+        return rng.exponential(20.0, n)
+    if name == "lognormal":
+        return rng.lognormal(2.0, 1.5, n)
+    if name == "uniform":
+        return rng.uniform(0.5, 120.0, n)
+    raise ValueError(name)
+
+
+@pytest.mark.parametrize("distribution", ["exponential", "lognormal", "uniform"])
+@pytest.mark.parametrize("accuracy", [0.01, 0.02])
+def test_relative_error_against_numpy(distribution, accuracy):
+    values = samples(distribution)
+    sketch = QuantileSketch(accuracy)
+    sketch.extend(values)
+    for q in QS:
+        # the sketch estimates the sample at rank q * (n - 1), rounded down
+        exact = np.quantile(values, q, method="lower")
+        assert abs(sketch.quantile(q) - exact) <= accuracy * exact * (1 + 1e-9)
+
+
+def test_add_and_extend_fill_the_same_buckets():
+    values = samples("lognormal", n=2000)
+    one_by_one, batched = QuantileSketch(), QuantileSketch()
+    for value in values:
+        one_by_one.add(value)
+    batched.extend(values)
+    assert np.array_equal(one_by_one.counts, batched.counts)
+    assert (one_by_one.count, one_by_one.min, one_by_one.max) == (batched.count, batched.min, batched.max)
+
+
+def test_zero_waits_and_empty_sketch():
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) == 0.0
+    sketch.extend([0.0] * 60 + [5.0] * 40)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(0.99) == pytest.approx(5.0, rel=0.01)
+
+
+def test_merged_sketches_match_one_sketch_of_everything():
+    directions, types = ["N", "E"], ["car", "bus"]
+    waits = WaitQuantiles(directions, types)
+    everything, north = QuantileSketch(), QuantileSketch()
+    rng = np.random.default_rng(1)
+    for _ in range(5000):
+        d, k, wait = rng.integers(2), rng.integers(2), rng.exponential(10.0)
+        waits.add(d, k, wait)
+        everything.add(wait)
+        if d == 0:
+            north.add(wait)
+    assert np.array_equal(waits.sketch().counts, everything.counts)
+    assert waits.quantiles() == [everything.quantile(q) for q in (0.5, 0.95, 0.99)]
+    assert waits.quantiles(direction="N") == [north.quantile(q) for q in (0.5, 0.95, 0.99)]
@@ -0,0 +1,91 @@
+import pytest
+
+from sim_clock import FrameScheduler, SimClock
+
+TICK = 1.0 / 60
+
+
+class FakeTimer:
+    """Wall clock the test moves by hand."""
+
+    def __init__(self, start=100.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_clock_time_comes_from_the_tick_count():
+    clock = SimClock(TICK, start=5.0)
+    assert clock.now() == 5.0
+    for _ in range(3600 * 60):
+        clock.advance()
+    # no drift from adding up 1/60 a few hundred thousand times
+    assert clock.now() == 5.0 + 3600.0
+    assert clock.advance(30) == pytest.approx(5.0 + 3600.5)
+    assert clock.seconds(90) == pytest.approx(1.5)
+
+
+def test_one_tick_per_frame_at_matching_rates():
+    timer = FakeTimer()
+    scheduler = FrameScheduler(TICK, render_fps=60, timer=timer)
+    assert scheduler.ticks_due() == 0  # the first frame only starts the clock
+    ticks = []
+    for _ in range(600):
+        timer.sleep(TICK)
+        ticks.append(scheduler.ticks_due())
+    assert ticks == [1] * 600
+
+
+@pytest.mark.parametrize("speed, render_fps, expected", [(1.0, 30, 2), (10.0, 60, 10), (0.5, 60, None)])
+def test_ticks_per_frame_follow_speed_and_frame_rate(speed, render_fps, expected):
+    timer = FakeTimer()
+    scheduler = FrameScheduler(TICK, speed=speed, render_fps=render_fps, timer=timer)
+    scheduler.ticks_due()
+    ticks = []
+    for _ in range(120):
+        timer.sleep(1.0 / render_fps)
+        ticks.append(scheduler.ticks_due())
+    if expected is not None:
+        assert ticks == [expected] * 120
+    else:
+        # half speed: the fraction carries over, one tick every other frame
+        assert ticks == [0, 1] * 60
+    assert sum(ticks) == round(120 / render_fps * speed * 60)
+
+
+def test_long_pauses_are_capped_instead_of_caught_up():
+    timer = FakeTimer()
+    scheduler = FrameScheduler(TICK, max_frame_time=0.25, timer=timer)
+    scheduler.ticks_due()
+    timer.sleep(5.0)  # window dragged for five seconds
+    assert scheduler.ticks_due() == 15  # 0.25 s of ticks, not 300
+    timer.sleep(TICK)
+    assert scheduler.ticks_due() == 1
+
+
+def test_rendering_skips_at_most_max_skipped_frames():
+    timer = FakeTimer()
+    scheduler = FrameScheduler(TICK, render_fps=60, max_skipped=3, timer=timer)
+    scheduler.ticks_due()
+    renders = []
+    for _ in range(8):
+        timer.sleep(TICK)
+        scheduler.ticks_due()
+        timer.sleep(2 * TICK)  # stepping took longer than a frame
+        renders.append(scheduler.should_render())
+    assert renders == [False, False, False, True, False, False, False, True]
+
+
+def test_idle_time_is_the_rest_of_the_frame():
+    timer = FakeTimer()
+    scheduler = FrameScheduler(TICK, render_fps=50, timer=timer)
+    scheduler.ticks_due()
+    timer.sleep(0.005)
+    assert scheduler.should_render()
+    assert scheduler.idle_time() == pytest.approx(0.015)
+    timer.sleep(0.05)
+    assert scheduler.idle_time() == 0.0
@@ -0,0 +1,76 @@
+import wave
+
+import numpy as np
+import pytest
+
+from siren_benchmark import evaluate, load_corpus, synthetic_corpus
+from siren_detector import FS, SIREN_TONES, GoertzelDetector, SpectralDetector, load_wav
+
+ENGINES = {
+    "fft": SpectralDetector,
+    "goertzel": GoertzelDetector,
+    "goertzel-alternation": lambda: GoertzelDetector(alternation=2.5),
+}
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return synthetic_corpus(clips=16, seconds=3.0, seed=0)
+
+
+@pytest.fixture(scope="module")
+def whistle_corpus():
+    # clips without siren carry a steady tone at the lower siren frequency
+    return synthetic_corpus(clips=16, seconds=3.0, seed=1, whistle=0.2)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_every_siren_found_without_false_alarms(corpus, engine):
+    result = evaluate(corpus, ENGINES[engine])
+    assert result["hit_rate"] == 1.0
+    assert result["false_alarms"] == 0
+
+
+def test_goertzel_is_as_quick_as_the_fft_without_alternation(corpus):
+    fft = evaluate(corpus, ENGINES["fft"])
+    goertzel = evaluate(corpus, ENGINES["goertzel"])
+    assert fft["latency_max"] <= 0.2
+    assert goertzel["latency_max"] <= 0.2
+
+
+def test_alternation_waits_for_the_second_tone(corpus):
+    result = evaluate(corpus, ENGINES["goertzel-alternation"])
+    # the siren switches tones after one second, so about that long after the onset at most
+    assert result["latency_max"] <= 1.0 + 0.25 + 0.1
+
+
+def test_only_alternation_rejects_a_steady_whistle(whistle_corpus):
+    negatives = sum(onset is None for _, onset in whistle_corpus)
+    assert evaluate(whistle_corpus, ENGINES["fft"])["false_alarms"] == negatives
+    assert evaluate(whistle_corpus, ENGINES["goertzel"])["false_alarms"] == negatives
+    result = evaluate(whistle_corpus, ENGINES["goertzel-alternation"])
+    assert result["false_alarms"] == 0
+    assert result["hit_rate"] == 1.0
+
+
+def test_goertzel_tone_shares():
+    detector = GoertzelDetector()
+    t = np.arange(detector.size) / FS
+    low, high = SIREN_TONES
+    assert detector.tone_shares(np.sin(2 * np.pi * low * t)) == pytest.approx([1.0, 0.0], abs=0.01)
+    assert detector.tone_shares(np.sin(2 * np.pi * high * 1.02 * t)) == pytest.approx([0.0, 1.0], abs=0.1)
+    assert detector.tone_shares(np.sin(2 * np.pi * 1500 * t)).max() < 0.01
+
+
+def test_labelled_corpus_reads_back(tmp_path):
+    samples, onset = synthetic_corpus(clips=2, seconds=1.0, seed=2)[1]
+    with wave.open(str(tmp_path / "siren.wav"), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(FS)
+        wav.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    (tmp_path / "labels.csv").write_text(f"siren.wav,{onset}\nsiren.wav,\n")
+    corpus = load_corpus(tmp_path / "labels.csv")
+    assert [label for _, label in corpus] == [pytest.approx(onset), None]
+    assert np.allclose(corpus[0][0], load_wav(tmp_path / "siren.wav")[0])
+    assert np.allclose(corpus[0][0], samples, atol=1e-4)
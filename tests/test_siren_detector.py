@@ -0,0 +1,115 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from siren_detector import (FS, HOP, WINDOW, ReplaySource, RingBuffer, SirenListener, SirenMonitor,
+                            SpectralDetector, StreamAnalyzer, replay)
+from siren_benchmark import rumble
+from siren_sound import generate_siren_sound
+
+SIREN = generate_siren_sound()[:, 0].astype(np.float32) / 32768.0
+
+
+def clip(seconds, onset=None, level=0.5, seed=0):
+    """Traffic rumble, with the siren from `onset` seconds on."""
+    samples = rumble(np.random.default_rng(seed), seconds, 0.1)
+    if onset is not None:
+        start = int(onset * FS)
+        samples[start:] += level * np.resize(SIREN, samples.size - start)
+    return samples
+
+
+def test_ring_buffer_keeps_the_latest_samples_across_wraps():
+    buffer = RingBuffer(10)
+    assert buffer.latest(3) is None
+    written = []
+    for block in [np.arange(4), np.arange(4, 11), np.arange(11, 12), np.arange(12, 37)]:
+        buffer.write(block)
+        written.extend(block)
+        for n in (1, 5, 10):
+            if len(written) >= n:
+                assert buffer.latest(n).tolist() == written[-n:]
+    assert buffer.written == 37
+
+
+def test_analyzer_hops_through_the_stream():
+    detector = SpectralDetector(window=WINDOW)
+    analyzer = StreamAnalyzer(detector, hop=HOP)
+    samples = clip(2.0)
+    windows = 0
+    # blocks of one hop, like the live input stream
+    for start in range(0, samples.size, analyzer.hop):
+        analyzer.write(samples[start:start + analyzer.hop])
+        while analyzer.ready():
+            analyzer.analyse()
+            windows += 1
+    # one window once the first is full, then one per hop
+    assert windows == (samples.size - detector.size) // analyzer.hop + 1
+
+
+def test_no_detection_without_siren():
+    assert replay(clip(5.0), SpectralDetector()) == []
+
+
+@pytest.mark.parametrize("onset", [0.5, 1.37, 2.9])
+def test_siren_is_noticed_about_one_hop_after_it_starts(onset):
+    detections = np.array(replay(clip(5.0, onset), SpectralDetector())) / FS
+    assert detections.size and detections[0] > onset
+    # the first window reaching into the siren, rounded up to the next hop
+    assert detections[0] - onset <= HOP + 1.0 / FS
+
+
+def test_cooldown_spaces_detections():
+    detections = np.diff(replay(clip(10.0, 0.5), SpectralDetector(), cooldown=2.0)) / FS
+    assert detections.size >= 3
+    assert (detections > 2.0).all() and (detections <= 2.0 + HOP + 1.0 / FS).all()
+
+
+def test_listener_fires_from_its_thread():
+    fired = threading.Event()
+    listener = SirenListener(fired.set, SpectralDetector(), source=ReplaySource(clip(1.0, 0.2), realtime=False))
+    listener.start()
+    try:
+        assert fired.wait(5.0)
+    finally:
+        listener.stop()
+    assert not listener.thread.is_alive()
+
+
+def wait_for_detections(monitor, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        detections = monitor.poll()
+        if detections:
+            return detections
+        time.sleep(0.05)
+    return []
+
+
+def test_monitor_delivers_detections_from_its_process():
+    # a looping real-time clip with a siren from 0.3 s on
+    monitor = SirenMonitor(SpectralDetector(), cooldown=0.5, source=ReplaySource(clip(2.0, 0.3)))
+    assert monitor.worker is None  # nothing is spawned until listening starts
+    try:
+        before = time.time()
+        monitor.start()
+        detections = wait_for_detections(monitor, 30.0)
+        assert detections and before <= detections[0] <= time.time()
+        assert monitor.worker.is_alive()
+
+        monitor.stop()
+        time.sleep(1.0)  # the process notices within 0.1 s; drop what was already on its way
+        monitor.poll()
+        time.sleep(1.5)
+        assert monitor.poll() == []
+
+        # the same process listens again
+        worker = monitor.worker
+        monitor.start()
+        assert wait_for_detections(monitor, 10.0)
+        assert monitor.worker is worker
+    finally:
+        monitor.close(timeout=5.0)
+    assert not monitor.worker.is_alive()
@@ -0,0 +1,97 @@
+import os
+import wave
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")  # before pygame opens a mixer
+
+import pygame
+
+import siren_sound
+from siren_sound import SIREN_ASSET_VERSION, SirenChannels, distance_volume, generate_siren_sound, siren_asset
+
+
+@pytest.fixture
+def mixer():
+    pygame.mixer.init()
+    yield
+    pygame.mixer.quit()
+
+
+@pytest.fixture
+def sound(mixer):
+    return pygame.sndarray.make_sound(generate_siren_sound())
+
+
+def test_asset_is_written_once_then_read_from_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    path = siren_asset()
+    assert path == tmp_path / "traffic-sim" / f"siren-v{SIREN_ASSET_VERSION}.wav"
+    with wave.open(str(path)) as wav:
+        assert (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (2, 2, siren_sound.SAMPLE_RATE)
+        frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2").reshape(-1, 2)
+    assert np.array_equal(frames, generate_siren_sound())
+    assert list(path.parent.iterdir()) == [path]  # no temporary file left behind
+
+    def synthesize():
+        raise AssertionError("the cached asset should have been reused")
+
+    monkeypatch.setattr(siren_sound, "generate_siren_sound", synthesize)
+    assert siren_asset() == path
+
+
+def test_asset_goes_to_an_explicit_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "unused"))
+    path = siren_asset(tmp_path / "assets")
+    assert path.parent == tmp_path / "assets" and path.exists()
+    assert not (tmp_path / "unused").exists()
+
+
+def test_vehicles_wait_when_every_channel_is_busy(sound):
+    channels = SirenChannels(sound, channels=2)
+    a, b, c, d = "a", "b", "c", "d"
+    channels.start(a, 0.9)
+    channels.start(b)
+    channels.start(c, 0.5)
+    channels.start(d)
+    assert set(channels.playing) == {a, b}
+    assert list(channels.waiting) == [c, d]
+    assert channels.playing[a].get_volume() == pytest.approx(0.9, abs=0.01)
+    # starting a vehicle twice does not queue it again
+    channels.start(c)
+    assert list(channels.waiting) == [c, d]
+
+
+def test_stop_hands_the_channel_to_the_longest_waiting_vehicle(sound):
+    channels = SirenChannels(sound, channels=1)
+    channels.start("a")
+    channels.start("b")
+    channels.start("c")
+    channels.set_distance("b", 300.0)  # b drove on while it waited
+    freed = channels.playing["a"]
+    channels.stop("a")
+    assert channels.playing == {"b": freed}
+    assert freed.get_volume() == pytest.approx(distance_volume(300.0), abs=0.01)
+    assert list(channels.waiting) == ["c"]
+
+
+def test_a_stopped_channel_is_reused(sound):
+    channels = SirenChannels(sound, channels=2)
+    channels.start("a")
+    channels.start("b")
+    first = channels.playing["a"]
+    channels.stop("a")
+    channels.stop("a")  # stopping twice is harmless
+    assert len(channels.free) == 1
+    channels.start("c")
+    assert channels.playing["c"] is first
+    assert not channels.free
+
+    # a vehicle that leaves before getting a channel just drops out of the queue
+    channels.start("d")
+    channels.stop("d")
+    assert channels.waiting == {}
+    channels.stop("b")
+    channels.stop("c")
+    assert len(channels.free) == 2 and channels.playing == {}
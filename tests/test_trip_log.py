@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulation import FPS, Simulation
+from trip_log import COLUMNS, TripLog
+from vehicles import DIRECTIONS, VEHICLE_TYPES
+
+TICKS = 5 * 60 * FPS  # 5 simulated minutes
+
+
+def run_logged(path, batch_size=20):
+    log = TripLog(path, batch_size=batch_size)
+    sim = Simulation(seed=7, spawn_chance=10, trip_log=log)
+    sim.run(TICKS)
+    log.close()
+    return sim, log
+
+
+def read(path):
+    return pd.read_parquet(path) if str(path).endswith(".parquet") else pd.read_csv(path)
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".csv"])
+def test_every_departure_is_logged_once(tmp_path, suffix):
+    path = tmp_path / f"trips{suffix}"
+    sim, log = run_logged(path)
+    trips = read(path)
+
+    assert list(trips.columns) == COLUMNS
+    assert len(trips) == log.rows_written == sim.throughput_count
+    assert len(trips) > 3 * log.batch_size  # several batches appended
+    assert trips["vehicle_id"].is_unique
+    assert set(trips["direction"]) <= set(DIRECTIONS)
+    assert set(trips["vehicle_type"]) <= set(VEHICLE_TYPES)
+    assert (trips["exit_time"] >= trips["spawn_time"]).all()
+    queued = trips["queue_time"].notna()
+    assert (trips["queue_time"][queued] >= trips["spawn_time"][queued]).all()
+    assert (trips["queue_time"][queued] <= trips["exit_time"][queued]).all()
+
+
+def test_parquet_and_csv_agree(tmp_path):
+    run_logged(tmp_path / "trips.parquet")
+    run_logged(tmp_path / "trips.csv")
+    parquet = read(tmp_path / "trips.parquet")
+    csv = read(tmp_path / "trips.csv")
+
+    assert np.array_equal(parquet["vehicle_id"], csv["vehicle_id"])
+    assert list(parquet["direction"].astype(str)) == list(csv["direction"])
+    for column in ["spawn_time", "queue_time", "commit_time", "exit_time"]:
+        assert np.allclose(parquet[column], csv[column], equal_nan=True)
@@ -0,0 +1,76 @@
+import random
+
+import numpy as np
+import pytest
+
+import vehicles
+from batch_simulation import BatchSimulation
+from simulation import Simulation
+from vehicles import SCALAR_MAX_VEHICLES
+
+COLUMNS = ["x", "y", "lane", "committed", "crossed", "queued_time", "queue_entry", "commit_time", "id"]
+TICKS = 4000
+
+
+def run(make_sim, scalar_max, monkeypatch, emergencies=False):
+    """States of a seeded run every 50 ticks, with `advance` looping up to `scalar_max` rows."""
+    monkeypatch.setattr(vehicles, "SCALAR_MAX_VEHICLES", scalar_max)
+    sim = make_sim()
+    rng = random.Random(0)
+    states = []
+    for tick in range(TICKS):
+        if emergencies and tick % 1300 == 600:
+            sim.spawn_emergency(rng.choice("NESW"), "fire")
+        sim.step()
+        check_counters(sim)
+        if tick % 50 == 0:
+            store = sim.vehicles
+            states.append(({name: getattr(store, name).copy() for name in COLUMNS},
+                           {name: getattr(sim.lane_counts, name).copy()
+                            for name in ("present", "queued", "committed", "queued_since")}))
+    return sim, states
+
+
+def check_counters(sim):
+    """The running LaneCounts against a rescan of the store."""
+    store, counts = sim.vehicles, sim.lane_counts
+    lanes = len(counts.present)
+    queued = ~np.isnan(store.queued_time)
+    assert np.array_equal(counts.present, np.bincount(store.lane, minlength=lanes))
+    assert np.array_equal(counts.queued, np.bincount(store.lane[queued], minlength=lanes))
+    assert np.array_equal(counts.committed, np.bincount(store.lane[store.committed], minlength=lanes))
+    since = np.bincount(store.lane[queued], weights=store.queued_time[queued], minlength=lanes)
+    assert np.allclose(counts.queued_since, since)
+
+
+def assert_same_states(a, b):
+    assert len(a) == len(b)
+    for (columns_a, counts_a), (columns_b, counts_b) in zip(a, b):
+        for name in COLUMNS:
+            assert np.array_equal(columns_a[name], columns_b[name], equal_nan=True), name
+        for name in counts_a:
+            assert np.array_equal(counts_a[name], counts_b[name]), name
+
+
+@pytest.mark.parametrize("seed, spawn_chance", [(0, 15), (1, 3)])
+def test_single_intersection_paths_agree(monkeypatch, seed, spawn_chance):
+    make = lambda: Simulation(seed=seed, spawn_chance=spawn_chance)
+    scalar, scalar_states = run(make, 10 ** 9, monkeypatch, emergencies=True)
+    vectorized, vectorized_states = run(make, 0, monkeypatch, emergencies=True)
+    # a single intersection stays below the threshold, where the scalar path is the default
+    assert max(len(columns["x"]) for columns, _ in scalar_states) <= SCALAR_MAX_VEHICLES
+    assert scalar.throughput_count > 0
+    assert_same_states(scalar_states, vectorized_states)
+    assert scalar.throughput_count == vectorized.throughput_count
+    assert scalar.total_wait_time == vectorized.total_wait_time
+
+
+def test_many_intersections_paths_agree(monkeypatch):
+    make = lambda: BatchSimulation(8, seed=4, spawn_chance=5)
+    scalar, scalar_states = run(make, 10 ** 9, monkeypatch)
+    vectorized, vectorized_states = run(make, 0, monkeypatch)
+    # well above the threshold, where the vectorized path is the default
+    assert max(len(columns["x"]) for columns, _ in vectorized_states) > SCALAR_MAX_VEHICLES
+    assert_same_states(scalar_states, vectorized_states)
+    assert np.array_equal(scalar.throughput_count, vectorized.throughput_count)
+    assert np.array_equal(scalar.total_wait_time, vectorized.total_wait_time)
@@ -0,0 +1,116 @@
+import math
+
+import numpy as np
+import pytest
+
+from simulation import Simulation, FPS, DEMAND_WINDOW
+from windowed_metrics import WindowedMetrics
+
+WINDOWS = (60.0, 300.0)
+BIN = 5.0
+
+
+def in_window(times, window, now):
+    """Mask of the events a window covers at `now`: those in its last ceil(window / BIN) bins."""
+    bins = np.floor(np.asarray(times) / BIN)
+    return bins > math.floor(now / BIN) - math.ceil(window / BIN)
+
+
+def test_windows_match_a_rescan_of_all_events():
+    rng = np.random.default_rng(3)
+    metrics = WindowedMetrics(WINDOWS, bin_seconds=BIN)
+    departures, wait_times, waits = [], [], []
+    now = 0.0
+    for i in range(4000):
+        now += rng.exponential(0.3)
+        if rng.random() < 0.5:
+            metrics.record_departures(now)
+            departures.append(now)
+        else:
+            wait = rng.exponential(15.0)
+            metrics.record_wait(now, wait)
+            wait_times.append(now)
+            waits.append(wait)
+        if i % 97 == 0:
+            for w in WINDOWS:
+                count = np.count_nonzero(in_window(departures, w, now))
+                assert metrics.throughput_per_minute(w, now) == pytest.approx(count * 60.0 / metrics.span(w, now))
+                recent = np.asarray(waits)[in_window(wait_times, w, now)]
+                assert metrics.mean_wait(w, now) == pytest.approx(recent.mean() if recent.size else 0.0)
+                sketch_counts = np.bincount([metrics.layout.bucket(x) for x in recent],
+                                            minlength=len(metrics.layout.counts))
+                for q in (0.5, 0.95):
+                    expected = metrics.layout.value_at_rank(sketch_counts, q * (recent.size - 1)) if recent.size else 0.0
+                    assert metrics.wait_quantile(q, w, now) == expected
+
+
+def test_events_roll_out_bin_by_bin():
+    metrics = WindowedMetrics((60.0,), bin_seconds=BIN)
+    metrics.record_departures(1.0, count=6)
+    metrics.record_departures(31.0, count=3)
+    assert metrics.totals[60.0].departures == 9
+    # the bin of t=1 is the oldest one the window still covers until t=60
+    assert metrics.span(60.0, 59.9) == pytest.approx(59.9)
+    metrics.throughput_per_minute(60.0, 59.9)
+    assert metrics.totals[60.0].departures == 9
+    metrics.throughput_per_minute(60.0, 60.0)
+    assert metrics.totals[60.0].departures == 3
+    metrics.throughput_per_minute(60.0, 90.0)
+    assert metrics.totals[60.0].departures == 0
+    assert metrics.throughput_per_minute(60.0, 90.0) == 0.0
+
+
+def test_arrivals_per_approach_roll_out_with_the_window():
+    metrics = WindowedMetrics((60.0,), bin_seconds=BIN, approaches=4)
+    metrics.record_arrivals(1.0, approach=2)
+    metrics.record_arrivals(31.0, count=2, approach=0)
+    metrics.record_arrivals(32.0)
+    assert metrics.approach_arrivals(60.0, 59.9).tolist() == [2, 0, 1, 0]
+    assert metrics.totals[60.0].arrivals == 4
+    assert metrics.approach_arrivals(60.0, 60.0).tolist() == [2, 0, 0, 0]
+    assert metrics.approach_arrivals(60.0, 90.0).tolist() == [0, 0, 0, 0]
+
+
+def test_idle_gap_longer_than_every_window_clears_everything():
+    metrics = WindowedMetrics(WINDOWS, bin_seconds=BIN)
+    for t in range(0, 300):
+        metrics.record_departures(float(t))
+        metrics.record_wait(float(t), 4.0)
+    now = 300.0 + 2 * max(WINDOWS)
+    for w in WINDOWS:
+        assert metrics.throughput_per_minute(w, now) == 0.0
+        assert metrics.mean_wait(w, now) == 0.0
+        assert metrics.wait_quantile(0.5, w, now) == 0.0
+    metrics.record_departures(now)
+    assert metrics.totals[60.0].departures == 1
+
+
+def test_span_is_shorter_early_in_the_run():
+    metrics = WindowedMetrics(WINDOWS, bin_seconds=BIN, start=0.0)
+    assert metrics.span(300.0, 42.0) == pytest.approx(42.0)
+    assert metrics.span(60.0, 0.0) == 0.0
+    assert metrics.throughput_per_minute(60.0, 0.0) == 0.0
+
+
+def test_simulation_recent_throughput_matches_summary():
+    sim = Simulation(seed=2).run(3 * 60 * FPS)
+    summary = sim.get_recent_metrics()
+    assert sim.get_recent_throughput() == {w: summary[w]["throughput_per_min"] for w in summary}
+
+
+def test_recent_demand_breaks_ties_between_equal_queues():
+    sims = {weight: Simulation(seed=0, demand_weight=weight) for weight in (0.0, 1.0)}
+    for sim in sims.values():
+        # W had a burst of arrivals that already drove off, E and W have one vehicle each now
+        sim.recent.record_arrivals(sim.now, count=5, approach=3)
+        sim.add_vehicle("E", "car")
+        sim.add_vehicle("W", "car")
+    assert sims[0.0].choose_next_direction() == 1
+    assert sims[1.0].get_recent_demand() == {"N": 0, "E": 1, "S": 0, "W": 6}
+    assert sims[1.0].choose_next_direction() == 3
+
+    # a minute later the burst has left the window and the queues decide again
+    sim = sims[1.0]
+    sim.clock.advance(int(DEMAND_WINDOW * FPS) + 1)
+    assert sim.get_recent_demand() == {d: 0 for d in "NESW"}
+    assert sim.choose_next_direction() == 1
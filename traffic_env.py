@@ -0,0 +1,86 @@
+# traffic_env.py
+"""
+Gymnasium environment around the headless intersection in simulation.py.
+
+The agent takes the role of `choose_next_direction`: each action is the
+direction (0..3 = N, E, S, W) that should be green next. The state machine
+still enforces MIN_GREEN / MAX_GREEN and the WAIT_CLEAR / DELAY clearance, so
+an action only changes the light once the current green may end.
+
+Observation (float32, 12 values):
+    vehicles per direction     (get_queue_counts, at most MAX_VEHICLES_PER_DIRECTION)
+    current wait per direction (get_current_waits, as in draw_bar_graphs; at most the episode length)
+    one-hot of the current green direction
+
+Reward is minus the number of vehicles queued at the end of the step.
+No pygame is involved; one env step runs `decision_ticks` simulation ticks,
+by default a tenth of a simulated second (a few thousand steps/s on one core).
+"""
+import math
+
+import gymnasium as gym
+import numpy as np
+from gymnasium import spaces
+
+from simulation import Simulation, DIRECTIONS, FPS, WIDTH, HEIGHT
+from vehicles import MAX_VEHICLE_SIZE, vehicle_length
+
+DECISION_TICKS = FPS // 10
+# vehicles of one direction cannot overlap, so no more than this many fit between spawn and exit
+MAX_VEHICLES_PER_DIRECTION = math.ceil((max(WIDTH, HEIGHT) + 2 * MAX_VEHICLE_SIZE) / vehicle_length("car"))
+
+
+def observation_space(decision_ticks, episode_seconds):
+    """Box of the observations; no vehicle can wait longer than an episode lasts."""
+    n = len(DIRECTIONS)
+    episode_ticks = int(episode_seconds * FPS)
+    longest = math.ceil(episode_ticks / decision_ticks) * decision_ticks / FPS
+    high = np.concatenate([np.full(n, MAX_VEHICLES_PER_DIRECTION), np.full(n, longest), np.ones(n)])
+    return spaces.Box(low=np.zeros(3 * n, dtype=np.float32), high=high.astype(np.float32), dtype=np.float32)
+
+
+class TrafficSignalEnv(gym.Env):
+    metadata = {"render_modes": []}
+
+    def __init__(self, decision_ticks=DECISION_TICKS, episode_seconds=3600.0, **sim_kwargs):
+        self.decision_ticks = decision_ticks
+        self.episode_ticks = int(episode_seconds * FPS)
+        self.sim_kwargs = sim_kwargs
+        n = len(DIRECTIONS)
+        self.action_space = spaces.Discrete(n)
+        self.observation_space = observation_space(decision_ticks, episode_seconds)
+        self.sim = None
+
+    def _observation(self):
+        sim = self.sim
+        obs = np.zeros(self.observation_space.shape, dtype=np.float32)
+        n = len(DIRECTIONS)
+        obs[:n] = list(sim.get_queue_counts().values())
+        obs[n:2 * n] = list(sim.get_current_waits().values())
+        obs[2 * n + sim.light_index] = 1.0
+        return obs
+
+    def _info(self):
+        sim = self.sim
+        return {
+            "avg_wait": sim.get_average_wait(),
+            "throughput": sim.throughput_count,
+            "light_state": sim.light_state,
+        }
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        # the simulation's random streams are derived from the env's seeded np_random
+        self.sim = Simulation(seed=int(self.np_random.integers(2 ** 63)), **self.sim_kwargs)
+        return self._observation(), self._info()
+
+    def step(self, action):
+        sim = self.sim
+        sim.requested_direction = int(action)
+        sim.run(self.decision_ticks)
+        queued = sum(sim.get_queued_counts().values())
+        truncated = sim.clock.ticks >= self.episode_ticks
+        return self._observation(), -float(queued), False, truncated, self._info()
+
+
+gym.register(id="TrafficSignal-v0", entry_point="traffic_env:TrafficSignalEnv")
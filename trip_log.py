@@ -0,0 +1,84 @@
+# trip_log.py
+"""
+Streaming per-vehicle trip log.
+
+Every vehicle that leaves the simulation becomes one row: its id, direction,
+vehicle type and its spawn, queue entry, commit and exit times (NaN when it
+never queued or never committed). Rows are buffered and written out every
+`batch_size` departures, so memory stays bounded however long the run is.
+
+The file format follows the extension: `.parquet` writes one Parquet row
+group per batch (needs pyarrow), anything else is appended as CSV with
+pandas. Either way the log reads back with one pandas call:
+
+    python simulation.py --minutes 240 --trip-log trips.parquet
+    trips = pandas.read_parquet("trips.parquet")
+"""
+import numpy as np
+import pandas as pd
+
+from vehicles import DIRECTIONS, VEHICLE_TYPES
+
+COLUMNS = ["vehicle_id", "direction", "vehicle_type", "spawn_time", "queue_time", "commit_time", "exit_time"]
+
+
+class TripLog:
+    def __init__(self, path, batch_size=10000):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.parquet = self.path.endswith(".parquet")
+        if self.parquet:
+            # optional dependency, only needed for Parquet output; checked here so a run fails before it starts
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError as error:
+                raise ImportError(f"{self.path}: Parquet output needs pyarrow (pip install pyarrow); "
+                                  "use a .csv path to log with pandas only") from error
+            self._pa = pyarrow
+            self._pq = pyarrow.parquet
+        self.writer = None  # ParquetWriter, opened with the first batch
+        self.chunks = []
+        self.pending = 0
+        self.rows_written = 0
+
+    def record(self, store, rows, now):
+        """Log the vehicles of `store` selected by `rows` (mask or indices) as leaving at `now`."""
+        vehicle_id = store.id[rows]
+        if vehicle_id.size == 0:
+            return
+        self.chunks.append((vehicle_id, store.direction()[rows], store.kind[rows], store.spawn_time[rows],
+                            store.queue_entry[rows], store.commit_time[rows],
+                            np.full(vehicle_id.size, now)))
+        self.pending += vehicle_id.size
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        columns = [np.concatenate(column) for column in zip(*self.chunks)]
+        self.chunks = []
+        self.pending = 0
+        vehicle_id, direction, kind, *times = columns
+        frame = pd.DataFrame(dict(zip(COLUMNS, [
+            vehicle_id,
+            pd.Categorical.from_codes(direction, DIRECTIONS),
+            pd.Categorical.from_codes(kind, VEHICLE_TYPES),
+            *times,
+        ])))
+        if self.parquet:
+            table = self._pa.Table.from_pandas(frame, preserve_index=False)
+            if self.writer is None:
+                self.writer = self._pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            first = self.rows_written == 0
+            frame.to_csv(self.path, mode="w" if first else "a", header=first, index=False)
+        self.rows_written += len(frame)
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
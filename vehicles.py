@@ -0,0 +1,526 @@
+# vehicles.py
+"""
+Structure-of-arrays vehicle store and the vectorized kinematics step.
+
+Every vehicle is one row across a set of NumPy columns (position, lane,
+length, type, state flags and timestamps), and `advance` applies the
+graph.py movement rules (stop line, SAFE_DISTANCE gap, commitment, crossing)
+to all rows at once instead of looping over Car objects.
+
+Lanes are numbered `group * 4 + direction`, so one store can hold the
+vehicles of many independent intersections; each intersection uses the same
+local screen coordinates.
+"""
+import numpy as np
+
+DIRECTIONS = ["N", "E", "S", "W"]
+VEHICLE_TYPES = ["car", "bus", "ambulance", "fire"]
+FIRST_EMERGENCY_KIND = VEHICLE_TYPES.index("ambulance")  # ambulance and fire come last
+
+SPEED = 2
+VEHICLE_WIDTH = 20
+MAX_VEHICLE_SIZE = 60
+
+# per direction (N, E, S, W): which coordinate the vehicle travels along (0 = x, 1 = y)
+# and whether that coordinate grows (+1) or shrinks (-1) as it drives
+AXIS = np.array([1, 0, 1, 0])
+SIGN = np.array([1, -1, -1, 1])
+_AXIS, _SIGN = AXIS.tolist(), SIGN.tolist()
+
+SCALAR_MAX_VEHICLES = 96  # `advance` loops over stores up to this size (measured crossover ~110)
+
+
+def vehicle_length(vehicle_type):
+    return 60 if vehicle_type == "bus" else 40
+
+
+class Geometry:
+    """Stop lines, spawn points and crossing lines of one intersection, per direction."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        cx, cy = width // 2, height // 2
+        self.cx, self.cy = cx, cy
+        center = np.array([cy, cx, cy, cx])
+        # "travel coordinate" s = SIGN * (x or y); a vehicle's front is s + length for N/W
+        # (their x/y is the rear corner) and s for S/E
+        self.front_offset = (SIGN > 0).astype(np.float64)
+        self.stop_front = np.array([cy - 60, -(cx + 60), -(cy + 60), cx - 60], dtype=np.float64)
+        self.center_s = SIGN * center
+        # travel coordinate past which a vehicle is off screen (in_bounds)
+        self.exit_s = np.array([height + MAX_VEHICLE_SIZE, MAX_VEHICLE_SIZE, MAX_VEHICLE_SIZE,
+                                width + MAX_VEHICLE_SIZE], dtype=np.float64)
+        # spawn position (x, y) before adding the vehicle length
+        self.spawn_x = np.array([cx - 15, width, cx + 15, 0])
+        self.spawn_y = np.array([0, cy - 15, height, cy + 15])
+        # per direction as Python numbers for the scalar step: travels along y, sign,
+        # front offset, stop line and crossing line
+        self.lines = list(zip(_AXIS, _SIGN, self.front_offset.tolist(), self.stop_front.tolist(),
+                              self.center_s.tolist()))
+
+    def spawn_position(self, direction, length):
+        if direction == 0:
+            return self.spawn_x[0], -length
+        if direction == 1:
+            return self.width + length, self.spawn_y[1]
+        if direction == 2:
+            return self.spawn_x[2], self.height + length
+        return -length, self.spawn_y[3]
+
+    def spawn_positions(self, direction, length):
+        # vectorized spawn_position for arrays of directions and lengths
+        x = self.spawn_x[direction] + np.select([direction == 1, direction == 3], [length, -length], 0)
+        y = self.spawn_y[direction] + np.select([direction == 2, direction == 0], [length, -length], 0)
+        return x, y
+
+    def spawn_threshold(self, safe_distance):
+        # a lane is blocked for spawning while any car's s is below this
+        return np.array([safe_distance, -(self.width - safe_distance),
+                         -(self.height - safe_distance), safe_distance], dtype=np.float64)
+
+
+class VehicleStore:
+    _COLUMNS = (
+        ("id", np.int64, 0),
+        ("x", np.float64, 0.0),
+        ("y", np.float64, 0.0),
+        ("lane", np.int32, 0),
+        ("length", np.float64, 0.0),
+        ("kind", np.int8, 0),
+        ("committed", np.bool_, False),
+        ("crossed", np.bool_, False),
+        ("queued_time", np.float64, np.nan),
+        ("spawn_time", np.float64, 0.0),
+        # trip timestamps kept until the vehicle leaves (NaN = never happened)
+        ("queue_entry", np.float64, np.nan),
+        ("commit_time", np.float64, np.nan),
+    )
+
+    def __init__(self, capacity=256):
+        self.count = 0
+        self.capacity = capacity
+        self.next_id = 0
+        for name, dtype, fill in self._COLUMNS:
+            setattr(self, "_" + name, np.full(capacity, fill, dtype=dtype))
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name, dtype, fill in self._COLUMNS:
+            old = getattr(self, "_" + name)
+            new = np.full(capacity, fill, dtype=dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, "_" + name, new)
+        self.capacity = capacity
+
+    def add(self, x, y, lane, length, kind, now):
+        if self.count == self.capacity:
+            self._grow(self.count + 1)
+        i = self.count
+        self._id[i] = self.next_id
+        self._x[i] = x
+        self._y[i] = y
+        self._lane[i] = lane
+        self._length[i] = length
+        self._kind[i] = kind
+        self._committed[i] = False
+        self._crossed[i] = False
+        self._queued_time[i] = np.nan
+        self._spawn_time[i] = now
+        self._queue_entry[i] = np.nan
+        self._commit_time[i] = np.nan
+        self.count += 1
+        self.next_id += 1
+        return i
+
+    def extend(self, x, y, lane, length, kind, now):
+        """Append one row per element of the given arrays."""
+        k = len(lane)
+        if self.count + k > self.capacity:
+            self._grow(self.count + k)
+        rows = slice(self.count, self.count + k)
+        self._id[rows] = np.arange(self.next_id, self.next_id + k)
+        self._x[rows] = x
+        self._y[rows] = y
+        self._lane[rows] = lane
+        self._length[rows] = length
+        self._kind[rows] = kind
+        self._committed[rows] = False
+        self._crossed[rows] = False
+        self._queued_time[rows] = np.nan
+        self._spawn_time[rows] = now
+        self._queue_entry[rows] = np.nan
+        self._commit_time[rows] = np.nan
+        self.count += k
+        self.next_id += k
+
+    def compact(self, keep):
+        """Drop the rows where `keep` is False, preserving the order of the rest."""
+        n = int(np.count_nonzero(keep))
+        if n == self.count:
+            return
+        for name, _, _ in self._COLUMNS:
+            column = getattr(self, "_" + name)
+            column[:n] = column[:self.count][keep]
+        self.count = n
+
+    def direction(self):
+        return self.lane & 3
+
+    def is_emergency(self):
+        return self.kind >= FIRST_EMERGENCY_KIND
+
+
+def _live_rows(name):
+    # store.x, store.lane, ... are views of the live rows only
+    return property(lambda self: getattr(self, name)[:self.count])
+
+
+for _name, _, _ in VehicleStore._COLUMNS:
+    setattr(VehicleStore, _name, _live_rows("_" + _name))
+
+
+class LaneCounts:
+    """
+    Running per-lane counters of the vehicles present, queued and committed,
+    plus the sum of the queued vehicles' queue entry times (for the average
+    current wait). The simulations update them on spawn and departure and
+    `advance` on queue entry and commit, so reading them never scans the store.
+    """
+
+    def __init__(self, lanes):
+        self.present = np.zeros(lanes, dtype=np.int64)
+        self.queued = np.zeros(lanes, dtype=np.int64)
+        self.committed = np.zeros(lanes, dtype=np.int64)
+        self.queued_since = np.zeros(lanes)
+
+    def enter(self, lanes):
+        np.add.at(self.present, lanes, 1)
+
+    def leave(self, store, rows):
+        """Forget the vehicles in `rows` (mask or indices), before they are removed from `store`."""
+        self.remove(store.lane[rows], store.committed[rows], store.queued_time[rows])
+
+    def remove(self, lanes, committed, queued_times):
+        """Forget vehicles given their lanes, committed flags and queue entry times (NaN: not queued)."""
+        lanes = np.asarray(lanes)
+        np.subtract.at(self.present, lanes, 1)
+        np.subtract.at(self.committed, lanes[np.asarray(committed, dtype=bool)], 1)
+        queued_times = np.asarray(queued_times, dtype=np.float64)
+        waiting = ~np.isnan(queued_times)
+        if waiting.any():
+            self.unqueue(lanes[waiting], queued_times[waiting])
+
+    def queue(self, lanes, now):
+        np.add.at(self.queued, lanes, 1)
+        np.add.at(self.queued_since, lanes, now)
+
+    def unqueue(self, lanes, queued_times):
+        np.subtract.at(self.queued, lanes, 1)
+        np.subtract.at(self.queued_since, lanes, queued_times)
+        self.queued_since[self.queued == 0] = 0.0  # drop the rounding error left by the subtractions
+
+    def commit(self, lanes):
+        np.add.at(self.committed, lanes, 1)
+
+    def clear(self, lanes):
+        """Zero the counters of `lanes` after all their vehicles were removed."""
+        for column in (self.present, self.queued, self.committed, self.queued_since):
+            column[lanes] = 0
+
+    def average_waits(self, now):
+        """Mean time the queued vehicles of each lane have been waiting so far."""
+        queued = self.queued
+        mean_since = np.divide(self.queued_since, queued, out=np.zeros(len(queued)), where=queued > 0)
+        return np.where(queued > 0, now - mean_since, 0.0)
+
+
+def travel_coordinate(store):
+    d = store.direction()
+    return SIGN[d] * np.where(AXIS[d] == 1, store.y, store.x)
+
+
+class _Plan:
+    """What `advance` decides for the current state, in lane order (front of each queue first)."""
+
+    def __init__(self, store, green, safe_distance, geometry):
+        lane = store.lane
+        d = lane & 3
+        length = store.length
+        s = SIGN[d] * np.where(AXIS[d] == 1, store.y, store.x)
+        front = s + length * geometry.front_offset[d]
+
+        self.order = order = np.lexsort((-s, lane))
+        n = len(order)
+        lane_o = lane[order]
+        d_o = d[order]
+        front_o = front[order]
+        has_leader = np.zeros(n, dtype=bool)
+        has_leader[1:] = lane_o[1:] == lane_o[:-1]
+        gap = np.full(n, np.inf)
+        gap[1:] = front_o[:-1] - length[order][:-1] - front_o[1:]
+        gap[~has_leader] = np.inf
+
+        can_pass = green[lane_o]
+        stop_front = geometry.stop_front[d_o]
+        before_stop = front_o < stop_front
+        committed_old = store.committed[order]
+        commit_now = ~committed_old & can_pass & ~before_stop
+        allowed = can_pass | before_stop
+
+        moves_alone = committed_old | commit_now | (allowed & (gap > safe_distance))
+        moves_with_leader = allowed & has_leader & (gap + SPEED > safe_distance)
+        idx = np.arange(n)
+        last_alone = np.maximum.accumulate(np.where(moves_alone, idx, -1))
+        last_break = np.maximum.accumulate(np.where(moves_with_leader, -1, idx))
+        moved = (last_alone >= 0) & (last_break <= last_alone)
+
+        leader_moved = np.zeros(n, dtype=bool)
+        leader_moved[1:] = moved[:-1] & has_leader[1:]
+        safe = (gap > safe_distance) | ((gap + SPEED > safe_distance) & leader_moved)
+        will_move = committed_old | (allowed & safe)
+
+        # queue entry is decided before commitment, exactly like Car.move
+        s_o = s[order]
+        near = s_o + length[order] >= geometry.center_s[d_o] - 300
+        self.start_queue = ~will_move & np.isnan(store.queued_time[order]) & ~committed_old & near
+
+        self.lane_o, self.d_o, self.s_o, self.front_o = lane_o, d_o, s_o, front_o
+        self.gap, self.has_leader, self.stop_front, self.before_stop = gap, has_leader, stop_front, before_stop
+        self.commit_now, self.moved = commit_now, moved
+
+
+def _advance_scalar(store, green, now, safe_distance, geometry, counts):
+    """
+    `advance` one vehicle at a time on Python floats. Rows walk the lanes
+    front to back in row order (vehicles only enter at the back of a lane),
+    so each leader is decided before its follower; returns None without
+    changing anything if a lane is not stored in that order.
+    """
+    n = store.count
+    lanes = store._lane[:n].tolist()
+    xs = store._x[:n].tolist()
+    ys = store._y[:n].tolist()
+    lengths = store._length[:n].tolist()
+    committed = store._committed[:n].tolist()
+    crossed = store._crossed[:n].tolist()
+    queued = store._queued_time[:n].tolist()
+    green = green.tolist()
+    lines = geometry.lines
+
+    leaders = {}  # lane -> (s, rear, moved) of the last row seen in it
+    commit_rows, queue_rows, crossed_rows, served = [], [], [], []
+    for i, (lane, was_committed, was_crossed, queued_at) in enumerate(zip(lanes, committed, crossed, queued)):
+        vertical, sign, front_offset, stop_front, center_s = lines[lane & 3]
+        s = sign * (ys[i] if vertical else xs[i])
+        length = lengths[i]
+        front = s + length * front_offset
+        leader = leaders.get(lane)
+        if leader is None:
+            safe = True
+        else:
+            leader_s, leader_rear, leader_moved = leader
+            if s > leader_s:
+                return None
+            gap = leader_rear - front
+            safe = gap > safe_distance or (leader_moved and gap + SPEED > safe_distance)
+
+        can_pass = green[lane]
+        before_stop = front < stop_front
+        commit_now = not was_committed and can_pass and not before_stop
+        will_move = was_committed or ((can_pass or before_stop) and safe)
+        # queue entry is decided before commitment, exactly like Car.move
+        if not will_move and not was_committed and queued_at != queued_at and s + length >= center_s - 300:
+            queued[i] = queued_at = now
+            queue_rows.append(i)
+        if commit_now:
+            commit_rows.append(i)
+            if queued_at == queued_at:
+                served.append(i)
+        moved = will_move or commit_now
+        leaders[lane] = (s, front - length, moved)
+        if moved:
+            if vertical:
+                ys[i] += sign * SPEED
+            else:
+                xs[i] += sign * SPEED
+            s += SPEED
+        if not was_crossed and s >= center_s:
+            crossed_rows.append(i)
+
+    waits = [now - queued[i] for i in served]
+    if len(served) > 1:
+        # the vectorized step reports them in lane order
+        served, waits = zip(*sorted(zip(served, waits), key=lambda row: lanes[row[0]]))
+    if counts is not None and (queue_rows or commit_rows):
+        if queue_rows:
+            counts.queue([lanes[i] for i in queue_rows], now)
+        if commit_rows:
+            counts.commit([lanes[i] for i in commit_rows])
+        if served:
+            counts.unqueue([lanes[i] for i in served], [queued[i] for i in served])
+    for i in served:
+        queued[i] = np.nan
+
+    store._x[:n] = xs
+    store._y[:n] = ys
+    store._queued_time[:n] = queued
+    for i in commit_rows:
+        store._committed[i] = True
+        store._commit_time[i] = now
+    for i in queue_rows:
+        store._queue_entry[i] = now
+    for i in crossed_rows:
+        store._crossed[i] = True
+    return np.array(waits, dtype=np.float64), np.array(served, dtype=np.int64)
+
+
+def advance(store, green, now, safe_distance, geometry, counts=None):
+    """
+    Move every vehicle one tick.
+
+    `green` is a bool per lane (can_pass). Returns the waits (seconds) and the
+    rows of the queued vehicles that committed to crossing this tick. The
+    queue entries and commits are also applied to `counts` (a LaneCounts), if given.
+
+    The original loop moves cars in spawn order, so each car tests its gap
+    against the already-moved car ahead. That chain is reproduced exactly
+    with a per-lane scan: a car moves if it can move on its own (P), or if it
+    would only fit once its leader moves (Q) and the leader moves.
+
+    Below SCALAR_MAX_VEHICLES rows the fixed cost of the NumPy calls is larger
+    than the work, so small stores (a single intersection) take the same
+    rules through a plain loop instead.
+    """
+    if store.count == 0:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+    if store.count <= SCALAR_MAX_VEHICLES:
+        result = _advance_scalar(store, green, now, safe_distance, geometry, counts)
+        if result is not None:
+            return result
+    plan = _Plan(store, green, safe_distance, geometry)
+    order = plan.order
+
+    queued_time = store.queued_time
+    queued_o = queued_time[order]
+    queued_o[plan.start_queue] = now
+    served = plan.commit_now & ~np.isnan(queued_o)
+    served_since = queued_o[served]
+    waits = now - served_since
+    served_rows = order[served]
+    queued_o[served] = np.nan
+    if counts is not None:
+        lane = store.lane
+        if plan.start_queue.any():
+            counts.queue(lane[order[plan.start_queue]], now)
+        if plan.commit_now.any():
+            counts.commit(lane[order[plan.commit_now]])
+        if served_rows.size:
+            counts.unqueue(lane[served_rows], served_since)
+
+    queued_time[order] = queued_o
+    store.committed[order[plan.commit_now]] = True
+    store.queue_entry[order[plan.start_queue]] = now
+    store.commit_time[order[plan.commit_now]] = now
+
+    coast(store, order[plan.moved], 1, geometry)
+    return waits, served_rows
+
+
+def coast(store, rows, ticks, geometry):
+    """Move the vehicles in `rows` straight ahead for `ticks` ticks and update their crossed flags."""
+    d = store.direction()[rows]
+    step = SIGN[d] * SPEED * ticks
+    ys = AXIS[d] == 1
+    store.y[rows[ys]] += step[ys]
+    store.x[rows[~ys]] += step[~ys]
+    d = store.direction()
+    s_new = SIGN[d] * np.where(AXIS[d] == 1, store.y, store.x)
+    store.crossed[s_new >= geometry.center_s[d]] = True
+
+
+def _first_flip(value, rate, threshold):
+    """
+    Per element, the first tick j >= 0 at which `value + j * rate > threshold`
+    differs from its value at j = 0 (inf if it never does).
+    """
+    ticks = np.full(len(value), np.inf)
+    rising = (rate > 0) & ~(value > threshold)
+    falling = (rate < 0) & (value > threshold)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ticks[rising] = np.floor((threshold - value[rising]) / rate[rising]) + 1
+        ticks[falling] = np.ceil((value[falling] - threshold) / -rate[falling])
+    return ticks
+
+
+def steady_ticks(store, green, safe_distance, geometry):
+    """
+    Number of upcoming ticks in which `advance` would only move the same
+    vehicles straight ahead: nobody starts or stops, commits, starts to
+    queue or leaves the screen. Returns (ticks, moving rows); ticks is 0 when
+    the very next tick has such an event, and inf for an empty store.
+
+    Those ticks can then be applied at once with `coast`.
+    """
+    if store.count == 0:
+        return np.inf, np.empty(0, dtype=np.int64)
+    plan = _Plan(store, green, safe_distance, geometry)
+    moving_rows = plan.order[plan.moved]
+    if plan.commit_now.any() or plan.start_queue.any():
+        return 0, moving_rows
+
+    speed = np.where(plan.moved, float(SPEED), 0.0)
+    limits = [np.inf]
+    # a moving vehicle reaching its stop line commits or stops there
+    approaching = plan.moved & plan.before_stop
+    limits.append(np.min(np.ceil((plan.stop_front[approaching] - plan.front_o[approaching]) / SPEED),
+                         initial=np.inf))
+    # a gap opening or closing past the SAFE_DISTANCE tests changes who moves
+    follower = plan.has_leader
+    leader_speed = np.zeros(len(speed))
+    leader_speed[1:] = speed[:-1]
+    closing = (leader_speed - speed)[follower]
+    gap = plan.gap[follower]
+    for threshold in (safe_distance, safe_distance - SPEED):
+        limits.append(np.min(_first_flip(gap, closing, threshold), initial=np.inf))
+    # leaving the screen is counted in the tick it happens
+    exit_s = geometry.exit_s[plan.d_o[plan.moved]]
+    limits.append(np.min(np.floor((exit_s - plan.s_o[plan.moved]) / SPEED), initial=np.inf))
+    return min(limits), moving_rows
+
+
+def in_bounds(store, geometry):
+    x, y = store.x, store.y
+    return ((-MAX_VEHICLE_SIZE <= x) & (x <= geometry.width + MAX_VEHICLE_SIZE)
+            & (-MAX_VEHICLE_SIZE <= y) & (y <= geometry.height + MAX_VEHICLE_SIZE))
+
+
+def box_occupied(store, geometry):
+    """
+    Per-row virtual IoT sensor: True where the vehicle's drawn body overlaps
+    the central box (WIDTH//2 +- 60, HEIGHT//2 +- 60).
+    """
+    vertical = AXIS[store.direction()] == 1
+    length, x, y = store.length, store.x, store.y
+    w = max(1, VEHICLE_WIDTH - 4)
+    h = np.maximum(1, length - 10)
+    left = np.where(vertical, x + 2, x + 5)
+    top = np.where(vertical, y + 5, y + 2)
+    right = left + np.where(vertical, w, h)
+    bottom = top + np.where(vertical, h, w)
+    cx, cy = geometry.cx, geometry.cy
+    return ~((right < cx - 60) | (left > cx + 60) | (bottom < cy - 60) | (top > cy + 60))
+
+
+def distance_to_center_sq(store, geometry):
+    vertical = AXIS[store.direction()] == 1
+    half_len = store.length / 2
+    half_w = VEHICLE_WIDTH / 2
+    center_x = store.x + np.where(vertical, half_w, half_len)
+    center_y = store.y + np.where(vertical, half_len, half_w)
+    return (center_x - geometry.cx) ** 2 + (center_y - geometry.cy) ** 2
@@ -0,0 +1,148 @@
+# windowed_metrics.py
+"""
+Sliding-window traffic metrics: throughput, arrivals and wait statistics
+over the last few minutes of simulated time instead of the whole run.
+
+Simulated time is cut into bins of `bin_seconds`, kept in a ring buffer as
+long as the largest window. Each event is added to the current bin and to
+a running total per window; when a bin falls out of a window its counts
+are subtracted from that window's total again. Recording an event is O(1)
+and a query never rescans samples. Wait percentiles use the same scheme
+with a log-bucket histogram per bin (laid out like a QuantileSketch), and
+arrivals can also be counted per approach, for a controller that weighs
+recent demand.
+"""
+import math
+
+import numpy as np
+
+from quantiles import QuantileSketch
+
+WINDOWS = (60.0, 300.0, 900.0)  # 1, 5 and 15 minutes
+
+
+class _Totals:
+    def __init__(self, buckets, approaches):
+        self.departures = 0
+        self.arrivals = 0
+        self.approach_arrivals = np.zeros(approaches, dtype=np.int64)
+        self.wait_sum = 0.0
+        self.wait_count = 0
+        self.wait_counts = np.zeros(buckets, dtype=np.int64)
+
+
+class WindowedMetrics:
+    def __init__(self, windows=WINDOWS, bin_seconds=5.0, start=0.0, relative_accuracy=0.02, approaches=0):
+        self.windows = tuple(windows)
+        self.approaches = approaches
+        self.bin_seconds = bin_seconds
+        self.start = start
+        self.layout = QuantileSketch(relative_accuracy)
+        buckets = len(self.layout.counts)
+        # window length in bins, the bin currently being filled counts as one
+        self.window_bins = {w: max(1, math.ceil(w / bin_seconds)) for w in self.windows}
+        self.size = max(self.window_bins.values())
+        self.bins = [_Totals(buckets, self.approaches) for _ in range(self.size)]
+        self.totals = {w: _Totals(buckets, self.approaches) for w in self.windows}
+        self.current = self._bin_of(start)
+
+    def _bin_of(self, now):
+        return math.floor(now / self.bin_seconds)
+
+    def _advance(self, now):
+        target = self._bin_of(now)
+        if target - self.current >= self.size:
+            # idle for longer than the largest window: everything has expired
+            buckets = len(self.layout.counts)
+            self.bins = [_Totals(buckets, self.approaches) for _ in range(self.size)]
+            self.totals = {w: _Totals(buckets, self.approaches) for w in self.windows}
+            self.current = target
+            return
+        while self.current < target:
+            self.current += 1
+            for w, total in self.totals.items():
+                expired = self.bins[(self.current - self.window_bins[w]) % self.size]
+                total.departures -= expired.departures
+                total.arrivals -= expired.arrivals
+                total.approach_arrivals -= expired.approach_arrivals
+                total.wait_sum -= expired.wait_sum
+                total.wait_count -= expired.wait_count
+                total.wait_counts -= expired.wait_counts
+                if total.wait_count == 0:
+                    total.wait_sum = 0.0  # drop the rounding error left by the subtractions
+            reused = self.bins[self.current % self.size]
+            reused.departures = reused.arrivals = reused.wait_count = 0
+            reused.wait_sum = 0.0
+            reused.wait_counts[:] = 0
+            reused.approach_arrivals[:] = 0
+
+    def _each(self, now):
+        # the current bin and every window total
+        self._advance(now)
+        yield self.bins[self.current % self.size]
+        yield from self.totals.values()
+
+    # ----- Recording -----
+    def record_arrivals(self, now, count=1, approach=None):
+        for totals in self._each(now):
+            totals.arrivals += count
+            if approach is not None:
+                totals.approach_arrivals[approach] += count
+
+    def record_departures(self, now, count=1):
+        for totals in self._each(now):
+            totals.departures += count
+
+    def record_wait(self, now, wait):
+        bucket = self.layout.bucket(wait)
+        for totals in self._each(now):
+            totals.wait_sum += wait
+            totals.wait_count += 1
+            totals.wait_counts[bucket] += 1
+
+    # ----- Queries -----
+    def span(self, window, now):
+        """Seconds of simulated time the window covers right now (shorter early in the run)."""
+        first_bin = self._bin_of(now) - self.window_bins[window] + 1
+        return max(now - max(first_bin * self.bin_seconds, self.start), 0.0)
+
+    def _per_minute(self, count, window, now):
+        span = self.span(window, now)
+        return count * 60.0 / span if span > 0 else 0.0
+
+    def throughput_per_minute(self, window, now):
+        self._advance(now)
+        return self._per_minute(self.totals[window].departures, window, now)
+
+    def arrivals_per_minute(self, window, now):
+        self._advance(now)
+        return self._per_minute(self.totals[window].arrivals, window, now)
+
+    def approach_arrivals(self, window, now):
+        """Arrivals per approach in the window (counts, not rates: they only change at bin boundaries)."""
+        self._advance(now)
+        return self.totals[window].approach_arrivals.copy()
+
+    def mean_wait(self, window, now):
+        self._advance(now)
+        total = self.totals[window]
+        return total.wait_sum / total.wait_count if total.wait_count else 0.0
+
+    def wait_quantile(self, q, window, now):
+        self._advance(now)
+        total = self.totals[window]
+        if total.wait_count == 0:
+            return 0.0
+        return self.layout.value_at_rank(total.wait_counts, q * (total.wait_count - 1))
+
+    def summary(self, now, qs=(0.5, 0.95, 0.99)):
+        """{window: {metric: value}} for every window, e.g. for a dashboard or an export row."""
+        summary = {}
+        for w in self.windows:
+            summary[w] = {
+                "throughput_per_min": self.throughput_per_minute(w, now),
+                "arrivals_per_min": self.arrivals_per_minute(w, now),
+                "mean_wait": self.mean_wait(w, now),
+                **{f"wait_p{round(q * 100)}": self.wait_quantile(q, w, now) for q in qs},
+            }
+        return summary